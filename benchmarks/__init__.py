@@ -0,0 +1 @@
+"""Benchmarks for the hot paths of the app, run as `python -m benchmarks.<name>`."""
@@ -0,0 +1,67 @@
+"""Measure password verifications (logins) per second at different pool sizes.
+
+Run with `python -m benchmarks.bench_password_hasher [clients] [rounds]`.
+Each of `clients` threads plays a request worker that verifies passwords
+back to back, as during a login storm.
+"""
+import os
+import sys
+import threading
+import time
+from typing import Callable
+
+import bcrypt
+
+from src.app.utils.password_hasher import PasswordHasher
+
+DURATION = 3.0
+
+
+def measure(name: str, clients: int, verify: Callable[[], object]) -> None:
+    """Print the logins/sec reached by `clients` threads calling `verify`."""
+    count = 0
+    lock = threading.Lock()
+    deadline = time.perf_counter() + DURATION
+
+    def client() -> None:
+        nonlocal count
+        while time.perf_counter() < deadline:
+            verify()
+            with lock:
+                count += 1
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    print(f"{name:>10}: {count / elapsed:>8.1f} logins/sec")
+
+
+def main(clients: int, rounds: int) -> None:
+    """Compare hashing inline with the pool at a few sizes."""
+    hashed = bcrypt.hashpw(b"hardpass", bcrypt.gensalt(rounds))
+    print(f"{clients} clients, {rounds} rounds, {os.cpu_count()} cores")
+
+    measure("inline", clients, lambda: bcrypt.checkpw(b"hardpass", hashed))
+
+    PasswordHasher.max_pending = clients
+    sizes = sorted({1, 2, 4, os.cpu_count() or 1})
+    for size in sizes:
+        PasswordHasher.max_workers = size
+        PasswordHasher.shutdown()
+        measure(
+            f"pool={size}",
+            clients,
+            lambda: PasswordHasher.verify_password("hardpass", hashed.decode()),
+        )
+    PasswordHasher.shutdown()
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 16,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 12,
+    )
@@ -0,0 +1,93 @@
+"""Compare rows/sec of the ORM and Core projection paths for listings.
+
+Run with `python -m benchmarks.bench_serializers [rows]`.
+"""
+import datetime
+import sys
+import time
+from typing import Callable
+
+from sqlalchemy import insert
+
+from src.app import create_app
+from src.app.extensions import db
+from src.app.models.internships import Internships
+from src.app.services.database_service import DatabaseService
+from src.app.utils.serializers import internships_to_json, select_internships
+
+
+class BenchConfig:
+    """In-memory database configuration."""
+
+    SQLALCHEMY_DATABASE_URI = "sqlite://"
+    JWT_SECRET_KEY = "benchmark"
+
+
+def orm_path() -> list[dict]:
+    """Serialize internships the way the routes did before the serializers."""
+    return [
+        {
+            "id": internship.id,
+            "company": internship.company,
+            "position": internship.position,
+            "website": internship.website,
+            "deadline": internship.deadline.strftime("%Y-%m-%d"),
+            "author_id": internship.author_id,
+            "time_period_id": internship.time_period_id,
+            "company_photo_link": internship.company_photo_link,
+            "company_photo_variants": internship.company_photo_variants,
+            "flagged": internship.flagged,
+            "created_at": internship.created_at.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        for internship in Internships.query.all()
+    ]
+
+
+def core_path() -> list[dict]:
+    """Serialize internships with the Core projection."""
+    return internships_to_json(db.session.execute(select_internships()))
+
+
+def measure(name: str, path: Callable[[], list], repeat: int = 5) -> None:
+    """Print the best rows/sec of a serialization path."""
+    best = float("inf")
+    for _ in range(repeat):
+        db.session.expunge_all()
+        start = time.perf_counter()
+        rows = len(path())
+        best = min(best, time.perf_counter() - start)
+    print(f"{name:>5}: {rows / best:>12,.0f} rows/sec ({best * 1000:.1f} ms)")
+
+
+def main(rows: int) -> None:
+    """Fill an in-memory database and time both paths."""
+    app = create_app(config=BenchConfig)
+    with app.app_context():
+        DatabaseService.init_db()
+        DatabaseService.seed()
+        today = datetime.date.today()
+        db.session.execute(
+            insert(Internships),
+            [
+                {
+                    "company": f"Company {i}",
+                    "position": f"Position {i % 50}",
+                    "website": "www.example.com",
+                    "deadline": today + datetime.timedelta(days=i % 365),
+                    "author_id": 1,
+                    "time_period_id": 1,
+                    "flagged": False,
+                    "created_at": datetime.datetime.now(),
+                }
+                for i in range(rows)
+            ],
+        )
+        db.session.commit()
+
+        assert orm_path() == core_path()
+        measure("orm", orm_path)
+        measure("core", core_path)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000)
@@ -0,0 +1,51 @@
+"""Measure how long `create_app()` takes, cold and warm.
+
+Run with `python -m benchmarks.bench_startup [runs]`. A cold start is a
+fresh interpreter importing the app and calling the factory once, as each
+worker process does. A warm start is a further factory call in the same
+interpreter, as the tests do.
+"""
+import statistics
+import subprocess
+import sys
+import time
+
+from src.app import create_app
+
+COLD_START = """
+import time
+start = time.perf_counter()
+from src.app import create_app
+imported = time.perf_counter()
+create_app()
+print(imported - start, time.perf_counter() - imported)
+"""
+
+
+def main(runs: int) -> None:
+    """Print the median cold import and factory times and the warm factory time."""
+    imports, factories = [], []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", COLD_START],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout
+        imported, factory = map(float, output.split()[-2:])
+        imports.append(imported)
+        factories.append(factory)
+
+    warm = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        create_app()
+        warm.append(time.perf_counter() - start)
+
+    print(f"cold import:      {statistics.median(imports) * 1000:8.1f} ms")
+    print(f"cold create_app:  {statistics.median(factories) * 1000:8.1f} ms")
+    print(f"warm create_app:  {statistics.median(warm) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
@@ -10,3 +10,58 @@ class Config:
         "DATABASE_URI"
     ) or "sqlite:///" + os.path.join(basedir, "app.db")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", 1024))
+    RESPONSE_CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", 30))
+
+    # bcrypt work factor; hashes made with another one are redone at login.
+    BCRYPT_LOG_ROUNDS = int(os.environ.get("BCRYPT_LOG_ROUNDS", 12))
+    # Threads hashing passwords, half the cores when unset.
+    PASSWORD_HASHER_WORKERS = int(os.environ.get("PASSWORD_HASHER_WORKERS", 0)) or None
+    PASSWORD_HASHER_MAX_PENDING = int(os.environ.get("PASSWORD_HASHER_MAX_PENDING", 64))
+
+    # Token buckets for login and registration, per client IP and per username.
+    # Set RATE_LIMIT_STORAGE_URL (needs the redis package) to share them.
+    RATE_LIMIT_STORAGE_URL = os.environ.get("RATE_LIMIT_STORAGE_URL")
+    RATE_LIMIT_IP_BURST = int(os.environ.get("RATE_LIMIT_IP_BURST", 60))
+    RATE_LIMIT_IP_PER_SECOND = float(os.environ.get("RATE_LIMIT_IP_PER_SECOND", 1))
+    RATE_LIMIT_USERNAME_BURST = int(os.environ.get("RATE_LIMIT_USERNAME_BURST", 5))
+    RATE_LIMIT_USERNAME_PER_SECOND = float(
+        os.environ.get("RATE_LIMIT_USERNAME_PER_SECOND", 0.1)
+    )
+    # Proxies in front of the app whose X-Forwarded-For entries are trusted.
+    # Without it every client behind a reverse proxy shares the proxy's IP,
+    # and so its rate limits.
+    PROXY_FIX_X_FOR = int(os.environ.get("PROXY_FIX_X_FOR", 0))
+
+    # Seconds a user's token version is trusted before it is read again.
+    TOKEN_VERSION_CACHE_TTL = float(os.environ.get("TOKEN_VERSION_CACHE_TTL", 5))
+
+    # Shared S3 client. The pool should be at least the number of threads
+    # uploading at once; retries use botocore's "standard" or "adaptive" mode.
+    S3_MAX_POOL_CONNECTIONS = int(os.environ.get("S3_MAX_POOL_CONNECTIONS", 10))
+    S3_CONNECT_TIMEOUT = float(os.environ.get("S3_CONNECT_TIMEOUT", 5))
+    S3_READ_TIMEOUT = float(os.environ.get("S3_READ_TIMEOUT", 60))
+    S3_RETRY_MODE = os.environ.get("S3_RETRY_MODE", "standard")
+    S3_MAX_ATTEMPTS = int(os.environ.get("S3_MAX_ATTEMPTS", 3))
+    S3_TCP_KEEPALIVE = os.environ.get("S3_TCP_KEEPALIVE", "1") == "1"
+    # Uploads larger than the threshold are sent in parts of S3_MULTIPART_CHUNKSIZE
+    # bytes (at least 5 MiB), S3_MAX_CONCURRENCY at a time.
+    S3_MULTIPART_THRESHOLD = int(
+        os.environ.get("S3_MULTIPART_THRESHOLD", 8 * 1024**2)
+    )
+    S3_MULTIPART_CHUNKSIZE = int(
+        os.environ.get("S3_MULTIPART_CHUNKSIZE", 8 * 1024**2)
+    )
+    S3_MAX_CONCURRENCY = int(os.environ.get("S3_MAX_CONCURRENCY", 4))
+    # Seconds a presigned direct upload stays valid.
+    S3_PRESIGN_EXPIRES = int(os.environ.get("S3_PRESIGN_EXPIRES", 600))
+
+    # Resized WebP variants of uploaded pictures, made in the background when
+    # Pillow is installed.
+    IMAGE_VARIANTS_ENABLED = os.environ.get("IMAGE_VARIANTS_ENABLED", "1") == "1"
+    # Threads resizing pictures, half the cores when unset.
+    IMAGE_PROCESSOR_WORKERS = int(os.environ.get("IMAGE_PROCESSOR_WORKERS", 0)) or None
+    IMAGE_VARIANT_QUALITY = int(os.environ.get("IMAGE_VARIANT_QUALITY", 80))
+    # Largest picture, in pixels, that is decoded to make variants.
+    IMAGE_MAX_PIXELS = int(os.environ.get("IMAGE_MAX_PIXELS", 50_000_000))
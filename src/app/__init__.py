@@ -1,17 +1,19 @@
 """Package for the app of the application.""" ""
-import datetime
 import os
 from typing import Optional
 
 from dotenv import load_dotenv
 from flask import Flask
 from flask_cors import CORS
-from flask_dance.contrib.google import make_google_blueprint
 from flask_jwt_extended import JWTManager
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 from config import Config
-from src.app.extensions import db
+from src.app.extensions import db, rate_limiter, response_cache
+from src.app.utils.image_processor import ImageProcessor
+from src.app.utils.pagination import NEXT_CURSOR_HEADER
 from src.app.utils.password_hasher import PasswordHasher
+from src.app.utils.s3 import S3
 
 
 def create_app(config: Optional = Config) -> Flask:
@@ -20,94 +22,38 @@ def create_app(config: Optional = Config) -> Flask:
     app = Flask(__name__)
     app.config.from_object(config)
     app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY")
-    CORS(app, resources={r"/*": {"origins": "*"}})
+    if app.config.get("PROXY_FIX_X_FOR"):
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config["PROXY_FIX_X_FOR"])
+    CORS(
+        app,
+        resources={r"/*": {"origins": "*"}},
+        expose_headers=[NEXT_CURSOR_HEADER, "ETag"],
+    )
     JWTManager(app)
 
-    google_bp = make_google_blueprint(
-        client_id=os.getenv("GOOGLE_CLIENT_ID"),
-        client_secret=os.getenv("GOOGLE_CLIENT_SECRET"),
-        scope=["email", "profile"],
-    )
-    app.register_blueprint(google_bp, url_prefix="/login/google")
+    # flask_dance pulls in requests and oauthlib, so it is only imported when
+    # Google OAuth is configured.
+    if os.getenv("GOOGLE_CLIENT_ID"):
+        from flask_dance.contrib.google import make_google_blueprint
+
+        google_bp = make_google_blueprint(
+            client_id=os.getenv("GOOGLE_CLIENT_ID"),
+            client_secret=os.getenv("GOOGLE_CLIENT_SECRET"),
+            scope=["email", "profile"],
+        )
+        app.register_blueprint(google_bp, url_prefix="/login/google")
 
     # Initialize extensions
     db.init_app(app)
+    response_cache.init_app(app)
+    rate_limiter.init_app(app)
+    PasswordHasher.init_app(app)
+    S3.init_app(app)
+    ImageProcessor.init_app(app)
+
+    from src.app.commands import register_commands
 
-    # Create the database tables
-    from src.app.models.internships import Internships  # noqa: F401
-    from src.app.models.roles import Roles  # noqa: F401
-    from src.app.models.time_periods import TimePeriods  # noqa: F401
-    from src.app.models.users import Users  # noqa: F401
-
-    with app.app_context():
-        print("Creating DB")
-        db.create_all()
-
-        if Roles.query.count() == 0:
-            print("Initializing roles")
-            admin_role = Roles(role="Admin")
-            instructor_role = Roles(role="Instructor")
-            student_role = Roles(role="Student")
-            db.session.add(admin_role)
-            db.session.add(instructor_role)
-            db.session.add(student_role)
-
-            db.session.commit()
-
-        if not Users.query.filter_by(username="admin").first():
-            print("Initializing admin user")
-            admin_user = Users(
-                username="admin",
-                password=PasswordHasher.hash_password(password="hardpass"),
-                role_id=1,
-            )
-            student_user = Users(
-                username="student",
-                password=PasswordHasher.hash_password(password="hardpass"),
-                role_id=3,
-            )
-            db.session.add(admin_user)
-            db.session.add(student_user)
-            db.session.commit()
-
-        if TimePeriods.query.count() == 0:
-            print("Initializing time periods")
-            time_period = TimePeriods(
-                name="T3 2023-2024",
-                start_date=datetime.datetime.strptime("2024-04-22", "%Y-%m-%d").date(),
-                end_date=datetime.datetime.strptime("2024-07-21", "%Y-%m-%d").date(),
-            )
-            db.session.add(time_period)
-            db.session.commit()
-
-        if Internships.query.count() == 0:
-            print("Initializing internships")
-            internship1 = Internships(
-                company="test company",
-                position="facility manager",
-                website="www.test.com",
-                deadline=datetime.datetime.strptime("2021-12-12", "%Y-%m-%d").date(),
-                author_id=1,
-                time_period_id=1,
-                company_photo_link="www.test.com",
-                flagged=False,
-                created_at=datetime.datetime.strptime("2021-12-12", "%Y-%m-%d").date(),
-            )
-            internship2 = Internships(
-                company="piti company",
-                position="head of heads",
-                website="www.pititi.com",
-                deadline=datetime.datetime.strptime("2021-11-02", "%Y-%m-%d").date(),
-                author_id=1,
-                time_period_id=1,
-                company_photo_link="www.pititi.com",
-                flagged=False,
-                created_at=datetime.datetime.strptime("2021-12-12", "%Y-%m-%d").date(),
-            )
-            db.session.add(internship2)
-            db.session.add(internship1)
-
-        db.session.commit()
+    register_commands(app)
 
     # Register blueprints
     from src.app.main import bp as main_blueprint
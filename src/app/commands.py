@@ -0,0 +1,71 @@
+"""Module containing the flask CLI commands of the application."""
+import datetime
+from typing import Optional
+
+import click
+from flask import Flask
+
+from src.app.services.archive_service import ARCHIVE_BATCH_SIZE, ArchiveService
+from src.app.services.database_service import DatabaseService
+from src.app.services.upload_service import UPLOAD_COLUMNS, UploadService
+
+
+@click.command("db-init")
+def db_init_command() -> None:
+    """Create the database tables and indexes that are missing."""
+    DatabaseService.init_db()
+    click.echo("Database initialized")
+
+
+@click.command("seed")
+def seed_command() -> None:
+    """Add the default roles, users and example data that are missing."""
+    seeded = DatabaseService.seed()
+    click.echo(f"Seeded {', '.join(seeded)}" if seeded else "Nothing to seed")
+
+
+@click.command("archive-internships")
+@click.option(
+    "--before",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    help="Archive internships with a deadline before this date (default: today).",
+)
+@click.option("--batch-size", type=click.IntRange(min=1), default=ARCHIVE_BATCH_SIZE)
+def archive_internships_command(
+    before: Optional[datetime.datetime], batch_size: int
+) -> None:
+    """Move internships past their deadline to the internships_archive table."""
+    archived = ArchiveService.archive_expired(
+        before=before.date() if before is not None else None, batch_size=batch_size
+    )
+    click.echo(f"Archived {archived} internships")
+
+
+@click.command("prune-uploads")
+@click.option(
+    "--min-age",
+    type=click.IntRange(min=0),
+    default=24,
+    help="Only delete files uploaded at least this many hours ago.",
+)
+@click.option("--dry-run", is_flag=True, help="Only count the files to delete.")
+def prune_uploads_command(min_age: int, dry_run: bool) -> None:
+    """Delete uploaded files that no user or internship refers to any more."""
+    before = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(
+        hours=min_age
+    )
+    for container in UPLOAD_COLUMNS:
+        keys = UploadService.iter_unreferenced_keys(container, before)
+        if dry_run:
+            click.echo(f"Would delete {sum(1 for _ in keys)} files from {container}")
+        else:
+            deleted = UploadService.delete_files_from_aws(keys, container)
+            click.echo(f"Deleted {deleted} files from {container}")
+
+
+def register_commands(app: Flask) -> None:
+    """Register the CLI commands with the application."""
+    app.cli.add_command(db_init_command)
+    app.cli.add_command(seed_command)
+    app.cli.add_command(archive_internships_command)
+    app.cli.add_command(prune_uploads_command)
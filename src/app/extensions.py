@@ -1,3 +1,8 @@
 from flask_sqlalchemy import SQLAlchemy
 
+from src.app.utils.rate_limiter import RateLimiter
+from src.app.utils.response_cache import ResponseCache
+
 db = SQLAlchemy()
+rate_limiter = RateLimiter()
+response_cache = ResponseCache()
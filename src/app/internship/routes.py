@@ -4,10 +4,25 @@ from datetime import datetime
 from flask import Response, jsonify, make_response, request
 from flask_jwt_extended import get_jwt_identity, jwt_required
 
+from src.app.extensions import response_cache
 from src.app.internship import bp
+from src.app.models.roles import RoleEnum
 from src.app.services.flag_service import FlagService
-from src.app.services.internship_service import InternshipService
-from src.app.services.user_service import UserService
+from src.app.services.internship_service import SORT_COLUMNS, InternshipService
+from src.app.utils.auth import current_role, require_role
+from src.app.utils.bulk_import import IMPORT_MIMETYPES, TooManyRowsError, iter_records
+from src.app.utils.conditional import conditional
+from src.app.utils.pagination import (
+    decode_cursor,
+    paginate,
+    parse_bool,
+    parse_date,
+    parse_int,
+    parse_limit,
+    set_next_cursor,
+)
+from src.app.utils.serializers import internship_to_json, internships_to_json
+from src.app.utils.streaming import stream_json_array
 
 
 @bp.route("/internships/add_internship", methods=["POST"])
@@ -43,79 +58,135 @@ def add_internship() -> Response:
     return make_response(jsonify(response), 201)
 
 
+@bp.route("/internships/import", methods=["POST"])
+@jwt_required()
+@require_role(RoleEnum.admin, RoleEnum.instructor)
+def import_internships() -> Response:
+    """Create internships from a CSV or JSON Lines upload.
+
+    The body is parsed and inserted in batches as it is read. Invalid rows
+    are skipped and reported with their line number.
+    """
+    if request.mimetype not in IMPORT_MIMETYPES:
+        response = {"message": "Unsupported content type"}
+        return make_response(jsonify(response), 415)
+
+    try:
+        created, errors = InternshipService.import_internships(
+            iter_records(request.stream, request.mimetype),
+            author_id=get_jwt_identity(),
+        )
+    except TooManyRowsError as e:
+        response = {"message": str(e)}
+        return make_response(jsonify(response), 400)
+    except ValueError:
+        response = {"message": "Invalid file"}
+        return make_response(jsonify(response), 400)
+
+    if not created:
+        response = {"message": "No internships imported", "errors": errors}
+        return make_response(jsonify(response), 400)
+
+    response = {
+        "message": "Internships imported successfully",
+        "created": created,
+        "errors": errors,
+    }
+    return make_response(jsonify(response), 201)
+
+
 @bp.route("/internships", methods=["GET"])
+@conditional("internships")
+@response_cache.cached("internships")
 def get_internships() -> Response:
-    """Return all internships endpoint."""
-    internships = InternshipService.get_internships()
-
-    # Convert SQLAlchemy objects to dictionaries for JSON serialization
-    internships_data = [
-        {
-            "id": internship.id,
-            "company": internship.company,
-            "position": internship.position,
-            "website": internship.website,
-            "deadline": internship.deadline.strftime("%Y-%m-%d"),
-            "author_id": internship.author_id,
-            "time_period_id": internship.time_period_id,
-            "company_photo_link": internship.company_photo_link,
-            "flagged": internship.flagged,
-            "created_at": internship.created_at.strftime("%Y-%m-%d %H:%M:%S"),
+    """Return a page of internships endpoint.
+
+    Pages are ordered by `sort` (deadline or created_at) and `order` (asc or
+    desc). The cursor for the next page is returned in the X-Next-Cursor
+    header and passed back as `cursor`. With `stream=1` every matching
+    internship is streamed in one response instead. Archived internships are
+    only included with `include_archived=1`.
+    """
+    sort = request.args.get("sort", "deadline")
+    order = request.args.get("order", "asc")
+    try:
+        if sort not in SORT_COLUMNS or order not in ("asc", "desc"):
+            raise ValueError("Invalid sort")
+        stream = parse_bool(request.args.get("stream"))
+        limit = parse_limit(request.args.get("limit"))
+        cursor = request.args.get("cursor")
+        after = decode_cursor(cursor) if cursor else None
+        filters = {
+            "sort": sort,
+            "descending": order == "desc",
+            "time_period_id": parse_int(request.args.get("time_period_id")),
+            "company": request.args.get("company"),
+            "flagged": parse_bool(request.args.get("flagged")),
+            "deadline_from": parse_date(request.args.get("deadline_from")),
+            "deadline_to": parse_date(request.args.get("deadline_to")),
+            "include_archived": bool(parse_bool(request.args.get("include_archived"))),
         }
-        for internship in internships
-    ]
+        if not stream:
+            internships = InternshipService.get_internships(
+                limit=limit + 1, after=after, **filters
+            )
+    except ValueError:
+        response = {"message": "Invalid query parameters"}
+        return make_response(jsonify(response), 400)
+
+    if stream:
+        return stream_json_array(
+            InternshipService.iter_internships(**filters), internship_to_json
+        )
+
+    internships, next_cursor = paginate(
+        internships,
+        limit,
+        lambda internship: (getattr(internship, sort), internship.id),
+    )
+
+    return set_next_cursor(jsonify(internships_to_json(internships)), next_cursor)
 
-    return jsonify(internships_data)
+
+@bp.route("/internships/search", methods=["GET"])
+def search_internships() -> Response:
+    """Return the internships matching the `q` query, best match first."""
+    query = request.args.get("q", "").strip()
+    try:
+        if not query:
+            raise ValueError("Empty query")
+        limit = parse_limit(request.args.get("limit"))
+    except ValueError:
+        response = {"message": "Invalid query parameters"}
+        return make_response(jsonify(response), 400)
+
+    internships = InternshipService.search_internships(query, limit)
+
+    return jsonify(internships_to_json(internships))
 
 
 @bp.route("/internships/by_user/<int:user_id>", methods=["GET"])
+@conditional("internships")
+@response_cache.cached("internships:user:{user_id}")
 def get_internships_by_user(user_id: int) -> Response:
     """Return all internships by user."""
     internships = InternshipService.get_internships_by_user(user_id)
 
-    # Convert SQLAlchemy objects to dictionaries for JSON serialization
-    internships_data = [
-        {
-            "id": internship.id,
-            "company": internship.company,
-            "position": internship.position,
-            "website": internship.website,
-            "deadline": internship.deadline.strftime("%Y-%m-%d"),
-            "author_id": internship.author_id,
-            "time_period_id": internship.time_period_id,
-            "company_photo_link": internship.company_photo_link,
-            "flagged": internship.flagged,
-            "created_at": internship.created_at.strftime("%Y-%m-%d %H:%M:%S"),
-        }
-        for internship in internships
-    ]
-
-    return jsonify(internships_data)
+    return jsonify(internships_to_json(internships))
 
 
 @bp.route("/internships/<int:internship_id>", methods=["GET"])
+@conditional("internships")
+@response_cache.cached("internships:{internship_id}")
 def view_internship(internship_id: int) -> Response:
     """Return internship information."""
-    internship = InternshipService.get_internship(internship_id)
+    internship = InternshipService.get_internship_row(internship_id)
 
     if internship is None:
         response = {"message": "Internship not found"}
         return make_response(jsonify(response), 404)
 
-    internships_data = {
-        "id": internship.id,
-        "company": internship.company,
-        "position": internship.position,
-        "website": internship.website,
-        "deadline": internship.deadline.strftime("%Y-%m-%d"),
-        "author_id": internship.author_id,
-        "time_period_id": internship.time_period_id,
-        "company_photo_link": internship.company_photo_link,
-        "flagged": internship.flagged,
-        "created_at": internship.created_at.strftime("%Y-%m-%d %H:%M:%S"),
-    }
-
-    return jsonify(internships_data)
+    return jsonify(internship_to_json(internship))
 
 
 @bp.route("/internships/<int:internship_id>", methods=["PUT"])
@@ -123,12 +194,14 @@ def view_internship(internship_id: int) -> Response:
 def update_internship(internship_id: int) -> Response:
     """Return example text for the update internship endpoint."""
     internship = InternshipService.get_internship(internship_id)
-    user = UserService.get_user_by_id(get_jwt_identity())
 
     if internship is None:
         response = {"message": "Internship not found"}
         return make_response(jsonify(response), 404)
-    elif internship.author_id != user.id and user.role_id != 1:
+    elif (
+        internship.author_id != get_jwt_identity()
+        and current_role() != RoleEnum.admin.value
+    ):
         response = {"message": "Unauthorized"}
         return make_response(jsonify(response), 401)
 
@@ -162,12 +235,14 @@ def update_internship(internship_id: int) -> Response:
 def delete_internship(internship_id: int) -> Response:
     """Delete an internship."""
     internship = InternshipService.get_internship(internship_id)
-    user = UserService.get_user_by_id(get_jwt_identity())
 
     if internship is None:
         response = {"message": "Internship not found"}
         return make_response(jsonify(response), 404)
-    elif internship.author_id != user.id and user.role_id != 1:
+    elif (
+        internship.author_id != get_jwt_identity()
+        and current_role() != RoleEnum.admin.value
+    ):
         response = {"message": "Unauthorized"}
         return make_response(jsonify(response), 401)
 
@@ -181,17 +256,10 @@ def delete_internship(internship_id: int) -> Response:
 @jwt_required()
 def flag_internship(internship_id: int) -> Response:
     """Flag an internship."""
-    internship = InternshipService.get_internship(internship_id)
-    user = UserService.get_user_by_id(get_jwt_identity())
-
-    if internship is None:
+    if not FlagService.flag(internship_id=internship_id, user_id=get_jwt_identity()):
         response = {"message": "Internship not found"}
         return make_response(jsonify(response), 404)
 
-    if not FlagService.user_has_flagged(internship_id=internship_id, user_id=user.id):
-        FlagService.create_flag(internship_id=internship_id, user_id=user.id)
-        InternshipService.flag_internship(internship_id=internship_id)
-
     response = {"message": "Internship flagged successfully"}
     return make_response(jsonify(response), 200)
 
@@ -200,18 +268,9 @@ def flag_internship(internship_id: int) -> Response:
 @jwt_required()
 def unflag_internship(internship_id: int) -> Response:
     """Unflag an internship."""
-    internship = InternshipService.get_internship(internship_id)
-    user = UserService.get_user_by_id(get_jwt_identity())
-
-    if internship is None:
+    if not FlagService.unflag(internship_id=internship_id, user_id=get_jwt_identity()):
         response = {"message": "Internship not found"}
         return make_response(jsonify(response), 404)
 
-    if FlagService.user_has_flagged(internship_id=internship_id, user_id=user.id):
-        FlagService.delete_flag(internship_id=internship_id, user_id=user.id)
-
-    if FlagService.num_flags(internship_id) == 0:
-        InternshipService.unflag_internship(internship_id=internship_id)
-
     response = {"message": "Internship unflagged successfully"}
     return make_response(jsonify(response), 200)
@@ -4,6 +4,13 @@ from src.app.extensions import db
 class Flags(db.Model):
     """Model for a Flag object."""
 
+    # A user can flag an internship once, which makes flagging idempotent.
+    __table_args__ = (
+        db.Index(
+            "ix_flags_user_id_internship_id", "user_id", "internship_id", unique=True
+        ),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
     internship_id = db.Column(
@@ -1,9 +1,29 @@
+import datetime
+
 from src.app.extensions import db
 
 
 class Internships(db.Model):
     """Model for the Internship object."""
 
+    __table_args__ = (
+        # Keyset pagination orders on (sort column, id), and every filter
+        # gets its own index with the same suffix so it can be paged too.
+        db.Index("ix_internships_deadline_id", "deadline", "id"),
+        db.Index("ix_internships_created_at_id", "created_at", "id"),
+        db.Index(
+            "ix_internships_time_period_id_deadline_id",
+            "time_period_id",
+            "deadline",
+            "id",
+        ),
+        db.Index("ix_internships_company_deadline_id", "company", "deadline", "id"),
+        db.Index("ix_internships_flagged_deadline_id", "flagged", "deadline", "id"),
+        # Archived rows keep their id, so SQLite must not hand it out again
+        # once it is no longer the largest in the table.
+        {"sqlite_autoincrement": True},
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     company = db.Column(db.String(255), nullable=False)
     position = db.Column(db.String(255), nullable=False)
@@ -14,8 +34,18 @@ class Internships(db.Model):
         db.Integer, db.ForeignKey("time_periods.id"), nullable=False
     )
     company_photo_link = db.Column(db.String(255))
+    # S3 key of the uploaded photo, so it can be deleted without a listing.
+    company_photo_key = db.Column(db.String(255))
+    # URLs of the resized photos by size, set once they are made.
+    company_photo_variants = db.Column(db.JSON)
+    # Both are maintained by FlagService together with the Flags rows.
     flagged = db.Column(db.Boolean, default=False)
-    created_at = db.Column(db.DateTime, server_default=db.func.now())
+    flag_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    # Keyset pages compare created_at as text on SQLite, so inserts use the
+    # Python default with microseconds rather than the server default.
+    created_at = db.Column(
+        db.DateTime, default=datetime.datetime.now, server_default=db.func.now()
+    )
 
     def __repr__(self) -> str:
         """Return a string representation of the Internship."""
@@ -0,0 +1,36 @@
+from src.app.extensions import db
+
+
+class InternshipsArchive(db.Model):
+    """Model for an internship moved out of the internships table after its deadline.
+
+    Rows keep the id and columns they had in the internships table, so the
+    two can be read together with a UNION ALL.
+    """
+
+    __tablename__ = "internships_archive"
+    __table_args__ = (
+        db.Index("ix_internships_archive_deadline_id", "deadline", "id"),
+        db.Index("ix_internships_archive_created_at_id", "created_at", "id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    company = db.Column(db.String(255), nullable=False)
+    position = db.Column(db.String(255), nullable=False)
+    website = db.Column(db.String(255), nullable=False)
+    deadline = db.Column(db.Date, nullable=False)
+    author_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    time_period_id = db.Column(
+        db.Integer, db.ForeignKey("time_periods.id"), nullable=False
+    )
+    company_photo_link = db.Column(db.String(255))
+    company_photo_key = db.Column(db.String(255))
+    company_photo_variants = db.Column(db.JSON)
+    flagged = db.Column(db.Boolean, default=False)
+    flag_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    created_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self) -> str:
+        """Return a string representation of the archived Internship."""
+        return f"<InternshipsArchive '{self.company}/{self.position}'>"
@@ -0,0 +1,13 @@
+from src.app.extensions import db
+
+
+class TableVersions(db.Model):
+    """Model for the version counter of a table, bumped on every write to it."""
+
+    name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self) -> str:
+        """Return a string representation of the TableVersion."""
+        return f"<TableVersion '{self.name}/{self.version}'>"
@@ -4,6 +4,29 @@ from src.app.extensions import db
 class Users(db.Model):
     """Model for a User of the site."""
 
+    # Role listings filter on role_id and page by id. The student search
+    # filters on role_id first, then on the time period or academic year,
+    # and ranges over or sorts by gpa, with id breaking ties for its cursor.
+    __table_args__ = (
+        db.Index("ix_users_role_id_id", "role_id", "id"),
+        db.Index("ix_users_role_id_gpa_id", "role_id", "gpa", "id"),
+        db.Index(
+            "ix_users_role_id_time_period_gpa_id",
+            "role_id",
+            "internship_time_period_id",
+            "gpa",
+            "id",
+        ),
+        db.Index(
+            "ix_users_role_id_academic_year_gpa_id",
+            "role_id",
+            "academic_year",
+            "gpa",
+            "id",
+        ),
+        db.Index("ix_users_role_id_last_name_id", "role_id", "last_name", "id"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     first_name = db.Column(db.String(255))
     last_name = db.Column(db.String(255))
@@ -16,11 +39,19 @@ class Users(db.Model):
     website_link = db.Column(db.String(255))
     profile_picture_link = db.Column(db.String(255))
     cv_link = db.Column(db.String(255))
+    # S3 keys of the uploaded files, so they can be deleted without a listing.
+    profile_picture_key = db.Column(db.String(255))
+    cv_key = db.Column(db.String(255))
+    # URLs of the resized profile pictures by size, set once they are made.
+    profile_picture_variants = db.Column(db.JSON)
     email = db.Column(db.String(255))
     phone_number = db.Column(db.String(255))
     description = db.Column(db.String(500))
     role_id = db.Column(db.Integer, db.ForeignKey("roles.id"), nullable=False)
     internship_time_period_id = db.Column(db.Integer, db.ForeignKey("time_periods.id"))
+    # Stored in access tokens next to the role and bumped when the role changes,
+    # so tokens carrying an outdated role can be recognised.
+    token_version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
 
     def __repr__(self) -> str:
         """Return a string representation of the User."""
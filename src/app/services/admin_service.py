@@ -1,5 +1,6 @@
 from src.app.extensions import db
 from src.app.models.users import Users
+from src.app.utils.auth import forget_token_version
 
 
 class AdminService:
@@ -11,10 +12,17 @@ class AdminService:
         user = Users.query.filter_by(id=user_id).first()
         db.session.delete(user)
         db.session.commit()
+        forget_token_version(user_id)
 
     @staticmethod
     def change_user_role_by_username(username: str, role_id: int) -> None:
-        """Change a user's role by username."""
+        """Change a user's role by username.
+
+        Bumps the user's token version, so the role in tokens issued before
+        the change is no longer trusted.
+        """
         user = Users.query.filter_by(username=username).first()
         user.role_id = role_id
+        user.token_version = Users.token_version + 1
         db.session.commit()
+        forget_token_version(user.id)
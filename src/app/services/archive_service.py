@@ -0,0 +1,85 @@
+"""Service for archiving expired internships."""
+import datetime
+from typing import Optional
+
+from sqlalchemy import delete, insert, literal, select
+
+from src.app.extensions import db
+from src.app.models.flags import Flags
+from src.app.models.internships import Internships
+from src.app.models.internships_archive import InternshipsArchive
+from src.app.services.internship_service import InternshipService
+from src.app.services.search_service import SearchService
+from src.app.services.table_version_service import TableVersionService
+
+ARCHIVE_BATCH_SIZE = 1000
+
+# Columns copied as they are from internships to internships_archive.
+_ARCHIVED_COLUMNS = [
+    column.key
+    for column in InternshipsArchive.__table__.columns
+    if column.key != "archived_at"
+]
+
+
+class ArchiveService:
+    """Class for moving expired internships to the internships_archive table."""
+
+    @staticmethod
+    def archive_batch(before: datetime.date, batch_size: int) -> int:
+        """Archive up to `batch_size` internships with a deadline before a date.
+
+        The rows are copied to internships_archive and removed from
+        internships, together with their flags and search index entries, in
+        one transaction. Returns the number of internships archived.
+        """
+        internship_ids = db.session.scalars(
+            select(Internships.id)
+            .where(Internships.deadline < before)
+            .order_by(Internships.id)
+            .limit(batch_size)
+        ).all()
+        if not internship_ids:
+            return 0
+
+        db.session.execute(
+            insert(InternshipsArchive).from_select(
+                _ARCHIVED_COLUMNS + ["archived_at"],
+                select(
+                    *(getattr(Internships, key) for key in _ARCHIVED_COLUMNS),
+                    literal(datetime.datetime.now()),
+                ).where(Internships.id.in_(internship_ids)),
+            )
+        )
+        db.session.execute(delete(Flags).where(Flags.internship_id.in_(internship_ids)))
+        SearchService.remove_internships(internship_ids)
+        archived = db.session.execute(
+            delete(Internships)
+            .where(Internships.id.in_(internship_ids))
+            .returning(Internships.id, Internships.author_id)
+        ).all()
+        TableVersionService.bump("internships")
+        db.session.commit()
+
+        for internship_id, author_id in archived:
+            InternshipService.invalidate_cache(internship_id, author_id)
+        return len(archived)
+
+    @staticmethod
+    def archive_expired(
+        before: Optional[datetime.date] = None, batch_size: int = ARCHIVE_BATCH_SIZE
+    ) -> int:
+        """Archive every internship with a deadline before a date, today by default.
+
+        Each batch is committed separately so locks are held briefly and an
+        interrupted run keeps the batches it finished. Returns the number of
+        internships archived.
+        """
+        if before is None:
+            before = datetime.date.today()
+        total = 0
+        while True:
+            archived = ArchiveService.archive_batch(before, batch_size)
+            if not archived:
+                return total
+            total += archived
@@ -0,0 +1,242 @@
+"""Service for creating and seeding the database."""
+import contextlib
+import datetime
+from typing import Iterator
+
+from sqlalchemy import func, inspect, select, text, update
+from sqlalchemy.schema import CreateColumn
+
+from src.app.extensions import db
+from src.app.models.flags import Flags
+from src.app.models.internships import Internships
+from src.app.models.internships_archive import InternshipsArchive  # noqa: F401
+from src.app.models.roles import Roles
+from src.app.models.table_versions import TableVersions  # noqa: F401
+from src.app.models.time_periods import TimePeriods
+from src.app.models.users import Users
+from src.app.services.search_service import SearchService
+from src.app.services.table_version_service import TableVersionService
+from src.app.utils.password_hasher import PasswordHasher
+
+# Arbitrary key of the Postgres advisory lock taken while migrating.
+MIGRATION_LOCK_KEY = 7310117
+
+
+class DatabaseService:
+    """Class for setting up the database outside of the app factory."""
+
+    @staticmethod
+    @contextlib.contextmanager
+    def migration_lock() -> Iterator[None]:
+        """Hold a lock that lets one process at a time set up the database.
+
+        Postgres uses an advisory lock and SQLite a file lock next to the
+        database file. In-memory databases are private to the process, so
+        they are not locked.
+        """
+        engine = db.engine
+        if engine.dialect.name == "postgresql":
+            with engine.connect() as connection:
+                connection.execute(
+                    text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY}
+                )
+                try:
+                    yield
+                finally:
+                    connection.execute(
+                        text("SELECT pg_advisory_unlock(:key)"),
+                        {"key": MIGRATION_LOCK_KEY},
+                    )
+            return
+
+        database = engine.url.database
+        if engine.dialect.name != "sqlite" or database in (None, "", ":memory:"):
+            yield
+            return
+
+        import fcntl
+
+        with open(f"{database}.lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def init_db() -> None:
+        """Create the missing tables, search index and table version rows."""
+        with DatabaseService.migration_lock():
+            db.create_all()
+            DatabaseService.upgrade_schema()
+            SearchService.ensure_index()
+            TableVersionService.ensure_versions("internships", "time_periods")
+            DatabaseService.normalize_timestamps()
+            DatabaseService.backfill_flag_counts()
+
+    @staticmethod
+    def upgrade_schema() -> list[str]:
+        """Add the columns and indexes of the models that existing tables lack.
+
+        create_all only creates missing tables, so databases made by an older
+        version are brought up to date here. New columns must be nullable or
+        have a server default. Returns the names of what was added.
+        """
+        connection = db.session.connection()
+        inspector = inspect(connection)
+        preparer = connection.dialect.identifier_preparer
+        added = []
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in columns:
+                    definition = CreateColumn(column).compile(
+                        dialect=connection.dialect
+                    )
+                    connection.execute(
+                        text(
+                            f"ALTER TABLE {preparer.format_table(table)} "
+                            f"ADD COLUMN {definition}"
+                        )
+                    )
+                    added.append(f"{table.name}.{column.name}")
+            indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    if index.name == "ix_flags_user_id_internship_id":
+                        DatabaseService.remove_duplicate_flags()
+                    index.create(connection)
+                    added.append(index.name)
+        db.session.commit()
+        return added
+
+    @staticmethod
+    def remove_duplicate_flags() -> int:
+        """Keep only the first flag of each user on each internship.
+
+        Flags made before the unique index may repeat, and the index cannot be
+        created while they do. Returns the number of flags removed.
+        """
+        result = db.session.execute(
+            text(
+                "DELETE FROM flags WHERE id NOT IN "
+                "(SELECT MIN(id) FROM flags GROUP BY user_id, internship_id)"
+            )
+        )
+        return result.rowcount
+
+    @staticmethod
+    def backfill_flag_counts() -> int:
+        """Set flag_count to the number of flags of internships where it is off.
+
+        Internships added before the column existed start at the default of
+        0. Returns the number of internships updated.
+        """
+        count = (
+            select(func.count())
+            .where(Flags.internship_id == Internships.id)
+            .scalar_subquery()
+        )
+        result = db.session.execute(
+            update(Internships)
+            .where(Internships.flag_count != count)
+            .values(flag_count=count)
+        )
+        db.session.commit()
+        return result.rowcount
+
+    @staticmethod
+    def normalize_timestamps() -> None:
+        """Give created_at values from the server default the format of the others.
+
+        SQLite stores datetimes as text, and CURRENT_TIMESTAMP has no
+        fractional seconds while SQLAlchemy writes six digits. Keyset cursors
+        compare created_at as text, so both formats must match.
+        """
+        if db.engine.dialect.name != "sqlite":
+            return
+        for table in ("internships", "internships_archive"):
+            db.session.execute(
+                text(
+                    f"UPDATE {table} SET created_at = created_at || '.000000' "
+                    "WHERE length(created_at) = 19"
+                )
+            )
+        db.session.commit()
+
+    @staticmethod
+    def seed() -> list[str]:
+        """Add the roles, default users and example data that are missing.
+
+        Returns the names of what was added.
+        """
+        seeded = []
+        with DatabaseService.migration_lock():
+            if Roles.query.count() == 0:
+                db.session.add_all(
+                    [
+                        Roles(role="Admin"),
+                        Roles(role="Instructor"),
+                        Roles(role="Student"),
+                    ]
+                )
+                db.session.commit()
+                seeded.append("roles")
+
+            if not Users.query.filter_by(username="admin").first():
+                admin_password, student_password = PasswordHasher.hash_many(
+                    ["hardpass", "hardpass"]
+                )
+                db.session.add_all(
+                    [
+                        Users(username="admin", password=admin_password, role_id=1),
+                        Users(username="student", password=student_password, role_id=3),
+                    ]
+                )
+                db.session.commit()
+                seeded.append("users")
+
+            if TimePeriods.query.count() == 0:
+                db.session.add(
+                    TimePeriods(
+                        name="T3 2023-2024",
+                        start_date=datetime.date(2024, 4, 22),
+                        end_date=datetime.date(2024, 7, 21),
+                    )
+                )
+                db.session.commit()
+                seeded.append("time periods")
+
+            if Internships.query.count() == 0:
+                internships = [
+                    Internships(
+                        company="piti company",
+                        position="head of heads",
+                        website="www.pititi.com",
+                        deadline=datetime.date(2021, 11, 2),
+                        author_id=1,
+                        time_period_id=1,
+                        company_photo_link="www.pititi.com",
+                        flagged=False,
+                        created_at=datetime.datetime(2021, 12, 12),
+                    ),
+                    Internships(
+                        company="test company",
+                        position="facility manager",
+                        website="www.test.com",
+                        deadline=datetime.date(2021, 12, 12),
+                        author_id=1,
+                        time_period_id=1,
+                        company_photo_link="www.test.com",
+                        flagged=False,
+                        created_at=datetime.datetime(2021, 12, 12),
+                    ),
+                ]
+                db.session.add_all(internships)
+                db.session.flush()
+                SearchService.index_rows(internships)
+                db.session.commit()
+                seeded.append("internships")
+        return seeded
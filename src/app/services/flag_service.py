@@ -1,49 +1,113 @@
 """Service for Flag related logic."""
+from sqlalchemy import case, delete, literal, select, update
+
 from src.app.extensions import db
 from src.app.models.flags import Flags
+from src.app.models.internships import Internships
+from src.app.services.internship_service import InternshipService
+from src.app.services.table_version_service import TableVersionService
+from src.app.utils.dialect import upsert_insert
 
 
 class FlagService:
-    """Class for Flag related tasks."""
+    """Class for Flag related tasks.
+
+    The flag_count and flagged columns of an internship are only changed
+    here, with atomic updates in the same transaction as the Flags rows.
+    """
 
     @staticmethod
-    def user_has_flagged(internship_id: int, user_id: int) -> bool:
-        """Check if a user has flagged an internship."""
-        flag = Flags.query.filter(
-            Flags.internship_id == internship_id, Flags.user_id == user_id
-        ).first()
-        return flag is not None
+    def _flags_changed(author_ids: list[int], internship_id: int) -> None:
+        """Commit a change to an internship's flags and drop cached responses."""
+        TableVersionService.bump("internships")
+        db.session.commit()
+        for author_id in author_ids:
+            InternshipService.invalidate_cache(internship_id, author_id)
 
     @staticmethod
-    def create_flag(internship_id: int, user_id: int) -> Flags:
-        """Create a new flag."""
-        flag = Flags(
-            internship_id=internship_id,
-            user_id=user_id,
+    def _internship_exists(internship_id: int) -> bool:
+        return (
+            db.session.scalar(
+                select(Internships.id).where(Internships.id == internship_id)
+            )
+            is not None
         )
-        db.session.add(flag)
-        db.session.commit()
-        return flag
 
     @staticmethod
-    def delete_flag(internship_id: int, user_id: int) -> None:
-        """Delete a flag."""
-        flag = Flags.query.filter(
-            Flags.internship_id == internship_id, Flags.user_id == user_id
-        ).first()
-        db.session.delete(flag)
-        db.session.commit()
+    def flag(internship_id: int, user_id: int) -> bool:
+        """Flag an internship for a user, doing nothing if they already have.
+
+        Returns False if the internship does not exist.
+        """
+        # Selecting from internships only inserts the flag if it exists, and
+        # the unique index turns a repeated flag into a no-op.
+        result = db.session.execute(
+            upsert_insert(Flags)
+            .from_select(
+                ["user_id", "internship_id"],
+                select(literal(user_id), Internships.id).where(
+                    Internships.id == internship_id
+                ),
+            )
+            .on_conflict_do_nothing(index_elements=["user_id", "internship_id"])
+        )
+        if result.rowcount == 0:
+            return FlagService._internship_exists(internship_id)
+
+        author_ids = db.session.scalars(
+            update(Internships)
+            .where(Internships.id == internship_id)
+            .values(flag_count=Internships.flag_count + 1, flagged=True)
+            .returning(Internships.author_id)
+        ).all()
+        FlagService._flags_changed(author_ids, internship_id)
+        return True
+
+    @staticmethod
+    def unflag(internship_id: int, user_id: int) -> bool:
+        """Remove a user's flag from an internship, if they have one.
+
+        Returns False if the internship does not exist.
+        """
+        result = db.session.execute(
+            delete(Flags).where(
+                Flags.internship_id == internship_id, Flags.user_id == user_id
+            )
+        )
+        if result.rowcount == 0:
+            return FlagService._internship_exists(internship_id)
+
+        # SET expressions see the old values, so more than one flag before
+        # the decrement means the internship is still flagged after it.
+        author_ids = db.session.scalars(
+            update(Internships)
+            .where(Internships.id == internship_id)
+            .values(
+                flag_count=case(
+                    (Internships.flag_count > 0, Internships.flag_count - 1), else_=0
+                ),
+                flagged=Internships.flag_count > 1,
+            )
+            .returning(Internships.author_id)
+        ).all()
+        FlagService._flags_changed(author_ids, internship_id)
+        return True
 
     @staticmethod
     def num_flags(internship_id: int) -> int:
         """Get the number of flags for an internship."""
-        flags = Flags.query.filter(Flags.internship_id == internship_id).all()
-        return len(flags)
+        return db.session.scalar(
+            select(Internships.flag_count).where(Internships.id == internship_id)
+        )
 
     @staticmethod
     def clear_flags(internship_id: int) -> None:
         """Clear all flags for an internship."""
-        flags = Flags.query.filter(Flags.internship_id == internship_id).all()
-        for flag in flags:
-            db.session.delete(flag)
-        db.session.commit()
+        db.session.execute(delete(Flags).where(Flags.internship_id == internship_id))
+        author_ids = db.session.scalars(
+            update(Internships)
+            .where(Internships.id == internship_id)
+            .values(flag_count=0, flagged=False)
+            .returning(Internships.author_id)
+        ).all()
+        FlagService._flags_changed(author_ids, internship_id)
@@ -1,12 +1,46 @@
 import datetime
+from typing import Iterable, Iterator, Optional
 
-from src.app.extensions import db
+from sqlalchemy import Row, Select, insert, select, union_all, update
+
+from src.app.extensions import db, response_cache
 from src.app.models.internships import Internships
+from src.app.models.time_periods import TimePeriods
+from src.app.services.search_service import SearchService
+from src.app.services.table_version_service import TableVersionService
+from src.app.utils.bulk_import import (
+    IMPORT_BATCH_SIZE,
+    MAX_IMPORT_ROWS,
+    TooManyRowsError,
+    parse_internship,
+)
+from src.app.utils.pagination import keyset_after, parse_cursor
+from src.app.utils.serializers import (
+    INTERNSHIP_COLUMNS,
+    select_archived_internships,
+    select_internships,
+)
+from src.app.utils.streaming import STREAM_BATCH_SIZE
+
+# Columns internships can be paged by, with the parser for their cursor value.
+SORT_COLUMNS = {
+    "deadline": (Internships.deadline, datetime.date.fromisoformat),
+    "created_at": (Internships.created_at, datetime.datetime.fromisoformat),
+}
 
 
 class InternshipService:
     """Service for Internship related tasks."""
 
+    @staticmethod
+    def invalidate_cache(internship_id: int, author_id: int) -> None:
+        """Drop the cached responses that include an internship."""
+        response_cache.invalidate(
+            "internships",
+            f"internships:{internship_id}",
+            f"internships:user:{author_id}",
+        )
+
     @staticmethod
     def create_internship(
         company: str,
@@ -17,9 +51,13 @@ class InternshipService:
         time_period_id: int,
         flagged: bool = False,
         company_photo_link: str = None,
-        created_at: datetime.datetime = db.func.now(),
+        created_at: Optional[datetime.datetime] = None,
     ) -> Internships:
         """Create a new internship."""
+        # Set on our side rather than by the server default so every row uses
+        # the same timestamp format, which keyset comparisons rely on.
+        if created_at is None:
+            created_at = datetime.datetime.now()
         internship = Internships(
             company=company,
             position=position,
@@ -32,9 +70,72 @@ class InternshipService:
             company_photo_link=company_photo_link,
         )
         db.session.add(internship)
+        db.session.flush()
+        SearchService.index_internship(internship)
+        TableVersionService.bump("internships")
         db.session.commit()
+        InternshipService.invalidate_cache(internship.id, internship.author_id)
         return internship
 
+    @staticmethod
+    def _insert_batch(batch: list[dict]) -> int:
+        """Insert a batch of internships in one statement and index them."""
+        if not batch:
+            return 0
+        rows = db.session.execute(
+            insert(Internships).returning(
+                Internships.id, Internships.company, Internships.position
+            ),
+            batch,
+        ).all()
+        SearchService.index_rows(rows)
+        return len(rows)
+
+    @staticmethod
+    def import_internships(
+        records: Iterable[tuple[int, object]], author_id: int
+    ) -> tuple[int, list[dict]]:
+        """Create internships from imported records in a single transaction.
+
+        Records are validated as they are read and the valid ones inserted in
+        batches. Returns the number of internships created and an error for
+        each rejected record. Raises a ValueError if the records cannot be
+        read, in which case nothing is imported.
+        """
+        time_period_ids = set(db.session.scalars(select(TimePeriods.id)))
+        today = datetime.date.today()
+        created_at = datetime.datetime.now()
+        created = 0
+        errors = []
+        batch = []
+
+        try:
+            for count, (line, record) in enumerate(records, start=1):
+                if count > MAX_IMPORT_ROWS:
+                    raise TooManyRowsError(
+                        f"Too many rows, at most {MAX_IMPORT_ROWS} are allowed"
+                    )
+                try:
+                    values = parse_internship(record, time_period_ids, today)
+                except ValueError as e:
+                    errors.append({"line": line, "message": str(e)})
+                    continue
+                values.update(author_id=author_id, created_at=created_at)
+                batch.append(values)
+                if len(batch) >= IMPORT_BATCH_SIZE:
+                    created += InternshipService._insert_batch(batch)
+                    batch = []
+            created += InternshipService._insert_batch(batch)
+        except ValueError:
+            db.session.rollback()
+            raise
+
+        if created:
+            TableVersionService.bump("internships")
+            db.session.commit()
+            response_cache.invalidate("internships", f"internships:user:{author_id}")
+        return created, errors
+
     @staticmethod
     def update_internship_by_id(
         internship_id: int,
@@ -45,27 +146,190 @@ class InternshipService:
         time_period_id: int,
         company_photo_link: str,
     ) -> Internships:
-        """Update an internship by its id."""
+        """Update an internship by its id.
+
+        Pointing the photo link elsewhere forgets the key and variants of the
+        uploaded photo, which no longer belong to it.
+        """
         internship = Internships.query.filter(Internships.id == internship_id).first()
         internship.company = company
         internship.position = position
         internship.website = website
         internship.deadline = deadline
         internship.time_period_id = time_period_id
+        if company_photo_link != internship.company_photo_link:
+            internship.company_photo_key = None
+            internship.company_photo_variants = None
         internship.company_photo_link = company_photo_link
+        SearchService.index_internship(internship)
+        TableVersionService.bump("internships")
 
         db.session.commit()
+        InternshipService.invalidate_cache(internship.id, internship.author_id)
         return internship
 
     @staticmethod
-    def get_internships() -> list[Internships]:
-        """Return all internships."""
-        return Internships.query.all()
+    def set_company_photo(
+        internship_id: int, key: Optional[str], link: Optional[str]
+    ) -> tuple[Optional[str], Optional[str]]:
+        """Set or clear the uploaded photo of an internship, returning the old key and link."""
+        internship = Internships.query.filter(Internships.id == internship_id).first()
+        old_key, old_link = internship.company_photo_key, internship.company_photo_link
+        internship.company_photo_key = key
+        internship.company_photo_link = link
+        internship.company_photo_variants = None
+        TableVersionService.bump("internships")
+        db.session.commit()
+        InternshipService.invalidate_cache(internship.id, internship.author_id)
+        return old_key, old_link
+
+    @staticmethod
+    def set_company_photo_variants(
+        internship_id: int, key: str, variants: dict
+    ) -> bool:
+        """Record the resized versions of an internship's photo.
+
+        Nothing is recorded if the photo was replaced in the meantime.
+        """
+        author_id = db.session.scalar(
+            update(Internships)
+            .where(
+                Internships.id == internship_id,
+                Internships.company_photo_key == key,
+            )
+            .values(company_photo_variants=variants)
+            .returning(Internships.author_id)
+        )
+        if author_id is None:
+            db.session.rollback()
+            return False
+        TableVersionService.bump("internships")
+        db.session.commit()
+        InternshipService.invalidate_cache(internship_id, author_id)
+        return True
 
     @staticmethod
-    def get_internships_by_user(user_id: int) -> list[Internships]:
-        """Return all internships by user."""
-        return Internships.query.filter(Internships.author_id == user_id).all()
+    def _filtered_query(
+        sort: str,
+        descending: bool,
+        after: Optional[list],
+        time_period_id: Optional[int],
+        company: Optional[str],
+        flagged: Optional[bool],
+        deadline_from: Optional[datetime.date],
+        deadline_to: Optional[datetime.date],
+        include_archived: bool,
+    ) -> Select:
+        """Build the ordered and filtered query behind the internship listings.
+
+        With `include_archived` the query reads a UNION ALL of the internships
+        and internships_archive tables, otherwise only the internships table.
+        """
+        if include_archived:
+            source = union_all(
+                select_internships(), select_archived_internships()
+            ).subquery("all_internships")
+        else:
+            source = Internships.__table__
+        columns = source.c
+        sort_column = columns[SORT_COLUMNS[sort][0].key]
+        parse_sort_value = SORT_COLUMNS[sort][1]
+        statement = select(*(columns[column.key] for column in INTERNSHIP_COLUMNS))
+
+        if time_period_id is not None:
+            statement = statement.where(columns.time_period_id == time_period_id)
+        if company is not None:
+            statement = statement.where(columns.company == company)
+        if flagged is not None:
+            statement = statement.where(columns.flagged == flagged)
+        if deadline_from is not None:
+            statement = statement.where(columns.deadline >= deadline_from)
+        if deadline_to is not None:
+            statement = statement.where(columns.deadline <= deadline_to)
+        if after is not None:
+            after_key = parse_cursor(after, (parse_sort_value, int))
+            statement = statement.where(
+                keyset_after((sort_column, columns.id), after_key, descending)
+            )
+
+        if descending:
+            return statement.order_by(sort_column.desc(), columns.id.desc())
+        return statement.order_by(sort_column, columns.id)
+
+    @staticmethod
+    def get_internships(
+        limit: int,
+        sort: str = "deadline",
+        descending: bool = False,
+        after: Optional[list] = None,
+        time_period_id: Optional[int] = None,
+        company: Optional[str] = None,
+        flagged: Optional[bool] = None,
+        deadline_from: Optional[datetime.date] = None,
+        deadline_to: Optional[datetime.date] = None,
+        include_archived: bool = False,
+    ) -> list[Row]:
+        """Return one page of internship rows ordered by (sort, id).
+
+        `after` is the decoded cursor of the previous page, i.e. the sort value
+        and id of its last row. Raises a ValueError if it is malformed.
+        """
+        statement = InternshipService._filtered_query(
+            sort,
+            descending,
+            after,
+            time_period_id,
+            company,
+            flagged,
+            deadline_from,
+            deadline_to,
+            include_archived,
+        )
+        return db.session.execute(statement.limit(limit)).all()
+
+    @staticmethod
+    def iter_internships(
+        sort: str = "deadline",
+        descending: bool = False,
+        time_period_id: Optional[int] = None,
+        company: Optional[str] = None,
+        flagged: Optional[bool] = None,
+        deadline_from: Optional[datetime.date] = None,
+        deadline_to: Optional[datetime.date] = None,
+        include_archived: bool = False,
+    ) -> Iterator[Row]:
+        """Iterate over every matching internship row, fetching them in batches."""
+        statement = InternshipService._filtered_query(
+            sort,
+            descending,
+            None,
+            time_period_id,
+            company,
+            flagged,
+            deadline_from,
+            deadline_to,
+            include_archived,
+        )
+        return iter(
+            db.session.execute(statement.execution_options(yield_per=STREAM_BATCH_SIZE))
+        )
+
+    @staticmethod
+    def search_internships(query: str, limit: int) -> list[Row]:
+        """Return the internship rows best matching a search query."""
+        return SearchService.search_internships(query, limit)
+
+    @staticmethod
+    def get_internships_by_user(user_id: int) -> list[Row]:
+        """Return the rows of all internships by user."""
+        statement = select_internships().where(Internships.author_id == user_id)
+        return db.session.execute(statement.order_by(Internships.id)).all()
+
+    @staticmethod
+    def get_internship_row(internship_id: int) -> Optional[Row]:
+        """Return the row of an internship."""
+        statement = select_internships().where(Internships.id == internship_id)
+        return db.session.execute(statement).first()
 
     @staticmethod
     def get_internship(internship_id: int) -> Internships:
@@ -76,21 +340,9 @@ class InternshipService:
     def delete_internship_by_id(internship_id: int) -> None:
         """Delete an internship by its id."""
         internship = Internships.query.filter(Internships.id == internship_id).first()
+        author_id = internship.author_id
         db.session.delete(internship)
+        SearchService.remove_internship(internship_id)
+        TableVersionService.bump("internships")
         db.session.commit()
-
-    @staticmethod
-    def flag_internship(internship_id: int) -> Internships:
-        """Flag an internship."""
-        internship = Internships.query.filter(Internships.id == internship_id).first()
-        internship.flagged = True
-        db.session.commit()
-        return internship
-
-    @staticmethod
-    def unflag_internship(internship_id: int) -> Internships:
-        """Unflag an internship."""
-        internship = Internships.query.filter(Internships.id == internship_id).first()
-        internship.flagged = False
-        db.session.commit()
-        return internship
+        InternshipService.invalidate_cache(internship_id, author_id)
@@ -0,0 +1,150 @@
+"""Service for full-text search over internships."""
+import re
+from typing import Iterable
+
+from sqlalchemy import DDL, Row, event, func, literal_column, text
+
+from src.app.extensions import db
+from src.app.models.internships import Internships
+from src.app.utils.serializers import INTERNSHIP_COLUMNS, select_internships
+
+MAX_SEARCH_TERMS = 10
+
+# On Postgres the index is an expression index over the table itself, so the
+# database keeps it up to date. SQLite has no such index and uses a separate
+# FTS5 table that has to be written to alongside the internships table.
+# The expression below has to match the index definition exactly for Postgres
+# to use the index, hence the literals instead of bound parameters.
+_SEARCH_DOCUMENT = func.to_tsvector(
+    literal_column("'simple'"),
+    Internships.company + literal_column("' '") + Internships.position,
+)
+
+_COLUMN_LIST = ", ".join(f"internships.{column.key}" for column in INTERNSHIP_COLUMNS)
+
+event.listen(
+    Internships.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS internships_fts").execute_if(dialect="sqlite"),
+)
+
+
+class SearchService:
+    """Class for internship search related tasks."""
+
+    @staticmethod
+    def _dialect() -> str:
+        return db.engine.dialect.name
+
+    @staticmethod
+    def ensure_index() -> None:
+        """Create the search index if it is missing, filling it from the table."""
+        if SearchService._dialect() == "postgresql":
+            db.session.execute(
+                text(
+                    "CREATE INDEX IF NOT EXISTS ix_internships_search ON internships "
+                    "USING gin (to_tsvector('simple', company || ' ' || position))"
+                )
+            )
+        elif SearchService._dialect() == "sqlite":
+            exists = db.session.execute(
+                text(
+                    "SELECT 1 FROM sqlite_master "
+                    "WHERE type = 'table' AND name = 'internships_fts'"
+                )
+            ).first()
+            if exists is None:
+                db.session.execute(
+                    text(
+                        "CREATE VIRTUAL TABLE internships_fts "
+                        "USING fts5(company, position)"
+                    )
+                )
+                db.session.execute(
+                    text(
+                        "INSERT INTO internships_fts (rowid, company, position) "
+                        "SELECT id, company, position FROM internships"
+                    )
+                )
+        db.session.commit()
+
+    @staticmethod
+    def index_internship(internship: Internships) -> None:
+        """Add or refresh an internship in the search index.
+
+        Does not commit, so the index is written in the caller's transaction.
+        """
+        if SearchService._dialect() != "sqlite":
+            return
+        SearchService.remove_internship(internship.id)
+        SearchService.index_rows([internship])
+
+    @staticmethod
+    def index_rows(rows: Iterable) -> None:
+        """Add new internships to the search index without committing.
+
+        Rows only need `id`, `company` and `position`, and are inserted with
+        a single executemany.
+        """
+        if SearchService._dialect() != "sqlite":
+            return
+        parameters = [
+            {"id": row.id, "company": row.company, "position": row.position}
+            for row in rows
+        ]
+        if not parameters:
+            return
+        db.session.execute(
+            text(
+                "INSERT INTO internships_fts (rowid, company, position) "
+                "VALUES (:id, :company, :position)"
+            ),
+            parameters,
+        )
+
+    @staticmethod
+    def remove_internship(internship_id: int) -> None:
+        """Remove an internship from the search index without committing."""
+        SearchService.remove_internships([internship_id])
+
+    @staticmethod
+    def remove_internships(internship_ids: list[int]) -> None:
+        """Remove internships from the search index without committing."""
+        if SearchService._dialect() != "sqlite" or not internship_ids:
+            return
+        db.session.execute(
+            text("DELETE FROM internships_fts WHERE rowid = :id"),
+            [{"id": internship_id} for internship_id in internship_ids],
+        )
+
+    @staticmethod
+    def search_internships(query: str, limit: int) -> list[Row]:
+        """Return the internship rows best matching a query, best match first.
+
+        Every word of the query has to match the start of a word in the
+        company or position.
+        """
+        terms = re.findall(r"\w+", query.lower())[:MAX_SEARCH_TERMS]
+        if not terms:
+            return []
+
+        if SearchService._dialect() == "sqlite":
+            statement = select_internships().from_statement(
+                text(
+                    f"SELECT {_COLUMN_LIST} FROM internships_fts "
+                    "JOIN internships ON internships.id = internships_fts.rowid "
+                    "WHERE internships_fts MATCH :query "
+                    "ORDER BY internships_fts.rank LIMIT :limit"
+                )
+            )
+            match = " ".join(f'"{term}"*' for term in terms)
+            return db.session.execute(statement, {"query": match, "limit": limit}).all()
+
+        tsquery = func.to_tsquery("simple", " & ".join(f"{t}:*" for t in terms))
+        statement = (
+            select_internships()
+            .where(_SEARCH_DOCUMENT.op("@@")(tsquery))
+            .order_by(func.ts_rank(_SEARCH_DOCUMENT, tsquery).desc())
+            .limit(limit)
+        )
+        return db.session.execute(statement).all()
@@ -0,0 +1,56 @@
+"""Service for the per-table version counters used for conditional GETs."""
+import datetime
+from typing import Optional
+
+from sqlalchemy import update
+
+from src.app.extensions import db
+from src.app.models.table_versions import TableVersions
+
+
+class TableVersionService:
+    """Class for table version related tasks."""
+
+    @staticmethod
+    def _now() -> datetime.datetime:
+        # Stored as naive UTC, HTTP dates are always UTC.
+        return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+    @staticmethod
+    def ensure_versions(*names: str) -> None:
+        """Create the version rows of the given tables if they are missing."""
+        for name in names:
+            if db.session.get(TableVersions, name) is None:
+                db.session.add(
+                    TableVersions(
+                        name=name, version=0, updated_at=TableVersionService._now()
+                    )
+                )
+        db.session.commit()
+
+    @staticmethod
+    def bump(name: str) -> None:
+        """Increment the version of a table.
+
+        Does not commit, so the new version becomes visible together with the
+        write it describes.
+        """
+        result = db.session.execute(
+            update(TableVersions)
+            .where(TableVersions.name == name)
+            .values(
+                version=TableVersions.version + 1,
+                updated_at=TableVersionService._now(),
+            )
+        )
+        if result.rowcount == 0:
+            db.session.add(
+                TableVersions(
+                    name=name, version=1, updated_at=TableVersionService._now()
+                )
+            )
+
+    @staticmethod
+    def get_version(name: str) -> Optional[TableVersions]:
+        """Return the version row of a table."""
+        return db.session.get(TableVersions, name, populate_existing=True)
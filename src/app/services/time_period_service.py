@@ -1,7 +1,8 @@
 import datetime
 
-from src.app.extensions import db
+from src.app.extensions import db, response_cache
 from src.app.models.time_periods import TimePeriods
+from src.app.services.table_version_service import TableVersionService
 
 
 class TimePeriodService:
@@ -14,7 +15,9 @@ class TimePeriodService:
         """Create a new time period."""
         time_period = TimePeriods(start_date=start_date, end_date=end_date, name=name)
         db.session.add(time_period)
+        TableVersionService.bump("time_periods")
         db.session.commit()
+        response_cache.invalidate("time_periods")
         return time_period
 
     @staticmethod
@@ -34,4 +37,6 @@ class TimePeriodService:
         """Delete a time period by id."""
         time_period = TimePeriods.query.filter_by(id=time_period_id).first()
         db.session.delete(time_period)
+        TableVersionService.bump("time_periods")
         db.session.commit()
+        response_cache.invalidate("time_periods")
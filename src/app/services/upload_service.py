@@ -1,42 +1,313 @@
+import datetime
+import itertools
+import mimetypes
 import os
-from typing import BinaryIO
+import shutil
+import tempfile
+from dataclasses import dataclass
+from typing import BinaryIO, Iterable, Iterator, Optional
 
-import boto3
+from sqlalchemy import or_, select
+
+from src.app.extensions import db
+from src.app.models.internships import Internships
+from src.app.models.internships_archive import InternshipsArchive
+from src.app.models.users import Users
+from src.app.services.internship_service import InternshipService
+from src.app.services.user_service import UserService
+from src.app.utils.image_processor import VARIANT_SIZES, ImageProcessor, variant_key
+from src.app.utils.s3 import MB, S3
+
+# Most keys a single DeleteObjects request accepts.
+DELETE_BATCH_SIZE = 1000
+
+
+@dataclass(frozen=True)
+class UploadKind:
+    """A kind of file users upload, e.g. a profile picture.
+
+    Objects are stored under the key `{prefix}_{owner id}.{extension}` in the
+    bucket named by the `container` environment variable. Pictures that are
+    `resized` also get the variants of `ImageProcessor` next to them.
+    """
+
+    prefix: str
+    container: str
+    extensions: frozenset[str]
+    max_size: int
+    resized: bool = False
+
+
+IMAGE_EXTENSIONS = frozenset({"png", "jpg", "jpeg", "gif"})
+
+PROFILE_PICTURE = UploadKind(
+    "profilepic", "AWS_BUCKET_NAME_PROFILEPICS", IMAGE_EXTENSIONS, 5 * MB, True
+)
+COMPANY_PICTURE = UploadKind(
+    "companypic", "AWS_BUCKET_NAME_COMPANYPICS", IMAGE_EXTENSIONS, 5 * MB, True
+)
+CV = UploadKind("cv", "AWS_BUCKET_NAME_CVS", frozenset({"pdf", "docx"}), 10 * MB)
+
+UPLOAD_KINDS = {kind.prefix: kind for kind in (PROFILE_PICTURE, COMPANY_PICTURE, CV)}
+
+# Columns holding the key and the link of the files stored in each bucket.
+UPLOAD_COLUMNS = {
+    "AWS_BUCKET_NAME_PROFILEPICS": (
+        (Users.profile_picture_key, Users.profile_picture_link),
+    ),
+    "AWS_BUCKET_NAME_CVS": ((Users.cv_key, Users.cv_link),),
+    "AWS_BUCKET_NAME_COMPANYPICS": (
+        (Internships.company_photo_key, Internships.company_photo_link),
+        (InternshipsArchive.company_photo_key, InternshipsArchive.company_photo_link),
+    ),
+}
+
+
+class UploadError(Exception):
+    """Raised when a file could not be stored in or removed from S3."""
 
 
 class UploadService:
-    """Service for upload-related tasks."""
+    """Service for upload-related tasks.
+
+    boto3 takes longer to import than the rest of the app together, so it is
+    only imported once a file is actually uploaded or deleted.
+    """
 
     @staticmethod
-    def upload_file_to_aws(
-        file: BinaryIO, filename: str, container: str, content_type: str
-    ):
-        """Create a function for the file upload endpoint."""
-        s3 = boto3.resource(
-            service_name="s3",
-            region_name=os.getenv("AWS_DEFAULT_REGION"),
-            aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-            aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
-        )
+    def object_key(kind: UploadKind, owner_id: int, filename: str) -> Optional[str]:
+        """Return the key a file is stored under, or None if its type is not allowed."""
+        extension = os.path.splitext(filename)[1]
+        if extension[1:] not in kind.extensions:
+            return None
+        return f"{kind.prefix}_{owner_id}{extension}"
 
-        s3.Bucket(os.getenv(container)).put_object(
-            Key=filename, Body=file, ContentType=content_type
-        )
+    @staticmethod
+    def recorded_key(
+        kind: UploadKind, owner_id: int, key: Optional[str], link: Optional[str]
+    ) -> Optional[str]:
+        """Return the key of the file a user or internship pointed at, if any.
+
+        Files uploaded before keys were stored only have a link, which ends
+        with the key. Links can be edited, so that key is only used if it is
+        one the owner's uploads are stored under.
+        """
+        if key is not None or not link:
+            return key
+        key = link.rsplit("/", 1)[-1]
+        return key if UploadService.object_key(kind, owner_id, key) == key else None
 
     @staticmethod
-    def delete_file_from_aws(filename: str, container: str):
-        """Create a function for the file deletion endpoint."""
-        s3 = boto3.resource(
-            service_name="s3",
-            region_name=os.getenv("AWS_DEFAULT_REGION"),
-            aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-            aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
-        )
-
-        bucket = s3.Bucket(os.getenv(container))
-        full_filenames = list(bucket.objects.filter(Prefix=filename))
-        full_filename = full_filenames[0].key
-        s3.Object(os.getenv(container), full_filename).delete()
+    def stored_keys(kind: UploadKind, key: str) -> list[str]:
+        """Return the keys of an uploaded file and of the variants made from it."""
+        if not kind.resized:
+            return [key]
+        return [key] + [variant_key(key, size) for size in VARIANT_SIZES]
+
+    @staticmethod
+    def process_picture(kind: UploadKind, owner_id: int, key: str) -> dict:
+        """Store resized variants of an uploaded picture and record their URLs.
+
+        Runs on the `ImageProcessor` pool. Returns the URLs by size, or an
+        empty dict if the picture was replaced before its variants were made.
+        """
+        bucket = os.getenv(kind.container)
+        s3 = S3.client()
+        with tempfile.SpooledTemporaryFile(max_size=MB) as original:
+            shutil.copyfileobj(s3.get_object(Bucket=bucket, Key=key)["Body"], original)
+            original.seek(0)
+            variants = ImageProcessor.render_variants(original)
+        if not UploadService.is_current(kind, owner_id, key):
+            return {}
+
+        urls = {}
+        for size, data in variants.items():
+            resized_key = variant_key(key, size)
+            s3.put_object(
+                Bucket=bucket, Key=resized_key, Body=data, ContentType="image/webp"
+            )
+            urls[str(size)] = UploadService.get_url_from_filename(
+                resized_key, kind.container
+            )
+
+        if kind is PROFILE_PICTURE:
+            UserService.set_profile_picture_variants(owner_id, key, urls)
+        else:
+            InternshipService.set_company_photo_variants(owner_id, key, urls)
+        return urls
+
+    @staticmethod
+    def is_current(kind: UploadKind, owner_id: int, key: str) -> bool:
+        """Return whether a user or internship still has the picture stored at key."""
+        if kind is PROFILE_PICTURE:
+            query = select(Users.profile_picture_key).where(Users.id == owner_id)
+        else:
+            query = select(Internships.company_photo_key).where(
+                Internships.id == owner_id
+            )
+        return db.session.scalar(query) == key
+
+    @staticmethod
+    def content_type(key: str) -> str:
+        """Return the content type a file is stored with, based on its extension."""
+        return mimetypes.guess_type(key)[0] or "application/octet-stream"
+
+    @staticmethod
+    def presign_upload(kind: UploadKind, key: str) -> dict:
+        """Return a presigned POST that lets a client upload a file to S3 itself.
+
+        The policy only accepts the given key, the content type of its
+        extension and files up to the kind's size limit. The result holds the
+        `url` to post to and the form `fields` to send before the file.
+        """
+        from botocore.exceptions import BotoCoreError, ClientError
+
+        content_type = UploadService.content_type(key)
+        try:
+            return S3.client().generate_presigned_post(
+                Bucket=os.getenv(kind.container),
+                Key=key,
+                Fields={"Content-Type": content_type},
+                Conditions=[
+                    {"Content-Type": content_type},
+                    ["content-length-range", 1, kind.max_size],
+                ],
+                ExpiresIn=S3.presign_expires,
+            )
+        except (BotoCoreError, ClientError) as e:
+            raise UploadError(str(e)) from e
+
+    @staticmethod
+    def file_exists(key: str, container: str) -> bool:
+        """Check whether an object exists, without downloading it."""
+        from botocore.exceptions import BotoCoreError, ClientError
+
+        try:
+            S3.client().head_object(Bucket=os.getenv(container), Key=key)
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                return False
+            raise UploadError(str(e)) from e
+        except BotoCoreError as e:
+            raise UploadError(str(e)) from e
+        return True
+
+    @staticmethod
+    def upload_file_to_aws(file: BinaryIO, filename: str, container: str):
+        """Upload a file, reading it in parts rather than all at once.
+
+        Large files are sent as a multipart upload, see `S3`. The content type
+        is guessed from the extension of `filename`.
+        """
+        from botocore.exceptions import BotoCoreError, ClientError
+
+        content_type = UploadService.content_type(filename)
+        try:
+            S3.client().upload_fileobj(
+                file,
+                os.getenv(container),
+                filename,
+                ExtraArgs={"ContentType": content_type},
+                Config=S3.transfer_config(),
+            )
+        except (BotoCoreError, ClientError) as e:
+            raise UploadError(str(e)) from e
+
+    @staticmethod
+    def delete_file_from_aws(key: str, container: str):
+        """Delete the object with the given key."""
+        from botocore.exceptions import BotoCoreError, ClientError
+
+        try:
+            S3.client().delete_object(Bucket=os.getenv(container), Key=key)
+        except (BotoCoreError, ClientError) as e:
+            raise UploadError(str(e)) from e
+
+    @staticmethod
+    def delete_replaced_file(old_key: Optional[str], key: str, container: str):
+        """Delete the object an upload replaced, if it had a different key.
+
+        A failure only leaves an unused object behind for `prune-uploads`, so
+        it does not fail the upload.
+        """
+        if old_key is None or old_key == key:
+            return
+        try:
+            UploadService.delete_file_from_aws(old_key, container)
+        except UploadError:
+            pass
+
+    @staticmethod
+    def delete_files_from_aws(keys: Iterable[str], container: str) -> int:
+        """Delete objects with DeleteObjects, up to 1000 keys per request.
+
+        Returns the number of objects deleted.
+        """
+        from botocore.exceptions import BotoCoreError, ClientError
+
+        s3 = S3.client()
+        bucket = os.getenv(container)
+        keys = iter(keys)
+        deleted = 0
+        while batch := list(itertools.islice(keys, DELETE_BATCH_SIZE)):
+            try:
+                response = s3.delete_objects(
+                    Bucket=bucket,
+                    Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True},
+                )
+            except (BotoCoreError, ClientError) as e:
+                raise UploadError(str(e)) from e
+            # Quiet mode only reports the keys that could not be deleted.
+            errors = response.get("Errors")
+            if errors:
+                raise UploadError(
+                    f"Could not delete {errors[0]['Key']}: {errors[0]['Message']}"
+                )
+            deleted += len(batch)
+        return deleted
+
+    @staticmethod
+    def referenced_keys(container: str) -> set[str]:
+        """Return the keys of the files in a bucket that are still in use.
+
+        Files uploaded before keys were stored are only referenced by their
+        link, which ends with the key. The variants of a key are kept with it.
+        """
+        keys = set()
+        for key_column, link_column in UPLOAD_COLUMNS[container]:
+            rows = db.session.execute(
+                select(key_column, link_column).where(
+                    or_(key_column.is_not(None), link_column.is_not(None))
+                )
+            )
+            for key, link in rows:
+                if key:
+                    keys.add(key)
+                    keys.update(variant_key(key, size) for size in VARIANT_SIZES)
+                if link:
+                    keys.add(link.rsplit("/", 1)[-1])
+        return keys
+
+    @staticmethod
+    def iter_unreferenced_keys(
+        container: str, before: datetime.datetime
+    ) -> Iterator[str]:
+        """Yield the keys of objects last modified before a time that are not in use.
+
+        Objects uploaded after `before` are skipped, since the row pointing at
+        them may not be committed yet.
+        """
+        from botocore.exceptions import BotoCoreError, ClientError
+
+        referenced = UploadService.referenced_keys(container)
+        paginator = S3.client().get_paginator("list_objects_v2")
+        try:
+            for page in paginator.paginate(Bucket=os.getenv(container)):
+                for item in page.get("Contents", ()):
+                    if item["Key"] not in referenced and item["LastModified"] < before:
+                        yield item["Key"]
+        except (BotoCoreError, ClientError) as e:
+            raise UploadError(str(e)) from e
 
     @staticmethod
     def get_url_from_filename(filename: str, container: str) -> str:
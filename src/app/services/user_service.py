@@ -1,6 +1,39 @@
+from typing import Iterable, Iterator, Optional
+
+from sqlalchemy import Row, Select, case, select, update
+from sqlalchemy.orm import InstrumentedAttribute
+
 from src.app.extensions import db
 from src.app.models.roles import RoleEnum
+from src.app.models.time_periods import TimePeriods
 from src.app.models.users import Users
+from src.app.utils.bulk_import import (
+    IMPORT_BATCH_SIZE,
+    MAX_ROSTER_ROWS,
+    TooManyRowsError,
+    parse_roster_user,
+)
+from src.app.utils.dialect import upsert_insert
+from src.app.utils.pagination import keyset_after, parse_cursor
+from src.app.utils.password_hasher import PasswordHasher
+from src.app.utils.serializers import USER_DETAIL_COLUMNS, select_users
+from src.app.utils.streaming import STREAM_BATCH_SIZE
+
+# Columns students can be sorted by, with the parser for their cursor value.
+STUDENT_SORT_COLUMNS = {
+    "id": (Users.id, int),
+    "gpa": (Users.gpa, float),
+    "last_name": (Users.last_name, str),
+}
+
+# Columns describing the file uploaded for each link a user can edit.
+_UPLOAD_COLUMNS_BY_LINK = {
+    "profile_picture_link": ("profile_picture_key", "profile_picture_variants"),
+    "cv_link": ("cv_key",),
+}
+
+# Columns access tokens are created from.
+_TOKEN_COLUMNS = (Users.id, Users.role_id, Users.token_version)
 
 
 class UserService:
@@ -13,19 +46,130 @@ class UserService:
         username: str,
         password: str,
         role_id: int,
-    ) -> Users:
-        """Create a new user."""
-        user = Users(
+    ) -> Optional[Row]:
+        """Create a new user, returning None if the username is taken.
+
+        This is a single INSERT ... ON CONFLICT DO NOTHING, so concurrent
+        registrations of a username cannot fail with an IntegrityError. The
+        returned row has the id, role_id and token_version of the user.
+        """
+        user = db.session.execute(
+            upsert_insert(Users)
+            .values(
+                first_name=first_name,
+                last_name=last_name,
+                username=username,
+                password=password,
+                role_id=role_id,
+            )
+            .on_conflict_do_nothing(index_elements=["username"])
+            .returning(*_TOKEN_COLUMNS)
+        ).first()
+        db.session.commit()
+        return user
+
+    @staticmethod
+    def get_or_create_user(
+        first_name: str,
+        last_name: str,
+        username: str,
+        password: str,
+        role_id: int,
+    ) -> Row:
+        """Return the user with a username, creating it if there is none.
+
+        Takes the password in plain text, and only hashes it if the user is
+        created. The returned row has the id, role_id and token_version.
+        """
+        statement = select(*_TOKEN_COLUMNS).where(Users.username == username)
+        user = db.session.execute(statement).first()
+        if user is not None:
+            return user
+
+        user = UserService.create_user(
             first_name=first_name,
             last_name=last_name,
             username=username,
-            password=password,
+            password=PasswordHasher.hash_password(password=password),
             role_id=role_id,
         )
-        db.session.add(user)
-        db.session.commit()
+        if user is None:
+            # Created by a concurrent request since the select.
+            user = db.session.execute(statement).first()
         return user
 
+    @staticmethod
+    def import_users(
+        records: Iterable[tuple[int, object]], role_id: int
+    ) -> tuple[int, list[dict]]:
+        """Create users from imported roster records in a single transaction.
+
+        Usernames taken in the database, or earlier in the roster, are
+        reported as conflicts with a single query before any hashing. The
+        remaining passwords are hashed in parallel and the users inserted in
+        batches. Returns the number of users created and an error for each
+        rejected record. Raises a ValueError if the records cannot be read.
+        """
+        errors = []
+        users = []
+        usernames = set()
+        for count, (line, record) in enumerate(records, start=1):
+            if count > MAX_ROSTER_ROWS:
+                raise TooManyRowsError(
+                    f"Too many rows, at most {MAX_ROSTER_ROWS} are allowed"
+                )
+            try:
+                values = parse_roster_user(record)
+            except ValueError as e:
+                errors.append({"line": line, "message": str(e)})
+                continue
+            if values["username"] in usernames:
+                errors.append({"line": line, "message": "Duplicate username"})
+                continue
+            usernames.add(values["username"])
+            users.append((line, values))
+
+        taken = set()
+        if usernames:
+            taken = set(
+                db.session.scalars(
+                    select(Users.username).where(Users.username.in_(usernames))
+                )
+            )
+        new_users = []
+        for line, values in users:
+            if values["username"] in taken:
+                errors.append({"line": line, "message": "Username already exists"})
+            else:
+                new_users.append((line, values))
+
+        hashes = PasswordHasher.hash_many(
+            [values["password"] for _, values in new_users]
+        )
+        for (_, values), hashed in zip(new_users, hashes):
+            values.update(password=hashed, role_id=role_id)
+
+        # Usernames registered since the check above are skipped, not errors.
+        statement = (
+            upsert_insert(Users)
+            .on_conflict_do_nothing(index_elements=["username"])
+            .returning(Users.username)
+        )
+        created = set()
+        for start in range(0, len(new_users), IMPORT_BATCH_SIZE):
+            batch = [
+                values for _, values in new_users[start : start + IMPORT_BATCH_SIZE]
+            ]
+            created.update(db.session.scalars(statement, batch))
+        for line, values in new_users:
+            if values["username"] not in created:
+                errors.append({"line": line, "message": "Username already exists"})
+
+        if created:
+            db.session.commit()
+        errors.sort(key=lambda error: error["line"])
+        return len(created), errors
+
     @staticmethod
     def update_user(
         user: Users,
@@ -44,7 +188,16 @@ class UserService:
         role_id: int,
         internship_time_period_id: int,
     ) -> Users:
-        """Update a user."""
+        """Update a user.
+
+        Pointing a file link elsewhere forgets the key and variants of the
+        uploaded file, which no longer belong to the user.
+        """
+        if profile_picture_link != user.profile_picture_link:
+            user.profile_picture_key = None
+            user.profile_picture_variants = None
+        if cv_link != user.cv_link:
+            user.cv_key = None
         user.first_name = first_name
         user.last_name = last_name
         user.gpa = gpa
@@ -63,20 +216,124 @@ class UserService:
         return user
 
     @staticmethod
-    def clear_profile_picture(user_id: int) -> Users:
-        """Clear the profile picture of a user."""
-        user = UserService.get_user_by_id(user_id)
-        user.profile_picture_link = None
+    def _forget_replaced_uploads(changes: dict) -> dict:
+        """Return the SET clauses that clear the uploads of changed file links.
+
+        The key and variants describe the uploaded file, so they are kept
+        only while the link still points at it. SET expressions see the old
+        values, so the link is compared before it is changed.
+        """
+        values = {}
+        for link, columns in _UPLOAD_COLUMNS_BY_LINK.items():
+            if link not in changes:
+                continue
+            unchanged = getattr(Users, link).is_not_distinct_from(changes[link])
+            for column in columns:
+                values[column] = case((unchanged, getattr(Users, column)), else_=None)
+        return values
+
+    @staticmethod
+    def update_profile(user_id: int, changes: dict) -> Optional[Row]:
+        """Update only the given profile columns of a user in one statement.
+
+        Returns the new row of the user, including the CV link, or None if the
+        user does not exist. Raises a ValueError if the time period is unknown.
+        """
+        time_period_id = changes.get("internship_time_period_id")
+        if time_period_id is not None and not db.session.scalar(
+            select(TimePeriods.id).where(TimePeriods.id == time_period_id)
+        ):
+            raise ValueError("Time period not found")
+
+        user = db.session.execute(
+            update(Users)
+            .where(Users.id == user_id)
+            .values(**changes, **UserService._forget_replaced_uploads(changes))
+            .returning(*USER_DETAIL_COLUMNS)
+        ).first()
         db.session.commit()
         return user
 
     @staticmethod
-    def clear_cv(user_id: int) -> Users:
-        """Clear the CV of a user."""
-        user = UserService.get_user_by_id(user_id)
-        user.cv_link = None
+    def _replace_file(
+        user_id: int,
+        key_column: InstrumentedAttribute,
+        link_column: InstrumentedAttribute,
+        values: dict,
+    ) -> tuple[Optional[str], Optional[str]]:
+        """Point one of a user's files at another object, returning the old key and link."""
+        old = db.session.execute(
+            select(key_column, link_column).where(Users.id == user_id)
+        ).first()
+        db.session.execute(update(Users).where(Users.id == user_id).values(values))
         db.session.commit()
-        return user
+        return tuple(old) if old is not None else (None, None)
+
+    @staticmethod
+    def set_profile_picture(
+        user_id: int, key: str, link: str
+    ) -> tuple[Optional[str], Optional[str]]:
+        """Set the uploaded profile picture of a user, returning the key and link it replaces."""
+        return UserService._replace_file(
+            user_id,
+            Users.profile_picture_key,
+            Users.profile_picture_link,
+            {
+                Users.profile_picture_key: key,
+                Users.profile_picture_link: link,
+                Users.profile_picture_variants: None,
+            },
+        )
+
+    @staticmethod
+    def set_profile_picture_variants(user_id: int, key: str, variants: dict) -> bool:
+        """Record the resized versions of a user's profile picture.
+
+        Nothing is recorded if the picture was replaced in the meantime.
+        """
+        result = db.session.execute(
+            update(Users)
+            .where(Users.id == user_id, Users.profile_picture_key == key)
+            .values(profile_picture_variants=variants)
+        )
+        db.session.commit()
+        return result.rowcount == 1
+
+    @staticmethod
+    def clear_profile_picture(user_id: int) -> tuple[Optional[str], Optional[str]]:
+        """Clear the profile picture of a user, returning its key and link."""
+        return UserService._replace_file(
+            user_id,
+            Users.profile_picture_key,
+            Users.profile_picture_link,
+            {
+                Users.profile_picture_key: None,
+                Users.profile_picture_link: None,
+                Users.profile_picture_variants: None,
+            },
+        )
+
+    @staticmethod
+    def set_cv(
+        user_id: int, key: str, link: str
+    ) -> tuple[Optional[str], Optional[str]]:
+        """Set the uploaded CV of a user, returning the key and link it replaces."""
+        return UserService._replace_file(
+            user_id,
+            Users.cv_key,
+            Users.cv_link,
+            {Users.cv_key: key, Users.cv_link: link},
+        )
+
+    @staticmethod
+    def clear_cv(user_id: int) -> tuple[Optional[str], Optional[str]]:
+        """Clear the CV of a user, returning its key and link."""
+        return UserService._replace_file(
+            user_id,
+            Users.cv_key,
+            Users.cv_link,
+            {Users.cv_key: None, Users.cv_link: None},
+        )
 
     @staticmethod
     def get_user_by_username(username: str) -> Users:
@@ -84,14 +341,128 @@ class UserService:
         return Users.query.filter_by(username=username).first()
 
     @staticmethod
-    def get_all_users() -> list[Users]:
-        """Return all users."""
-        return Users.query.all()
+    def username_exists(username: str) -> bool:
+        """Return whether a user with the username exists."""
+        statement = select(Users.id).where(Users.username == username)
+        return db.session.scalar(statement) is not None
+
+    @staticmethod
+    def _users_query(role_id: Optional[int], fields: Optional[list[str]]) -> Select:
+        """Build the query behind the user listings, ordered by id."""
+        statement = select_users(fields=fields)
+        if role_id is not None:
+            statement = statement.where(Users.role_id == role_id)
+        return statement.order_by(Users.id)
+
+    @staticmethod
+    def get_users(
+        limit: int,
+        after: Optional[list] = None,
+        role_id: Optional[int] = None,
+        fields: Optional[list[str]] = None,
+    ) -> list[Row]:
+        """Return one page of user rows ordered by id.
+
+        `after` is the decoded cursor of the previous page, i.e. the id of its
+        last row. Raises a ValueError if it is malformed. With `fields` only
+        those columns (and the id) are selected.
+        """
+        statement = UserService._users_query(role_id, fields)
+        if after is not None:
+            (after_id,) = parse_cursor(after, (int,))
+            statement = statement.where(Users.id > after_id)
+        return db.session.execute(statement.limit(limit)).all()
+
+    @staticmethod
+    def iter_users(
+        role_id: Optional[int] = None, fields: Optional[list[str]] = None
+    ) -> Iterator[Row]:
+        """Iterate over the rows of all matching users, fetching them in batches."""
+        statement = UserService._users_query(role_id, fields)
+        return iter(
+            db.session.execute(statement.execution_options(yield_per=STREAM_BATCH_SIZE))
+        )
+
+    @staticmethod
+    def search_students(
+        limit: int,
+        sort: str = "id",
+        descending: bool = False,
+        after: Optional[list] = None,
+        gpa_min: Optional[float] = None,
+        gpa_max: Optional[float] = None,
+        academic_year: Optional[str] = None,
+        time_period_id: Optional[int] = None,
+        fields: Optional[list[str]] = None,
+    ) -> list[Row]:
+        """Return one page of matching student rows ordered by (sort, id).
+
+        Sorting by gpa or last_name only returns students who have one set, and
+        the sort field is included even if it is not in `fields`.
+        `after` is the decoded cursor of the previous page, i.e. the sort value
+        and id of its last row. Raises a ValueError if it is malformed.
+        """
+        sort_column, parse_sort_value = STUDENT_SORT_COLUMNS[sort]
+        # The sort value is needed for the cursor of the page.
+        if fields is not None and sort not in fields:
+            fields = fields + [sort]
+        statement = select_users(fields=fields).where(
+            Users.role_id == RoleEnum.student.value
+        )
+
+        if gpa_min is not None:
+            statement = statement.where(Users.gpa >= gpa_min)
+        if gpa_max is not None:
+            statement = statement.where(Users.gpa <= gpa_max)
+        if academic_year is not None:
+            statement = statement.where(Users.academic_year == academic_year)
+        if time_period_id is not None:
+            statement = statement.where(
+                Users.internship_time_period_id == time_period_id
+            )
+
+        if sort_column is Users.id:
+            key_columns = (Users.id,)
+            parsers = (int,)
+        else:
+            statement = statement.where(sort_column.is_not(None))
+            key_columns = (sort_column, Users.id)
+            parsers = (parse_sort_value, int)
+        if after is not None:
+            after_key = parse_cursor(after, parsers)
+            statement = statement.where(
+                keyset_after(key_columns, after_key, descending)
+            )
+
+        if descending:
+            statement = statement.order_by(*(column.desc() for column in key_columns))
+        else:
+            statement = statement.order_by(*key_columns)
+        return db.session.execute(statement.limit(limit)).all()
+
+    @staticmethod
+    def get_user_row(user_id: int) -> Optional[Row]:
+        """Return the row of a user, including the CV link."""
+        statement = select_users(detail=True).where(Users.id == user_id)
+        return db.session.execute(statement).first()
+
+    @staticmethod
+    def update_password(user_id: int, password: str) -> None:
+        """Replace the password hash of a user."""
+        db.session.execute(
+            update(Users).where(Users.id == user_id).values(password=password)
+        )
+        db.session.commit()
+
+    @staticmethod
+    def get_role_id(user_id: int) -> Optional[int]:
+        """Return the role id of a user, or None if the user does not exist."""
+        return db.session.scalar(select(Users.role_id).where(Users.id == user_id))
 
     @staticmethod
-    def get_all_students() -> list[Users]:
-        """Return all students."""
-        return Users.query.filter_by(role_id=RoleEnum.student.value).all()
+    def get_token_version(user_id: int) -> Optional[int]:
+        """Return the token version of a user, or None if the user does not exist."""
+        return db.session.scalar(select(Users.token_version).where(Users.id == user_id))
 
     @staticmethod
     def get_user_by_id(user_id: int) -> Users:
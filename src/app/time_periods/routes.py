@@ -1,10 +1,14 @@
 from flask import Response, jsonify
 
+from src.app.extensions import response_cache
 from src.app.services.time_period_service import TimePeriodService
 from src.app.time_periods import bp
+from src.app.utils.conditional import conditional
 
 
 @bp.route("/time_periods", methods=["GET"])
+@conditional("time_periods", daily=True)
+@response_cache.cached("time_periods")
 def get_time_periods() -> Response:
     """Return all time periods."""
     time_periods = TimePeriodService.get_valid_time_periods()
@@ -23,6 +27,8 @@ def get_time_periods() -> Response:
 
 
 @bp.route("/time_periods/all", methods=["GET"])
+@conditional("time_periods")
+@response_cache.cached("time_periods")
 def get_all_time_periods() -> Response:
     """Return all time periods."""
     time_periods = TimePeriodService.get_time_periods()
@@ -1,14 +1,83 @@
 """Module for upload related routes."""
-import os
-from io import BytesIO
+from typing import Optional, Union
 
-from botocore.exceptions import BotoCoreError, ClientError
 from flask import Response, jsonify, make_response, request
 from flask_jwt_extended import get_jwt_identity, jwt_required
 
-from src.app.services.upload_service import UploadService
+from src.app.models.roles import RoleEnum
+from src.app.services.internship_service import InternshipService
+from src.app.services.upload_service import (
+    COMPANY_PICTURE,
+    CV,
+    PROFILE_PICTURE,
+    UPLOAD_KINDS,
+    UploadError,
+    UploadKind,
+    UploadService,
+)
 from src.app.services.user_service import UserService
 from src.app.upload import bp
+from src.app.utils.auth import current_role
+from src.app.utils.image_processor import ImageProcessor
+
+
+def _check_internship_author(internship_id: str) -> Optional[Response]:
+    """Return an error response unless the user may change the internship's photo."""
+    internship = (
+        InternshipService.get_internship(int(internship_id))
+        if internship_id.isdigit()
+        else None
+    )
+    if internship is None:
+        response = {"message": "Internship not found"}
+        return make_response(jsonify(response), 404)
+    if (
+        internship.author_id != get_jwt_identity()
+        and current_role() != RoleEnum.admin.value
+    ):
+        response = {"message": "Unauthorized"}
+        return make_response(jsonify(response), 401)
+    return None
+
+
+def _owner_id(kind: UploadKind, internship_id: object) -> Union[int, Response]:
+    """Return the id a file is stored under, or an error response."""
+    if kind is not COMPANY_PICTURE:
+        return get_jwt_identity()
+    error = _check_internship_author(str(internship_id))
+    return error if error is not None else int(internship_id)
+
+
+def _record_upload(kind: UploadKind, owner_id: int, key: str) -> Response:
+    """Point the user or internship at an uploaded file and delete the one it replaces."""
+    url = UploadService.get_url_from_filename(key, kind.container)
+    if kind is PROFILE_PICTURE:
+        old_key, old_link = UserService.set_profile_picture(owner_id, key, url)
+    elif kind is CV:
+        old_key, old_link = UserService.set_cv(owner_id, key, url)
+    else:
+        old_key, old_link = InternshipService.set_company_photo(owner_id, key, url)
+    old_key = UploadService.recorded_key(kind, owner_id, old_key, old_link)
+    UploadService.delete_replaced_file(old_key, key, kind.container)
+    if kind.resized:
+        ImageProcessor.submit(UploadService.process_picture, kind, owner_id, key)
+    return jsonify({"message": "File uploaded successfully", "url": url})
+
+
+def _upload_file(kind: UploadKind, owner_id: int, invalid_format: str) -> Response:
+    """Upload the file of the request through the app and record it."""
+    file = request.files["file"]
+    key = UploadService.object_key(kind, owner_id, file.filename)
+    if key is None:
+        return jsonify({"error": invalid_format})
+
+    try:
+        UploadService.upload_file_to_aws(file.stream, key, kind.container)
+    except UploadError as e:
+        response = {"message": "Error uploading file: {}".format(str(e))}
+        return make_response(jsonify(response), 500)
+
+    return _record_upload(kind, owner_id, key)
 
 
 @bp.route("/upload_profilepic", methods=["OPTIONS", "PUT"])
@@ -22,27 +91,11 @@ def upload_profilepic() -> Response:
         response.headers.add("Access-Control-Allow-Methods", "*")
         return response
 
-    file = request.files["file"]
-    allowed_extensions = {"png", "jpg", "jpeg", "gif"}
-    filename, file_extension = os.path.splitext(file.filename)
-
-    if file_extension[1:] not in allowed_extensions:
-        return jsonify({"error": "Invalid file format. Only image files are allowed."})
-
-    filename = f"profilepic_{get_jwt_identity()}{file_extension}"
-    file_content = file.read()
-    url = UploadService.get_url_from_filename(filename, "AWS_BUCKET_NAME_PROFILEPICS")
-
-    try:
-        UploadService.upload_file_to_aws(
-            BytesIO(file_content), filename, "AWS_BUCKET_NAME_PROFILEPICS", "image/png"
-        )
-        return jsonify(
-            {"message": "File uploaded successfully", "url": url}
-        )  # Return success response
-    except (BotoCoreError, ClientError) as e:
-        response = {"message": "Error uploading file: {}".format(str(e))}
-        return make_response(jsonify(response), 500)
+    return _upload_file(
+        PROFILE_PICTURE,
+        get_jwt_identity(),
+        "Invalid file format. Only image files are allowed.",
+    )
 
 
 @bp.route("/upload_companypic", methods=["OPTIONS", "PUT"])
@@ -56,27 +109,13 @@ def upload_companypic() -> Response:
         response.headers.add("Access-Control-Allow-Methods", "*")
         return response
 
-    file = request.files["file"]
-    allowed_extensions = {"png", "jpg", "jpeg", "gif"}
-    filename, file_extension = os.path.splitext(file.filename)
-
-    if file_extension[1:] not in allowed_extensions:
-        return jsonify({"error": "Invalid file format. Only image files are allowed."})
-
-    filename = f"companypic_{request.form['internship_id']}{file_extension}"
-    file_content = file.read()
-    url = UploadService.get_url_from_filename(filename, "AWS_BUCKET_NAME_COMPANYPICS")
+    owner_id = _owner_id(COMPANY_PICTURE, request.form["internship_id"])
+    if isinstance(owner_id, Response):
+        return owner_id
 
-    try:
-        UploadService.upload_file_to_aws(
-            BytesIO(file_content), filename, "AWS_BUCKET_NAME_COMPANYPICS", "image/png"
-        )
-        return jsonify(
-            {"message": "File uploaded successfully", "url": url}
-        )  # Return success response
-    except (BotoCoreError, ClientError) as e:
-        response = {"message": "Error uploading file: {}".format(str(e))}
-        return make_response(jsonify(response), 500)
+    return _upload_file(
+        COMPANY_PICTURE, owner_id, "Invalid file format. Only image files are allowed."
+    )
 
 
 @bp.route("/upload_cv", methods=["OPTIONS", "PUT"])
@@ -90,27 +129,87 @@ def upload_cv() -> Response:
         response.headers.add("Access-Control-Allow-Methods", "*")
         return response
 
-    file = request.files["file"]
-    allowed_extensions = {"pdf", "docx"}
-    filename, file_extension = os.path.splitext(file.filename)
+    return _upload_file(
+        CV,
+        get_jwt_identity(),
+        "Invalid file format. Only pdf or docx files are allowed.",
+    )
 
-    if file_extension[1:] not in allowed_extensions:
-        return jsonify(
-            {"error": "Invalid file format. Only pdf or docx files are allowed."}
-        )
 
-    filename = f"cv_{get_jwt_identity()}{file_extension}"
-    file_content = file.read()
-    url = UploadService.get_url_from_filename(filename, "AWS_BUCKET_NAME_CVS")
+@bp.route("/presign_upload", methods=["POST"])
+@jwt_required()
+def presign_upload() -> Response:
+    """Return a presigned POST for uploading a file straight to S3.
 
+    The client posts the file to `url` with the form `fields`, then calls
+    /complete_upload with the `key`, so the file never passes through the app.
+    """
     try:
-        UploadService.upload_file_to_aws(
-            BytesIO(file_content), filename, "AWS_BUCKET_NAME_CVS", "application/pdf"
-        )
-        return jsonify({"message": "File uploaded successfully", "url": url})
-    except (BotoCoreError, ClientError) as e:
+        kind = UPLOAD_KINDS[request.json["kind"]]
+        filename = request.json["filename"]
+        if not isinstance(filename, str):
+            raise TypeError("Invalid filename")
+    except (KeyError, TypeError):
+        response = {"message": "Invalid request body"}
+        return make_response(jsonify(response), 400)
+
+    owner_id = _owner_id(kind, request.json.get("internship_id"))
+    if isinstance(owner_id, Response):
+        return owner_id
+
+    key = UploadService.object_key(kind, owner_id, filename)
+    if key is None:
+        response = {"message": "Invalid file format"}
+        return make_response(jsonify(response), 400)
+
+    try:
+        post = UploadService.presign_upload(kind, key)
+    except UploadError as e:
+        response = {"message": "Error uploading file: {}".format(str(e))}
+        return make_response(jsonify(response), 500)
+
+    return jsonify(
+        {
+            "url": post["url"],
+            "fields": post["fields"],
+            "key": key,
+            "max_size": kind.max_size,
+        }
+    )
+
+
+@bp.route("/complete_upload", methods=["POST"])
+@jwt_required()
+def complete_upload() -> Response:
+    """Record a file uploaded with /presign_upload on the user or internship."""
+    try:
+        kind = UPLOAD_KINDS[request.json["kind"]]
+        key = request.json["key"]
+        if not isinstance(key, str):
+            raise TypeError("Invalid key")
+    except (KeyError, TypeError):
+        response = {"message": "Invalid request body"}
+        return make_response(jsonify(response), 400)
+
+    owner_id = _owner_id(kind, request.json.get("internship_id"))
+    if isinstance(owner_id, Response):
+        return owner_id
+
+    # Only the key /presign_upload would have issued to this user is accepted.
+    if UploadService.object_key(kind, owner_id, key) != key:
+        response = {"message": "Invalid key"}
+        return make_response(jsonify(response), 400)
+
+    try:
+        uploaded = UploadService.file_exists(key, kind.container)
+    except UploadError as e:
         response = {"message": "Error uploading file: {}".format(str(e))}
         return make_response(jsonify(response), 500)
+    if not uploaded:
+        response = {"message": "File not found"}
+        return make_response(jsonify(response), 404)
+
+    return _record_upload(kind, owner_id, key)
 
 
 @bp.route("/delete_profilepic", methods=["OPTIONS", "DELETE"])
@@ -124,13 +223,19 @@ def delete_profilepic() -> Response:
         response.headers.add("Access-Control-Allow-Methods", "*")
         return response
 
-    filename = f"profilepic_{get_jwt_identity()}"
+    user_id = get_jwt_identity()
+    key = UploadService.recorded_key(
+        PROFILE_PICTURE, user_id, *UserService.clear_profile_picture(user_id)
+    )
+    if key is None:
+        return make_response(jsonify({"message": "File not found"}), 404)
 
     try:
-        UploadService.delete_file_from_aws(filename, "AWS_BUCKET_NAME_PROFILEPICS")
-        UserService.clear_profile_picture(user_id=get_jwt_identity())
+        UploadService.delete_files_from_aws(
+            UploadService.stored_keys(PROFILE_PICTURE, key), PROFILE_PICTURE.container
+        )
         return jsonify({"message": "File deleted successfully"})
-    except (BotoCoreError, ClientError) as e:
+    except UploadError as e:
         response = {"message": "Error deleting file: {}".format(str(e))}
         return make_response(jsonify(response), 500)
 
@@ -146,12 +251,25 @@ def delete_companypic() -> Response:
         response.headers.add("Access-Control-Allow-Methods", "*")
         return response
 
-    filename = f"companypic_{request.form['internship_id']}"
+    internship_id = request.form["internship_id"]
+    error = _check_internship_author(internship_id)
+    if error is not None:
+        return error
+
+    key = UploadService.recorded_key(
+        COMPANY_PICTURE,
+        int(internship_id),
+        *InternshipService.set_company_photo(int(internship_id), None, None),
+    )
+    if key is None:
+        return make_response(jsonify({"message": "File not found"}), 404)
 
     try:
-        UploadService.delete_file_from_aws(filename, "AWS_BUCKET_NAME_COMPANYPICS")
+        UploadService.delete_files_from_aws(
+            UploadService.stored_keys(COMPANY_PICTURE, key), COMPANY_PICTURE.container
+        )
         return jsonify({"message": "File deleted successfully"})
-    except (BotoCoreError, ClientError) as e:
+    except UploadError as e:
         response = {"message": "Error deleting file: {}".format(str(e))}
         return make_response(jsonify(response), 500)
 
@@ -167,12 +285,14 @@ def delete_cv() -> Response:
         response.headers.add("Access-Control-Allow-Methods", "*")
         return response
 
-    filename = f"cv_{get_jwt_identity()}"
+    user_id = get_jwt_identity()
+    key = UploadService.recorded_key(CV, user_id, *UserService.clear_cv(user_id))
+    if key is None:
+        return make_response(jsonify({"message": "File not found"}), 404)
 
     try:
-        UploadService.delete_file_from_aws(filename, "AWS_BUCKET_NAME_CVS")
-        UserService.clear_cv(user_id=get_jwt_identity())
+        UploadService.delete_file_from_aws(key, "AWS_BUCKET_NAME_CVS")
         return jsonify({"message": "File deleted successfully"})
-    except (BotoCoreError, ClientError) as e:
+    except UploadError as e:
         response = {"message": "Error deleting file: {}".format(str(e))}
         return make_response(jsonify(response), 500)
@@ -1,12 +1,38 @@
 """Module for users related endpoints."""
+from typing import Optional
+
 from flask import Response, jsonify, make_response, request
-from flask_jwt_extended import create_access_token, get_jwt_identity, jwt_required
+from flask_jwt_extended import get_jwt_identity, jwt_required
 
+from src.app.extensions import rate_limiter
 from src.app.models.roles import RoleEnum
 from src.app.models.users import Users
-from src.app.services.user_service import UserService
+from src.app.services.user_service import STUDENT_SORT_COLUMNS, UserService
 from src.app.users import bp
-from src.app.utils.password_hasher import PasswordHasher
+from src.app.utils.auth import create_user_token, require_role
+from src.app.utils.bulk_import import IMPORT_MIMETYPES, TooManyRowsError, iter_records
+from src.app.utils.pagination import (
+    decode_cursor,
+    paginate,
+    parse_bool,
+    parse_fields,
+    parse_float,
+    parse_int,
+    parse_limit,
+    set_next_cursor,
+)
+from src.app.utils.password_hasher import PasswordHasher, PasswordHasherBusyError
+from src.app.utils.profile import parse_profile_changes
+from src.app.utils.serializers import USER_FIELDS, user_to_json, users_to_json
+from src.app.utils.streaming import stream_json_array
+
+
+@bp.errorhandler(PasswordHasherBusyError)
+def password_hasher_busy(error: PasswordHasherBusyError) -> Response:
+    """Ask the client to retry when too many passwords are being hashed."""
+    response = make_response(jsonify({"message": "Server busy, try again later"}), 503)
+    response.headers["Retry-After"] = "1"
+    return response
 
 
 @bp.route("/student")
@@ -24,10 +50,10 @@ def get_current_user() -> Response:
 
 
 @bp.route("/users/google/login", methods=["POST"])
+@rate_limiter.limit("login")
 def google_login() -> Response:
     """Generate a JWT token for the user."""
     try:
-        print(request.json)
         first_name = request.json["first_name"]
         last_name = request.json["last_name"]
         username = request.json["username"]
@@ -36,24 +62,20 @@ def google_login() -> Response:
         response = {"message": "Invalid request"}
         return make_response(jsonify(response), 400)
 
-    user = Users.query.filter_by(username=username).first()
-
-    if user is None:
-        UserService.create_user(
-            first_name=first_name,
-            last_name=last_name,
-            username=username,
-            password=PasswordHasher.hash_password(password=password),
-            role_id=RoleEnum.student.value,
-        )
-
-    user = Users.query.filter_by(username=username).first()
+    user = UserService.get_or_create_user(
+        first_name=first_name,
+        last_name=last_name,
+        username=username,
+        password=password,
+        role_id=RoleEnum.student.value,
+    )
 
-    access_token = create_access_token(identity=user.id)
+    access_token = create_user_token(user)
     return jsonify(access_token=access_token)
 
 
 @bp.route("/users/login", methods=["POST"])
+@rate_limiter.limit("login")
 def login() -> Response:
     """Generate a JWT token for the user."""
     try:
@@ -72,11 +94,17 @@ def login() -> Response:
         response = {"message": "Invalid password"}
         return make_response(jsonify(response), 401)
 
-    access_token = create_access_token(identity=user.id)
+    if PasswordHasher.needs_rehash(user.password):
+        UserService.update_password(
+            user.id, PasswordHasher.hash_password(password=password)
+        )
+
+    access_token = create_user_token(user)
     return jsonify(access_token=access_token)
 
 
 @bp.route("/users/register", methods=["POST"])
+@rate_limiter.limit("register")
 def register() -> Response:
     """Register a new user."""
     try:
@@ -88,11 +116,13 @@ def register() -> Response:
         response = {"message": "Invalid request body"}
         return make_response(jsonify(response), 400)
 
-    if UserService.get_user_by_username(username=username):
+    # Checked first to not spend a hash on a taken username. The insert
+    # still handles a concurrent registration of it.
+    if UserService.username_exists(username):
         response = {"message": "Username already exists"}
         return make_response(jsonify(response), 409)
 
-    UserService.create_user(
+    user = UserService.create_user(
         first_name=first_name,
         last_name=last_name,
         username=username,
@@ -100,95 +130,148 @@ def register() -> Response:
         role_id=RoleEnum.student.value,
     )
 
+    if user is None:
+        response = {"message": "Username already exists"}
+        return make_response(jsonify(response), 409)
+
     response = {"message": "User created successfully"}
     return make_response(jsonify(response), 201)
 
 
+def _list_users(role_id: Optional[int]) -> Response:
+    """Return a page of users, or stream all of them with `stream=1`."""
+    try:
+        stream = parse_bool(request.args.get("stream"))
+        fields = parse_fields(request.args.get("fields"), USER_FIELDS)
+        limit = parse_limit(request.args.get("limit"))
+        cursor = request.args.get("cursor")
+        after = decode_cursor(cursor) if cursor else None
+        if not stream:
+            users = UserService.get_users(
+                limit=limit + 1, after=after, role_id=role_id, fields=fields
+            )
+    except ValueError:
+        response = {"message": "Invalid query parameters"}
+        return make_response(jsonify(response), 400)
+
+    if stream:
+        return stream_json_array(
+            UserService.iter_users(role_id=role_id, fields=fields), user_to_json
+        )
+
+    users, next_cursor = paginate(users, limit, lambda user: (user.id,))
+
+    return set_next_cursor(jsonify(users_to_json(users)), next_cursor)
+
+
+@bp.route("/users/import", methods=["POST"])
+@jwt_required()
+@require_role(RoleEnum.admin, RoleEnum.instructor)
+def import_users() -> Response:
+    """Register the students of a CSV or JSON Lines roster.
+
+    Each row needs a username, password, first_name and last_name. Rows that
+    are invalid or whose username is taken are skipped and reported with
+    their line number.
+    """
+    if request.mimetype not in IMPORT_MIMETYPES:
+        response = {"message": "Unsupported content type"}
+        return make_response(jsonify(response), 415)
+
+    try:
+        created, errors = UserService.import_users(
+            iter_records(request.stream, request.mimetype),
+            role_id=RoleEnum.student.value,
+        )
+    except TooManyRowsError as e:
+        response = {"message": str(e)}
+        return make_response(jsonify(response), 400)
+    except ValueError:
+        response = {"message": "Invalid file"}
+        return make_response(jsonify(response), 400)
+
+    if not created:
+        response = {"message": "No users imported", "errors": errors}
+        return make_response(jsonify(response), 400)
+
+    response = {
+        "message": "Users imported successfully",
+        "created": created,
+        "errors": errors,
+    }
+    return make_response(jsonify(response), 201)
+
+
 @bp.route("/users", methods=["GET"])
 def get_all_users() -> Response:
-    """Return all users."""
-    users = UserService.get_all_users()
-    users_json = [
-        {
-            "id": user.id,
-            "first_name": user.first_name,
-            "last_name": user.last_name,
-            "username": user.username,
-            "gpa": user.gpa,
-            "academic_year": user.academic_year,
-            "github_link": user.github_link,
-            "linkedin_link": user.linkedin_link,
-            "website_link": user.website_link,
-            "profile_picture_link": user.profile_picture_link,
-            "email": user.email,
-            "phone_number": user.phone_number,
-            "description": user.description,
-            "role_id": user.role_id,
-            "internship_time_period_id": user.internship_time_period_id,
-        }
-        for user in users
-    ]
-
-    return jsonify(users_json)
+    """Return a page of users ordered by id.
+
+    The cursor for the next page is returned in the X-Next-Cursor header and
+    passed back as `cursor`. `fields` narrows each user to the listed
+    fields, e.g. `fields=id,first_name,last_name`. With `stream=1` every
+    user is streamed in one response instead.
+    """
+    return _list_users(role_id=None)
 
 
 @bp.route("/users/students", methods=["GET"])
 def get_all_students() -> Response:
-    """Return all students."""
-    students = UserService.get_all_students()
-    students_json = [
-        {
-            "id": student.id,
-            "first_name": student.first_name,
-            "last_name": student.last_name,
-            "username": student.username,
-            "gpa": student.gpa,
-            "academic_year": student.academic_year,
-            "github_link": student.github_link,
-            "linkedin_link": student.linkedin_link,
-            "website_link": student.website_link,
-            "profile_picture_link": student.profile_picture_link,
-            "email": student.email,
-            "phone_number": student.phone_number,
-            "description": student.description,
-            "role_id": student.role_id,
-            "internship_time_period_id": student.internship_time_period_id,
-        }
-        for student in students
-    ]
-
-    return jsonify(students_json)
+    """Return a page of students, with the same parameters as `/users`."""
+    return _list_users(role_id=RoleEnum.student.value)
+
+
+@bp.route("/users/students/search", methods=["GET"])
+def search_students() -> Response:
+    """Return a page of students matching the given filters.
+
+    Filters are `gpa_min`, `gpa_max`, `academic_year` and `time_period_id`.
+    Pages are ordered by `sort` (id, gpa or last_name) and `order` (asc or
+    desc), with the next cursor in the X-Next-Cursor header. `fields`
+    works as for `/users`.
+    """
+    sort = request.args.get("sort", "id")
+    order = request.args.get("order", "asc")
+    try:
+        if sort not in STUDENT_SORT_COLUMNS or order not in ("asc", "desc"):
+            raise ValueError("Invalid sort")
+        limit = parse_limit(request.args.get("limit"))
+        cursor = request.args.get("cursor")
+        students = UserService.search_students(
+            limit=limit + 1,
+            sort=sort,
+            descending=order == "desc",
+            after=decode_cursor(cursor) if cursor else None,
+            gpa_min=parse_float(request.args.get("gpa_min")),
+            gpa_max=parse_float(request.args.get("gpa_max")),
+            academic_year=request.args.get("academic_year"),
+            time_period_id=parse_int(request.args.get("time_period_id")),
+            fields=parse_fields(request.args.get("fields"), USER_FIELDS),
+        )
+    except ValueError:
+        response = {"message": "Invalid query parameters"}
+        return make_response(jsonify(response), 400)
+
+    students, next_cursor = paginate(
+        students,
+        limit,
+        lambda student: (student.id,)
+        if sort == "id"
+        else (getattr(student, sort), student.id),
+    )
+
+    return set_next_cursor(jsonify(users_to_json(students)), next_cursor)
 
 
 @bp.route("/users/<int:user_id>", methods=["GET"])
 @jwt_required()
 def get_user(user_id: int) -> Response:
     """Return a user by id."""
-    user = UserService.get_user_by_id(user_id)
+    user = UserService.get_user_row(user_id)
     if user is None:
         response = {"message": "User not found"}
         return make_response(jsonify(response), 404)
 
-    user_json = {
-        "id": user.id,
-        "first_name": user.first_name,
-        "last_name": user.last_name,
-        "username": user.username,
-        "gpa": user.gpa,
-        "academic_year": user.academic_year,
-        "github_link": user.github_link,
-        "linkedin_link": user.linkedin_link,
-        "website_link": user.website_link,
-        "profile_picture_link": user.profile_picture_link,
-        "cv_link": user.cv_link,
-        "email": user.email,
-        "phone_number": user.phone_number,
-        "description": user.description,
-        "role_id": user.role_id,
-        "internship_time_period_id": user.internship_time_period_id,
-    }
-
-    return jsonify(user_json)
+    return jsonify(user_to_json(user))
 
 
 @bp.route("/users/edit_profile", methods=["PUT"])
@@ -245,3 +328,24 @@ def edit_user_profile() -> Response:
     )
     response = {"message": "User profile updated successfully"}
     return make_response(jsonify(response), 200)
+
+
+@bp.route("/users/edit_profile", methods=["PATCH"])
+@jwt_required()
+def patch_user_profile() -> Response:
+    """Update the given fields of the user profile and return the new profile.
+
+    Fields left out of the body are not changed, and null clears a field.
+    """
+    try:
+        changes = parse_profile_changes(request.get_json(silent=True))
+        user = UserService.update_profile(get_jwt_identity(), changes)
+    except ValueError as e:
+        response = {"message": str(e)}
+        return make_response(jsonify(response), 400)
+
+    if user is None:
+        response = {"message": "User not found"}
+        return make_response(jsonify(response), 404)
+
+    return jsonify(user_to_json(user))
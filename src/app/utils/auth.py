@@ -0,0 +1,96 @@
+"""Module containing role based authorization from access token claims."""
+import functools
+import threading
+import time
+from typing import Callable, Optional, Union
+
+from flask import Response, current_app, jsonify, make_response
+from flask_jwt_extended import create_access_token, get_jwt, get_jwt_identity
+from sqlalchemy import Row
+
+from src.app.models.roles import RoleEnum
+from src.app.models.users import Users
+from src.app.services.user_service import UserService
+
+ROLE_CLAIM = "role"
+TOKEN_VERSION_CLAIM = "token_version"
+
+# Cached token versions are dropped wholesale past this many users.
+MAX_CACHED_TOKEN_VERSIONS = 10000
+
+# user id -> (token version, monotonic expiry time)
+_token_versions: dict[int, tuple[Optional[int], float]] = {}
+_token_versions_lock = threading.Lock()
+
+
+def create_user_token(user: Union[Users, Row]) -> str:
+    """Create an access token carrying the user's role and token version."""
+    return create_access_token(
+        identity=user.id,
+        additional_claims={
+            ROLE_CLAIM: user.role_id,
+            TOKEN_VERSION_CLAIM: user.token_version,
+        },
+    )
+
+
+def _token_version(user_id: int) -> Optional[int]:
+    """Return the current token version of a user, cached for a few seconds."""
+    now = time.monotonic()
+    with _token_versions_lock:
+        cached = _token_versions.get(user_id)
+    if cached is not None and cached[1] > now:
+        return cached[0]
+
+    version = UserService.get_token_version(user_id)
+    ttl = current_app.config.get("TOKEN_VERSION_CACHE_TTL", 5)
+    with _token_versions_lock:
+        if len(_token_versions) >= MAX_CACHED_TOKEN_VERSIONS:
+            _token_versions.clear()
+        _token_versions[user_id] = (version, now + ttl)
+    return version
+
+
+def forget_token_version(user_id: Optional[int] = None) -> None:
+    """Drop the cached token version of a user, or of every user if None."""
+    with _token_versions_lock:
+        if user_id is None:
+            _token_versions.clear()
+        else:
+            _token_versions.pop(user_id, None)
+
+
+def current_role() -> Optional[int]:
+    """Return the role id of the user making the request.
+
+    The role is read from the token when its token version is current.
+    Tokens issued before a role change, or without the claims, fall back to
+    reading the role from the database.
+    """
+    claims = get_jwt()
+    user_id = get_jwt_identity()
+    if ROLE_CLAIM in claims and claims.get(TOKEN_VERSION_CLAIM) == _token_version(
+        user_id
+    ):
+        return claims[ROLE_CLAIM]
+    return UserService.get_role_id(user_id)
+
+
+def require_role(*roles: RoleEnum) -> Callable:
+    """Answer 401 unless the user making the request has one of the roles.
+
+    Has to be applied below `jwt_required`.
+    """
+    role_ids = {role.value for role in roles}
+
+    def decorator(view: Callable) -> Callable:
+        @functools.wraps(view)
+        def wrapper(**kwargs: object) -> Response:
+            if current_role() not in role_ids:
+                response = {"message": "Unauthorized"}
+                return make_response(jsonify(response), 401)
+            return view(**kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,125 @@
+"""Module containing helpers for importing internships and users in bulk."""
+import csv
+import datetime
+import io
+import json
+from typing import IO, Iterator, Optional
+
+CSV_MIMETYPES = ("text/csv",)
+JSON_LINES_MIMETYPES = (
+    "application/x-ndjson",
+    "application/jsonl",
+    "application/json-lines",
+)
+IMPORT_MIMETYPES = CSV_MIMETYPES + JSON_LINES_MIMETYPES
+
+# Valid rows inserted per INSERT statement.
+IMPORT_BATCH_SIZE = 1000
+MAX_IMPORT_ROWS = 50000
+# Every imported user costs a bcrypt hash, so rosters are kept smaller.
+MAX_ROSTER_ROWS = 2000
+
+
+class TooManyRowsError(ValueError):
+    """Raised when an import has more rows than are accepted at once."""
+
+
+REQUIRED_FIELDS = ("company", "position", "website", "deadline", "time_period_id")
+MAX_FIELD_LENGTH = 255
+
+
+def iter_records(stream: IO[bytes], mimetype: str) -> Iterator[tuple[int, object]]:
+    """Yield `(line number, record)` pairs parsed from an upload as it is read.
+
+    CSV uploads need a header row naming the fields. Records of JSON Lines
+    uploads are whatever each line decodes to, which `parse_internship`
+    validates. Raises a ValueError if the upload cannot be decoded.
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        if mimetype in CSV_MIMETYPES:
+            reader = csv.DictReader(text)
+            for record in reader:
+                yield reader.line_num, record
+        else:
+            for line_number, line in enumerate(text, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield line_number, json.loads(line)
+                except json.JSONDecodeError:
+                    yield line_number, None
+    except csv.Error as e:
+        raise ValueError("Invalid CSV") from e
+
+
+def _parse_string(record: dict, field: str, required: bool = True) -> Optional[str]:
+    value = record.get(field)
+    if value is None or value == "":
+        if required:
+            raise ValueError(f"Missing {field}")
+        return None
+    if not isinstance(value, str):
+        raise ValueError(f"Invalid {field}")
+    if len(value) > MAX_FIELD_LENGTH:
+        raise ValueError(f"{field} is too long")
+    return value
+
+
+def parse_internship(
+    record: object, time_period_ids: set[int], today: datetime.date
+) -> dict:
+    """Validate an imported record and return its internship column values.
+
+    Raises a ValueError describing the first problem with the record.
+    """
+    if not isinstance(record, dict):
+        raise ValueError("Invalid record")
+
+    values = {
+        "company": _parse_string(record, "company"),
+        "position": _parse_string(record, "position"),
+        "website": _parse_string(record, "website"),
+        "company_photo_link": _parse_string(
+            record, "company_photo_link", required=False
+        ),
+    }
+
+    try:
+        deadline = datetime.datetime.strptime(
+            _parse_string(record, "deadline"), "%Y-%m-%d"
+        ).date()
+    except ValueError as e:
+        raise ValueError("Invalid deadline") from e
+    if deadline <= today:
+        raise ValueError("Deadline must be in the future")
+    values["deadline"] = deadline
+
+    time_period_id = record.get("time_period_id")
+    try:
+        if isinstance(time_period_id, bool):
+            raise ValueError("Invalid time_period_id")
+        time_period_id = int(time_period_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError("Invalid time_period_id") from e
+    if time_period_id not in time_period_ids:
+        raise ValueError("Time period not found")
+    values["time_period_id"] = time_period_id
+
+    return values
+
+
+def parse_roster_user(record: object) -> dict:
+    """Validate an imported roster record and return its user column values.
+
+    The password is returned in plain text for the caller to hash. Raises a
+    ValueError describing the first problem with the record.
+    """
+    if not isinstance(record, dict):
+        raise ValueError("Invalid record")
+    return {
+        "username": _parse_string(record, "username"),
+        "password": _parse_string(record, "password"),
+        "first_name": _parse_string(record, "first_name"),
+        "last_name": _parse_string(record, "last_name"),
+    }
@@ -0,0 +1,61 @@
+"""Module containing conditional GET support based on table versions."""
+import datetime
+import functools
+from typing import Callable
+
+from flask import Response, g, make_response, request
+
+from src.app.services.table_version_service import TableVersionService
+
+
+def conditional(table: str, daily: bool = False) -> Callable:
+    """Add ETag/Last-Modified headers derived from a table's version to a view.
+
+    A request whose If-None-Match (or If-Modified-Since) matches the current
+    version is answered with a 304 without running the view. Last-Modified
+    is left out during the second after a write. The version is
+    also stored in `g.resource_version` for the response cache to key on.
+
+    Views whose result also depends on the date pass `daily`, which adds
+    today's date to the ETag and leaves out Last-Modified.
+    """
+
+    def decorator(view: Callable) -> Callable:
+        @functools.wraps(view)
+        def wrapper(**kwargs: object) -> Response:
+            version = TableVersionService.get_version(table)
+            if version is None:
+                return view(**kwargs)
+
+            etag = f"{table}-{version.version}"
+            if daily:
+                etag = f"{etag}-{datetime.date.today().isoformat()}"
+            updated_at = version.updated_at.replace(tzinfo=datetime.timezone.utc)
+            last_modified = updated_at.replace(microsecond=0)
+            # HTTP dates have one-second resolution, so a date from the same
+            # second as the last write cannot tell whether a response has it.
+            # Such dates are neither sent nor compared until a second later.
+            age = datetime.datetime.now(datetime.timezone.utc) - updated_at
+            settled = not daily and age >= datetime.timedelta(seconds=1)
+            g.resource_version = etag
+
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains(etag)
+            else:
+                since = request.if_modified_since
+                not_modified = settled and since is not None and last_modified <= since
+            if not_modified:
+                response = Response(status=304)
+            else:
+                response = make_response(view(**kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            if settled:
+                response.last_modified = last_modified
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,18 @@
+"""Module containing helpers for database specific SQL."""
+from sqlalchemy.sql.dml import Insert
+
+from src.app.extensions import db
+
+
+def upsert_insert(model: type) -> Insert:
+    """Return an INSERT for a model that supports ON CONFLICT clauses.
+
+    Both SQLite and Postgres support `on_conflict_do_nothing` and
+    `on_conflict_do_update` with the same arguments. Only the dialect in use
+    is imported, the engine has already loaded it.
+    """
+    if db.engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model)
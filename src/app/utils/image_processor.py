@@ -0,0 +1,125 @@
+"""Module containing the background pool resizing uploaded pictures."""
+import importlib.util
+import io
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import BinaryIO, Callable, Optional
+
+from flask import Flask, current_app
+
+# Widths and heights, in pixels, the variants of a picture are fitted into.
+VARIANT_SIZES = (64, 200, 400)
+
+
+def variant_key(key: str, size: int) -> str:
+    """Return the key of a variant of an uploaded picture.
+
+    The extension of the picture stays in the key, as a user's pictures with
+    different extensions are stored under different keys.
+    """
+    stem, extension = os.path.splitext(key)
+    return f"{stem}_{extension[1:]}_{size}.webp"
+
+
+class ImageProcessor:
+    """Class for resizing pictures on a background thread pool.
+
+    Pillow is optional and only imported by the workers; without it, or
+    with IMAGE_VARIANTS_ENABLED off, nothing is submitted and pictures are
+    only served as uploaded. Pillow releases the GIL while decoding,
+    resizing and encoding, so the threads work in parallel.
+    """
+
+    enabled = True
+    max_workers = max(1, (os.cpu_count() or 1) // 2)
+    quality = 80
+    max_pixels = 50_000_000
+
+    _executor: Optional[ThreadPoolExecutor] = None
+    _pid: Optional[int] = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def init_app(cls, app: Flask) -> None:
+        """Configure the pool and the encoder from the application config."""
+        cls.enabled = app.config.get("IMAGE_VARIANTS_ENABLED", True)
+        cls.max_workers = app.config.get("IMAGE_PROCESSOR_WORKERS") or max(
+            1, (os.cpu_count() or 1) // 2
+        )
+        cls.quality = app.config.get("IMAGE_VARIANT_QUALITY", 80)
+        cls.max_pixels = app.config.get("IMAGE_MAX_PIXELS", 50_000_000)
+        cls.shutdown()
+
+    @classmethod
+    def shutdown(cls, wait: bool = False) -> None:
+        """Stop the pool; the next call starts a new one with the current settings."""
+        with cls._lock:
+            if cls._executor is not None and cls._pid == os.getpid():
+                cls._executor.shutdown(wait=wait)
+            cls._executor = None
+
+    @classmethod
+    def available(cls) -> bool:
+        """Check whether variants are enabled and Pillow is installed."""
+        return cls.enabled and importlib.util.find_spec("PIL") is not None
+
+    @classmethod
+    def submit(cls, function: Callable, *args: object) -> Optional[Future]:
+        """Run `function` on the pool inside an application context.
+
+        Callers do not wait for the result, so an exception is logged before
+        it is stored on the future.
+        """
+        if not cls.available():
+            return None
+        app = current_app._get_current_object()
+
+        def run() -> object:
+            with app.app_context():
+                try:
+                    return function(*args)
+                except Exception:
+                    app.logger.exception(
+                        "Background job %s failed", function.__qualname__
+                    )
+                    raise
+
+        with cls._lock:
+            # A forked worker inherits the pool object but not its threads.
+            if cls._executor is None or cls._pid != os.getpid():
+                cls._executor = ThreadPoolExecutor(
+                    max_workers=cls.max_workers, thread_name_prefix="image-processor"
+                )
+                cls._pid = os.getpid()
+            return cls._executor.submit(run)
+
+    @classmethod
+    def render_variants(cls, file: BinaryIO) -> dict[int, bytes]:
+        """Decode a picture once and encode a WebP fitted into each variant size.
+
+        Each variant is scaled down from the next larger one rather than from
+        the original, and JPEGs are decoded at the smallest scale that is
+        still larger than the biggest variant. Raises a ValueError for
+        pictures of more than `max_pixels`, which a small compressed file
+        can still describe.
+        """
+        from PIL import Image, ImageOps
+
+        largest = max(VARIANT_SIZES)
+        with Image.open(file) as original:
+            width, height = original.size
+            if width * height > cls.max_pixels:
+                raise ValueError(f"Picture of {width}x{height} pixels is too large")
+            original.draft("RGB", (largest, largest))
+            image = ImageOps.exif_transpose(original)
+            has_alpha = "A" in image.getbands() or "transparency" in image.info
+            image = image.convert("RGBA" if has_alpha else "RGB")
+
+        variants = {}
+        for size in sorted(VARIANT_SIZES, reverse=True):
+            image.thumbnail((size, size), Image.Resampling.LANCZOS)
+            output = io.BytesIO()
+            image.save(output, "WEBP", quality=cls.quality)
+            variants[size] = output.getvalue()
+        return variants
@@ -0,0 +1,138 @@
+"""Module containing helpers for keyset (cursor) pagination."""
+import base64
+import binascii
+import datetime
+import json
+import math
+from typing import Any, Callable, Iterable, Optional, Sequence
+
+from flask import Response
+from sqlalchemy import ColumnElement, tuple_
+from sqlalchemy.orm import InstrumentedAttribute
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(values: tuple) -> str:
+    """Encode the sort key of the last row of a page into an opaque cursor."""
+    payload = [
+        value.isoformat() if isinstance(value, datetime.date) else value
+        for value in values
+    ]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> list:
+    """Decode a cursor created by `encode_cursor`.
+
+    Raises a ValueError if the cursor is malformed.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def parse_cursor(values: list, parsers: Sequence[Callable[[Any], Any]]) -> tuple:
+    """Convert the values of a decoded cursor with one parser per sort column.
+
+    Raises a ValueError if the cursor does not hold a valid value for each
+    column, e.g. null or a number where a date is expected.
+    """
+    if len(values) != len(parsers):
+        raise ValueError("Invalid cursor")
+    try:
+        return tuple(parse(value) for parse, value in zip(parsers, values))
+    except (TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def parse_limit(value: Optional[str]) -> int:
+    """Parse the `limit` query parameter, clamping it to the maximum page size."""
+    if value is None:
+        return DEFAULT_PAGE_SIZE
+    limit = int(value)
+    if limit < 1:
+        raise ValueError("Limit must be positive")
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def parse_int(value: Optional[str]) -> Optional[int]:
+    """Parse an optional integer query parameter."""
+    if value is None:
+        return None
+    return int(value)
+
+
+def parse_float(value: Optional[str]) -> Optional[float]:
+    """Parse an optional finite number query parameter."""
+    if value is None:
+        return None
+    number = float(value)
+    if not math.isfinite(number):
+        raise ValueError(f"Invalid number: {value}")
+    return number
+
+
+def parse_bool(value: Optional[str]) -> Optional[bool]:
+    """Parse an optional boolean query parameter."""
+    if value is None:
+        return None
+    if value.lower() in ("1", "true"):
+        return True
+    if value.lower() in ("0", "false"):
+        return False
+    raise ValueError(f"Invalid boolean: {value}")
+
+
+def parse_fields(value: Optional[str], allowed: Iterable[str]) -> Optional[list[str]]:
+    """Parse an optional comma separated `fields` query parameter.
+
+    Raises a ValueError if a field is not one of `allowed`.
+    """
+    if value is None:
+        return None
+    fields = [field.strip() for field in value.split(",") if field.strip()]
+    if not fields or not set(fields).issubset(allowed):
+        raise ValueError("Invalid fields")
+    return fields
+
+
+def parse_date(value: Optional[str]) -> Optional[datetime.date]:
+    """Parse an optional YYYY-MM-DD query parameter."""
+    if value is None:
+        return None
+    return datetime.datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def keyset_after(
+    columns: tuple[InstrumentedAttribute, ...], values: tuple, descending: bool
+) -> ColumnElement[bool]:
+    """Return the WHERE clause selecting rows strictly after the given sort key."""
+    if descending:
+        return tuple_(*columns) < tuple_(*values)
+    return tuple_(*columns) > tuple_(*values)
+
+
+def paginate(rows: list, limit: int, sort_key: Any) -> tuple[list, Optional[str]]:
+    """Trim a `limit + 1` result to one page and compute the next cursor.
+
+    `sort_key` is called with the last row of the page to get the values
+    the cursor should resume after.
+    """
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(sort_key(rows[-1]))
+
+
+def set_next_cursor(response: Response, cursor: Optional[str]) -> Response:
+    """Attach the next page cursor to a response, if there is one."""
+    if cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
+    return response
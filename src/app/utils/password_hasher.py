@@ -1,16 +1,115 @@
 """Module containing util for hashing and verifying passwords."""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Optional
+
 import bcrypt
+from flask import Flask
+
+
+class PasswordHasherBusyError(Exception):
+    """Raised when too many passwords are already waiting to be hashed."""
 
 
 class PasswordHasher:
-    """Class for hashing and verifying passwords."""
+    """Class for hashing and verifying passwords.
+
+    bcrypt runs on a thread pool; it releases the GIL, so the threads hash
+    in parallel. The pool defaults to half the cores, which leaves the rest
+    to requests that do not hash passwords. At most `max_pending` calls
+    can wait for a worker at once. Further calls wait up to `queue_timeout`
+    seconds for a place and then raise a PasswordHasherBusyError, so a burst
+    of logins cannot tie up every request worker.
+    """
+
+    rounds = 12
+    max_workers = max(1, (os.cpu_count() or 1) // 2)
+    max_pending = 64
+    queue_timeout = 5.0
+
+    _executor: Optional[ThreadPoolExecutor] = None
+    _slots: Optional[threading.BoundedSemaphore] = None
+    _pid: Optional[int] = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def init_app(cls, app: Flask) -> None:
+        """Configure the work factor and pool from the application config."""
+        cls.rounds = app.config.get("BCRYPT_LOG_ROUNDS", 12)
+        cls.max_workers = app.config.get("PASSWORD_HASHER_WORKERS") or max(
+            1, (os.cpu_count() or 1) // 2
+        )
+        cls.max_pending = app.config.get("PASSWORD_HASHER_MAX_PENDING", 64)
+        cls.queue_timeout = app.config.get("PASSWORD_HASHER_QUEUE_TIMEOUT", 5.0)
+        cls.shutdown()
+
+    @classmethod
+    def shutdown(cls) -> None:
+        """Stop the pool; the next call starts a new one with the current settings."""
+        with cls._lock:
+            if cls._executor is not None and cls._pid == os.getpid():
+                cls._executor.shutdown(wait=False)
+            cls._executor = None
+
+    @classmethod
+    def _map(cls, function: Callable, *iterables: Iterable) -> list:
+        """Run `function` over the iterables on the pool, taking one queue place."""
+        with cls._lock:
+            # A forked worker inherits the pool object but not its threads.
+            if cls._executor is None or cls._pid != os.getpid():
+                cls._executor = ThreadPoolExecutor(
+                    max_workers=cls.max_workers, thread_name_prefix="password-hasher"
+                )
+                cls._slots = threading.BoundedSemaphore(
+                    cls.max_workers + cls.max_pending
+                )
+                cls._pid = os.getpid()
+            executor, slots = cls._executor, cls._slots
+
+        if not slots.acquire(timeout=cls.queue_timeout):
+            raise PasswordHasherBusyError("Too many passwords waiting to be hashed")
+        try:
+            return list(executor.map(function, *iterables))
+        finally:
+            slots.release()
+
+    @classmethod
+    def _run(cls, function: Callable, *args: object) -> object:
+        return cls._map(function, *([arg] for arg in args))[0]
 
     @classmethod
     def hash_password(cls, password: str) -> str:
         """Hash a password."""
-        return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+        salt = bcrypt.gensalt(cls.rounds)
+        return cls._run(bcrypt.hashpw, password.encode(), salt).decode()
+
+    @classmethod
+    def hash_many(cls, passwords: list[str]) -> list[str]:
+        """Hash several passwords in parallel, in the order given.
+
+        The passwords are hashed in chunks the size of the pool, each taking
+        its own queue place, so logins waiting for the pool are let in
+        between chunks rather than after the whole batch.
+        """
+        hashes = []
+        for start in range(0, len(passwords), cls.max_workers):
+            chunk = passwords[start : start + cls.max_workers]
+            salts = [bcrypt.gensalt(cls.rounds) for _ in chunk]
+            hashes += cls._map(
+                bcrypt.hashpw, [password.encode() for password in chunk], salts
+            )
+        return [hashed.decode() for hashed in hashes]
 
     @classmethod
     def verify_password(cls, password: str, hashed_password: str) -> bool:
         """Check a plain text password against a hashed password."""
-        return bcrypt.checkpw(password.encode(), hashed_password.encode())
+        return cls._run(bcrypt.checkpw, password.encode(), hashed_password.encode())
+
+    @classmethod
+    def needs_rehash(cls, hashed_password: str) -> bool:
+        """Check whether a hash was made with a different work factor than configured."""
+        try:
+            return int(hashed_password.split("$")[2]) != cls.rounds
+        except (IndexError, ValueError):
+            return True
@@ -0,0 +1,54 @@
+"""Module containing validation of partial user profile updates."""
+from src.app.models.users import Users
+
+STRING_FIELDS = (
+    "first_name",
+    "last_name",
+    "academic_year",
+    "github_link",
+    "linkedin_link",
+    "website_link",
+    "profile_picture_link",
+    "cv_link",
+    "email",
+    "phone_number",
+    "description",
+)
+PROFILE_FIELDS = STRING_FIELDS + ("gpa", "internship_time_period_id")
+
+MAX_GPA = 4.0
+
+
+def _parse_value(field: str, value: object) -> object:
+    if value is None:
+        return None
+    if field in STRING_FIELDS:
+        if not isinstance(value, str):
+            raise ValueError(f"Invalid {field}")
+        if len(value) > Users.__table__.c[field].type.length:
+            raise ValueError(f"{field} is too long")
+        return value
+    # bool is a subclass of int but never a valid number here.
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"Invalid {field}")
+    if field == "gpa":
+        if not 0 <= value <= MAX_GPA:
+            raise ValueError("Invalid gpa")
+        return float(value)
+    if not isinstance(value, int):
+        raise ValueError(f"Invalid {field}")
+    return value
+
+
+def parse_profile_changes(body: object) -> dict:
+    """Validate a partial profile update and return the columns to change.
+
+    Any subset of the profile fields may be given, and null clears a field.
+    Raises a ValueError describing the first problem with the body.
+    """
+    if not isinstance(body, dict) or not body:
+        raise ValueError("Invalid request body")
+    unknown = sorted(set(body) - set(PROFILE_FIELDS))
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return {field: _parse_value(field, value) for field, value in body.items()}
@@ -0,0 +1,170 @@
+"""Module containing token bucket rate limiting for expensive endpoints."""
+import functools
+import importlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable
+
+from flask import Flask, Response, jsonify, make_response, request
+
+# Atomically refills a bucket stored as a hash and takes a token from it.
+# Returns whether a token was taken and the tokens left afterwards.
+_REDIS_TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(bucket[1]) or capacity
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+
+def _retry_after(tokens: float, rate: float) -> float:
+    """Return the seconds until a bucket holding `tokens` has a whole token."""
+    return (1 - tokens) / rate
+
+
+class MemoryBucketStore:
+    """Token buckets held in the memory of this process."""
+
+    def __init__(self, max_buckets: int = 100000) -> None:
+        """Create an empty store keeping at most `max_buckets` buckets."""
+        self.max_buckets = max_buckets
+        # key -> (tokens, monotonic time of the last update)
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, capacity: int, rate: float) -> float:
+        """Take a token from a bucket.
+
+        Returns 0 if a token was taken, otherwise the seconds until one is
+        available.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = _retry_after(tokens, rate)
+            self._buckets[key] = (tokens, now)
+            # Evicting the least recently used bucket only forgives a client.
+            while len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def clear(self) -> None:
+        """Drop every bucket."""
+        with self._lock:
+            self._buckets.clear()
+
+
+class RedisBucketStore:
+    """Token buckets shared by every process through Redis.
+
+    Needs the optional `redis` package. If Redis cannot be reached requests
+    are let through, so an outage of the limiter does not lock users out.
+    """
+
+    def __init__(self, url: str) -> None:
+        """Connect to the Redis server at `url`."""
+        try:
+            redis = importlib.import_module("redis")
+        except ImportError as e:
+            raise RuntimeError(
+                "RATE_LIMIT_STORAGE_URL is set but the redis package is not installed"
+            ) from e
+        self._error = redis.RedisError
+        self._client = redis.Redis.from_url(url)
+        self._take = self._client.register_script(_REDIS_TAKE_SCRIPT)
+
+    def take(self, key: str, capacity: int, rate: float) -> float:
+        """Take a token from a bucket, see `MemoryBucketStore.take`."""
+        try:
+            allowed, tokens = self._take(
+                keys=[f"rate_limit:{key}"], args=[capacity, rate, time.time()]
+            )
+        except self._error:
+            return 0.0
+        if allowed:
+            return 0.0
+        return _retry_after(float(tokens), rate)
+
+    def clear(self) -> None:
+        """Leave shared buckets alone; they expire on their own."""
+
+
+class RateLimiter:
+    """Per client IP and per username token buckets guarding endpoints.
+
+    Each bucket holds up to `capacity` requests and refills at `rate`
+    requests per second. A request over either budget is answered with a
+    429 and a Retry-After header before the view runs. Behind a reverse
+    proxy the client IP is only known with PROXY_FIX_X_FOR set.
+    """
+
+    def __init__(self) -> None:
+        """Create a limiter with in-process buckets; `init_app` configures it."""
+        self.enabled = True
+        self.ip_limit = (60, 1.0)
+        self.username_limit = (5, 0.1)
+        self.store = MemoryBucketStore()
+
+    def init_app(self, app: Flask) -> None:
+        """Configure the limits and the bucket store from the application config."""
+        self.enabled = app.config.get("RATE_LIMIT_ENABLED", True)
+        self.ip_limit = (
+            app.config.get("RATE_LIMIT_IP_BURST", 60),
+            app.config.get("RATE_LIMIT_IP_PER_SECOND", 1.0),
+        )
+        self.username_limit = (
+            app.config.get("RATE_LIMIT_USERNAME_BURST", 5),
+            app.config.get("RATE_LIMIT_USERNAME_PER_SECOND", 0.1),
+        )
+        url = app.config.get("RATE_LIMIT_STORAGE_URL")
+        self.store = RedisBucketStore(url) if url else MemoryBucketStore()
+
+    def _wait(self, scope: str) -> float:
+        """Take a token from each bucket of the request, returning the longest wait."""
+        capacity, rate = self.ip_limit
+        wait = self.store.take(f"{scope}:ip:{request.remote_addr}", capacity, rate)
+
+        body = request.get_json(silent=True)
+        username = body.get("username") if isinstance(body, dict) else None
+        if isinstance(username, str):
+            capacity, rate = self.username_limit
+            key = f"{scope}:username:{username.lower()}"
+            wait = max(wait, self.store.take(key, capacity, rate))
+        return wait
+
+    def limit(self, scope: str) -> Callable:
+        """Rate limit a view, counting its requests in buckets named after `scope`."""
+
+        def decorator(view: Callable) -> Callable:
+            @functools.wraps(view)
+            def wrapper(**kwargs: object) -> Response:
+                wait = self._wait(scope) if self.enabled else 0
+                if wait > 0:
+                    response = make_response(
+                        jsonify({"message": "Too many requests"}), 429
+                    )
+                    response.headers["Retry-After"] = str(math.ceil(wait))
+                    return response
+                return view(**kwargs)
+
+            return wrapper
+
+        return decorator
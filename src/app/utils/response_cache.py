@@ -0,0 +1,153 @@
+"""Module containing an in-process cache for serialized read responses."""
+import functools
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from flask import Flask, Response, g, make_response, request
+
+
+@dataclass
+class _Entry:
+    body: bytes
+    status: int
+    headers: list[tuple[str, str]]
+    tags: frozenset[str]
+    expires_at: float
+
+
+class ResponseCache:
+    """LRU cache of GET responses with a TTL and tag based invalidation.
+
+    Each entry is keyed by the request path and query arguments and tagged
+    with the data it was built from, e.g. "internships" or "internships:1".
+    Services invalidate tags after committing a write, which drops every
+    response built from that data. Views wrapped in `conditional` also key
+    on the table version, so writes made by other processes are picked up.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 30) -> None:
+        """Create an empty cache; `init_app` overrides the limits from config."""
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[tuple, _Entry] = OrderedDict()
+        self._keys_by_tag: dict[str, set[tuple]] = {}
+        # Bumped on every invalidation, see `_set`.
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app: Flask) -> None:
+        """Configure the cache from the application config."""
+        self.max_entries = app.config.get("RESPONSE_CACHE_MAX_ENTRIES", 1024)
+        self.ttl = app.config.get("RESPONSE_CACHE_TTL", 30)
+        self.enabled = app.config.get("RESPONSE_CACHE_ENABLED", True)
+
+    def cached(self, *tags: str) -> Callable:
+        """Cache the responses of a GET view under the given tags.
+
+        Tags are formatted with the view arguments, so
+        `cached("internships:{internship_id}")` tags each internship separately.
+        Only 200 responses that are not streamed are stored.
+        """
+
+        def decorator(view: Callable) -> Callable:
+            @functools.wraps(view)
+            def wrapper(**kwargs: object) -> Response:
+                if not self.enabled or request.method != "GET":
+                    return view(**kwargs)
+
+                key = (
+                    request.path,
+                    tuple(sorted(request.args.items(multi=True))),
+                    g.get("resource_version"),
+                )
+                entry = self._get(key)
+                if entry is not None:
+                    return Response(entry.body, entry.status, entry.headers)
+
+                generation = self._generation
+                response = make_response(view(**kwargs))
+                if response.status_code == 200 and not response.is_streamed:
+                    self._set(
+                        key,
+                        _Entry(
+                            body=response.get_data(),
+                            status=response.status_code,
+                            headers=list(response.headers.items()),
+                            tags=frozenset(tag.format(**kwargs) for tag in tags),
+                            expires_at=time.monotonic() + self.ttl,
+                        ),
+                        generation,
+                    )
+                return response
+
+            return wrapper
+
+        return decorator
+
+    def invalidate(self, *tags: str) -> None:
+        """Drop every cached response carrying any of the given tags."""
+        with self._lock:
+            self._generation += 1
+            for tag in tags:
+                for key in self._keys_by_tag.pop(tag, ()):
+                    self._remove(key)
+
+    def clear(self) -> None:
+        """Drop every cached response."""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._keys_by_tag.clear()
+
+    def stats(self) -> dict:
+        """Return the hit and miss counters and the current size."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+            }
+
+    def _get(self, key: tuple) -> Optional[_Entry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def _set(self, key: tuple, entry: _Entry, generation: int) -> None:
+        with self._lock:
+            # Something was invalidated while the response was being built, so
+            # it may have been read before a write committed and be stale.
+            if generation != self._generation:
+                return
+            self._remove(key)
+            self._entries[key] = entry
+            for tag in entry.tags:
+                self._keys_by_tag.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: tuple) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry.tags:
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
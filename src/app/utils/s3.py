@@ -0,0 +1,105 @@
+"""Module containing the shared S3 client."""
+import os
+import threading
+from typing import TYPE_CHECKING, Optional
+
+from flask import Flask
+
+if TYPE_CHECKING:
+    from boto3.s3.transfer import TransferConfig
+    from botocore.client import BaseClient
+
+MB = 1024 * 1024
+
+
+class S3:
+    """Process-wide S3 client, created on first use.
+
+    Building a client reads the credentials, loads the service model and
+    opens new connections, which costs more than a small upload. boto3
+    clients are thread-safe, so one client and its connection pool are
+    shared by every request in a process. A forked worker must not share
+    the parent's sockets, so it builds its own client.
+
+    Files larger than `multipart_threshold` are uploaded in parts of
+    `multipart_chunksize`, `max_concurrency` at a time, so an upload holds
+    at most that many parts in memory whatever the size of the file.
+    """
+
+    max_pool_connections = 10
+    connect_timeout = 5.0
+    read_timeout = 60.0
+    retry_mode = "standard"
+    max_attempts = 3
+    tcp_keepalive = True
+    multipart_threshold = 8 * MB
+    multipart_chunksize = 8 * MB
+    max_concurrency = 4
+    presign_expires = 600
+
+    _client: Optional["BaseClient"] = None
+    _pid: Optional[int] = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def init_app(cls, app: Flask) -> None:
+        """Configure the connection pool, timeouts and retries from the application config."""
+        cls.max_pool_connections = app.config.get("S3_MAX_POOL_CONNECTIONS", 10)
+        cls.connect_timeout = app.config.get("S3_CONNECT_TIMEOUT", 5.0)
+        cls.read_timeout = app.config.get("S3_READ_TIMEOUT", 60.0)
+        cls.retry_mode = app.config.get("S3_RETRY_MODE", "standard")
+        cls.max_attempts = app.config.get("S3_MAX_ATTEMPTS", 3)
+        cls.tcp_keepalive = app.config.get("S3_TCP_KEEPALIVE", True)
+        cls.multipart_threshold = app.config.get("S3_MULTIPART_THRESHOLD", 8 * MB)
+        cls.multipart_chunksize = app.config.get("S3_MULTIPART_CHUNKSIZE", 8 * MB)
+        cls.max_concurrency = app.config.get("S3_MAX_CONCURRENCY", 4)
+        cls.presign_expires = app.config.get("S3_PRESIGN_EXPIRES", 600)
+        cls.reset()
+
+    @classmethod
+    def reset(cls) -> None:
+        """Drop the client; the next call builds one with the current settings."""
+        with cls._lock:
+            cls._client = None
+
+    @classmethod
+    def client(cls) -> "BaseClient":
+        """Return the client of this process, creating it on first use."""
+        with cls._lock:
+            if cls._client is None or cls._pid != os.getpid():
+                cls._client = cls._create()
+                cls._pid = os.getpid()
+            return cls._client
+
+    @classmethod
+    def transfer_config(cls) -> "TransferConfig":
+        """Return the settings of managed uploads."""
+        from boto3.s3.transfer import TransferConfig
+
+        return TransferConfig(
+            multipart_threshold=cls.multipart_threshold,
+            multipart_chunksize=cls.multipart_chunksize,
+            max_concurrency=cls.max_concurrency,
+        )
+
+    @classmethod
+    def _create(cls) -> "BaseClient":
+        import boto3
+        from botocore.config import Config
+
+        # The default session is not thread-safe, so each client gets its own.
+        session = boto3.session.Session(
+            region_name=os.getenv("AWS_DEFAULT_REGION"),
+            aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+            aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+        )
+        return session.client(
+            "s3",
+            config=Config(
+                max_pool_connections=cls.max_pool_connections,
+                connect_timeout=cls.connect_timeout,
+                read_timeout=cls.read_timeout,
+                retries={"mode": cls.retry_mode, "max_attempts": cls.max_attempts},
+                tcp_keepalive=cls.tcp_keepalive,
+            ),
+        )
@@ -0,0 +1,141 @@
+"""Module containing the JSON representations of internships and users.
+
+Listings select only the columns they return with Core `select()` and build
+dictionaries straight from the row tuples, which avoids constructing and
+tracking ORM objects for rows that are only read.
+"""
+import datetime
+import functools
+from typing import Iterable, Optional
+
+from sqlalchemy import Row, Select, select
+
+from src.app.models.internships import Internships
+from src.app.models.internships_archive import InternshipsArchive
+from src.app.models.users import Users
+
+INTERNSHIP_COLUMNS = (
+    Internships.id,
+    Internships.company,
+    Internships.position,
+    Internships.website,
+    Internships.deadline,
+    Internships.author_id,
+    Internships.time_period_id,
+    Internships.company_photo_link,
+    Internships.company_photo_variants,
+    Internships.flagged,
+    Internships.created_at,
+)
+
+ARCHIVED_INTERNSHIP_COLUMNS = tuple(
+    getattr(InternshipsArchive, column.key) for column in INTERNSHIP_COLUMNS
+)
+
+USER_COLUMNS = (
+    Users.id,
+    Users.first_name,
+    Users.last_name,
+    Users.username,
+    Users.gpa,
+    Users.academic_year,
+    Users.github_link,
+    Users.linkedin_link,
+    Users.website_link,
+    Users.profile_picture_link,
+    Users.profile_picture_variants,
+    Users.email,
+    Users.phone_number,
+    Users.description,
+    Users.role_id,
+    Users.internship_time_period_id,
+)
+
+# The CV is only shown on a user's own page, not in listings.
+USER_DETAIL_COLUMNS = USER_COLUMNS + (Users.cv_link,)
+
+# Fields listings can be narrowed to with `?fields=`.
+USER_FIELDS = {column.key: column for column in USER_COLUMNS}
+
+
+@functools.lru_cache(maxsize=4096)
+def format_date(value: datetime.date) -> str:
+    """Format a date as YYYY-MM-DD.
+
+    Listings repeat the same few deadlines many times, so each distinct date
+    is only formatted once.
+    """
+    return value.isoformat()
+
+
+def format_datetime(value: Optional[datetime.datetime]) -> Optional[str]:
+    """Format a datetime as YYYY-MM-DD HH:MM:SS."""
+    if value is None:
+        return None
+    return value.isoformat(" ", "seconds")
+
+
+def select_internships() -> Select:
+    """Return a select of the columns in the internship representation."""
+    return select(*INTERNSHIP_COLUMNS)
+
+
+def select_archived_internships() -> Select:
+    """Return a select of the internship representation of archived internships."""
+    return select(*ARCHIVED_INTERNSHIP_COLUMNS)
+
+
+def select_users(detail: bool = False, fields: Optional[list[str]] = None) -> Select:
+    """Return a select of the columns in the user representation.
+
+    With `fields` only those columns are selected, plus the id.
+    """
+    if fields is not None:
+        keys = ["id"] + [field for field in fields if field != "id"]
+        return select(*(USER_FIELDS[key] for key in keys))
+    return select(*(USER_DETAIL_COLUMNS if detail else USER_COLUMNS))
+
+
+def internship_to_json(row: Row) -> dict:
+    """Convert a row of `select_internships` to its JSON representation."""
+    (
+        internship_id,
+        company,
+        position,
+        website,
+        deadline,
+        author_id,
+        time_period_id,
+        company_photo_link,
+        company_photo_variants,
+        flagged,
+        created_at,
+    ) = row
+    return {
+        "id": internship_id,
+        "company": company,
+        "position": position,
+        "website": website,
+        "deadline": format_date(deadline),
+        "author_id": author_id,
+        "time_period_id": time_period_id,
+        "company_photo_link": company_photo_link,
+        "company_photo_variants": company_photo_variants,
+        "flagged": flagged,
+        "created_at": format_datetime(created_at),
+    }
+
+
+def internships_to_json(rows: Iterable[Row]) -> list[dict]:
+    """Convert rows of `select_internships` to their JSON representation."""
+    return [internship_to_json(row) for row in rows]
+
+
+def user_to_json(row: Row) -> dict:
+    """Convert a row of `select_users` to its JSON representation."""
+    return dict(zip(row._fields, row))
+
+
+def users_to_json(rows: Iterable[Row]) -> list[dict]:
+    """Convert rows of `select_users` to their JSON representation."""
+    return [dict(zip(row._fields, row)) for row in rows]
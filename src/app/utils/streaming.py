@@ -0,0 +1,36 @@
+"""Module containing helpers for streaming large JSON responses."""
+from typing import Any, Callable, Iterable, Iterator
+
+from flask import Response, current_app, stream_with_context
+
+# Rows fetched from the database per round trip when streaming.
+STREAM_BATCH_SIZE = 1000
+# Encoded bytes buffered before a chunk is sent to the client.
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def stream_json_array(items: Iterable, serialize: Callable[[Any], dict]) -> Response:
+    """Return a response that encodes `items` as a JSON array while iterating.
+
+    Only one chunk of encoded output is held in memory at a time, so the
+    size of the response does not affect the memory used to produce it.
+    """
+
+    def generate() -> Iterator[str]:
+        dumps = current_app.json.dumps
+        buffer = ["["]
+        size = 1
+        separator = ""
+        for item in items:
+            encoded = separator + dumps(serialize(item))
+            separator = ","
+            buffer.append(encoded)
+            size += len(encoded)
+            if size >= STREAM_CHUNK_SIZE:
+                yield "".join(buffer)
+                buffer = []
+                size = 0
+        buffer.append("]")
+        yield "".join(buffer)
+
+    return Response(stream_with_context(generate()), mimetype="application/json")
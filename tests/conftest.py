@@ -3,12 +3,16 @@ import os
 import typing
 
 import pytest
+from botocore.stub import Stubber
 from flask import Flask
 from flask.testing import FlaskClient
 from flask_jwt_extended import create_access_token
 
 from src.app import create_app
-from src.app.extensions import db
+from src.app.extensions import db, response_cache
+from src.app.services.database_service import DatabaseService
+from src.app.utils.auth import forget_token_version
+from src.app.utils.s3 import S3
 
 basedir = os.path.abspath(os.path.dirname(__file__))
 
@@ -17,6 +21,9 @@ class TestConfig:
     """Test configuration."""
 
     TESTING = True
+    BCRYPT_LOG_ROUNDS = 4
+    RATE_LIMIT_ENABLED = False
+    IMAGE_VARIANTS_ENABLED = False
     DEBUG = True
     SQLALCHEMY_DATABASE_URI = os.getenv(
         "TEST_DATABASE_URI"
@@ -46,7 +53,7 @@ def app() -> typing.Generator[Flask, None, None]:
 
 
 @pytest.fixture(scope="function")
-def test_client(app: Flask) -> FlaskClient:
+def test_client(app: Flask, test_db: db) -> FlaskClient:
     return app.test_client()
 
 
@@ -58,7 +65,8 @@ def test_db(app: Flask, request: pytest.FixtureRequest) -> db:
         db.drop_all()
 
     db.app = app
-    db.create_all()
+    DatabaseService.init_db()
+    DatabaseService.seed()
     request.addfinalizer(teardown)
     return db
 
@@ -78,6 +86,9 @@ def session(test_db: db, request: pytest.FixtureRequest) -> db.session:
         db.session.rollback()
         db.session.close()
         db.session.commit = old_commit
+        # Cached responses may have been built from the rolled back writes.
+        response_cache.clear()
+        forget_token_version()
 
     request.addfinalizer(teardown)
     return db.session
@@ -91,3 +102,18 @@ def admin_access_token() -> str:
 @pytest.fixture(scope="function")
 def student_access_token() -> str:
     return create_access_token(identity=2)
+
+
+@pytest.fixture(scope="function")
+def s3_stub(monkeypatch: pytest.MonkeyPatch) -> typing.Generator[Stubber, None, None]:
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "eu-central-1")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "access-key")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "secret-key")
+    monkeypatch.setenv("AWS_BUCKET_NAME_PROFILEPICS", "profilepics")
+    monkeypatch.setenv("AWS_BUCKET_NAME_CVS", "cvs")
+    monkeypatch.setenv("AWS_BUCKET_NAME_COMPANYPICS", "companypics")
+    S3.reset()
+    with Stubber(S3.client()) as stubber:
+        yield stubber
+        stubber.assert_no_pending_responses()
+    S3.reset()
@@ -6,6 +6,7 @@ from src.app.models.internships import Internships
 from src.app.models.roles import RoleEnum
 from src.app.models.time_periods import TimePeriods
 from src.app.models.users import Users
+from src.app.utils.auth import create_user_token
 from tests.conftest import EndpointEnum
 
 
@@ -184,6 +185,39 @@ def test_change_role_non_admin(
     assert response.json == {"message": "Unauthorized"}
 
 
+def test_change_role_applies_to_issued_tokens(
+    test_client: FlaskClient, session: db.session, admin_access_token: str
+) -> None:
+    """Test that tokens issued before a role change stop carrying the old role."""
+    user = Users(
+        first_name="Test",
+        last_name="User",
+        username="mynameisjeff",
+        password="hardpass",
+        role_id=RoleEnum.admin.value,
+    )
+    db.session.add(user)
+    db.session.commit()
+    access_token = create_user_token(user)
+
+    response = test_client.get(
+        "/admin/cache_stats", headers={"Authorization": f"Bearer {access_token}"}
+    )
+    assert response.status_code == 200
+
+    response = test_client.put(
+        "/admin/change_role/mynameisjeff",
+        headers={"Authorization": f"Bearer {admin_access_token}"},
+        json={"role_id": RoleEnum.student.value},
+    )
+    assert response.status_code == 200
+
+    response = test_client.get(
+        "/admin/cache_stats", headers={"Authorization": f"Bearer {access_token}"}
+    )
+    assert response.status_code == 401
+
+
 def test_delete_time_period(
     test_client: FlaskClient, session: db.session, admin_access_token: str
 ) -> None:
@@ -260,3 +294,29 @@ def test_clear_flags(
     assert len(flags) == 0
     internship = session.query(Internships).filter(Internships.id == 1).first()
     assert internship.flagged is False
+
+
+def test_cache_stats(test_client: FlaskClient, admin_access_token: str) -> None:
+    """Test the cache stats endpoint."""
+    test_client.get("/time_periods/all")
+    test_client.get("/time_periods/all")
+
+    response = test_client.get(
+        "/admin/cache_stats",
+        headers={"Authorization": f"Bearer {admin_access_token}"},
+    )
+    assert response.status_code == 200
+    assert response.json["hits"] >= 1
+    assert response.json["misses"] >= 1
+
+
+def test_cache_stats_non_admin(
+    test_client: FlaskClient, student_access_token: str
+) -> None:
+    """Test the cache stats endpoint with a non-admin user."""
+    response = test_client.get(
+        "/admin/cache_stats",
+        headers={"Authorization": f"Bearer {student_access_token}"},
+    )
+    assert response.status_code == 401
+    assert response.json == {"message": "Unauthorized"}
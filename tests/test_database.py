@@ -0,0 +1,224 @@
+import pathlib
+import typing
+
+import pytest
+from botocore.stub import Stubber
+from flask import Flask
+from flask_jwt_extended import create_access_token
+from sqlalchemy import inspect, text
+
+from src.app import create_app, db
+from src.app.extensions import response_cache
+from src.app.models.flags import Flags
+from src.app.models.internships import Internships
+from src.app.models.users import Users
+from src.app.services.database_service import DatabaseService
+from src.app.utils.auth import forget_token_version
+from src.app.utils.password_hasher import PasswordHasher
+from tests.conftest import EndpointEnum, TestConfig
+
+# The schema create_all made before the columns and indexes added since.
+BASELINE_SCHEMA = [
+    """
+    CREATE TABLE roles (
+        id INTEGER NOT NULL,
+        role VARCHAR(15) NOT NULL,
+        PRIMARY KEY (id),
+        UNIQUE (role)
+    )
+    """,
+    """
+    CREATE TABLE time_periods (
+        id INTEGER NOT NULL,
+        start_date DATE NOT NULL,
+        end_date DATE NOT NULL,
+        name VARCHAR(255) NOT NULL,
+        PRIMARY KEY (id)
+    )
+    """,
+    """
+    CREATE TABLE users (
+        id INTEGER NOT NULL,
+        first_name VARCHAR(255),
+        last_name VARCHAR(255),
+        username VARCHAR(255),
+        password VARCHAR(255) NOT NULL,
+        gpa FLOAT,
+        academic_year VARCHAR(255),
+        github_link VARCHAR(255),
+        linkedin_link VARCHAR(255),
+        website_link VARCHAR(255),
+        profile_picture_link VARCHAR(255),
+        cv_link VARCHAR(255),
+        email VARCHAR(255),
+        phone_number VARCHAR(255),
+        description VARCHAR(500),
+        role_id INTEGER NOT NULL,
+        internship_time_period_id INTEGER,
+        PRIMARY KEY (id),
+        UNIQUE (username),
+        FOREIGN KEY(role_id) REFERENCES roles (id),
+        FOREIGN KEY(internship_time_period_id) REFERENCES time_periods (id)
+    )
+    """,
+    """
+    CREATE TABLE internships (
+        id INTEGER NOT NULL,
+        company VARCHAR(255) NOT NULL,
+        position VARCHAR(255) NOT NULL,
+        website VARCHAR(255) NOT NULL,
+        deadline DATE NOT NULL,
+        author_id INTEGER NOT NULL,
+        time_period_id INTEGER NOT NULL,
+        company_photo_link VARCHAR(255),
+        flagged BOOLEAN,
+        created_at DATETIME DEFAULT (CURRENT_TIMESTAMP),
+        PRIMARY KEY (id),
+        FOREIGN KEY(author_id) REFERENCES users (id),
+        FOREIGN KEY(time_period_id) REFERENCES time_periods (id)
+    )
+    """,
+    """
+    CREATE TABLE flags (
+        id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        internship_id INTEGER NOT NULL,
+        reason VARCHAR(255),
+        PRIMARY KEY (id),
+        FOREIGN KEY(user_id) REFERENCES users (id),
+        FOREIGN KEY(internship_id) REFERENCES internships (id)
+    )
+    """,
+    "INSERT INTO roles (id, role) VALUES (1, 'Admin'), (2, 'Instructor'), "
+    "(3, 'Student')",
+    "INSERT INTO time_periods (id, start_date, end_date, name) "
+    "VALUES (1, '2023-01-01', '2023-12-31', 'Legacy period')",
+    "INSERT INTO users (id, username, password, role_id, cv_link) VALUES (1, "
+    "'legacy', 'not a hash', 3, 'https://cvs.s3.amazonaws.com/cv_1.pdf')",
+    "INSERT INTO internships (id, company, position, website, deadline, "
+    "author_id, time_period_id, flagged) VALUES (1, 'Legacy company', "
+    "'Developer', 'https://legacy.com', '2023-06-01', 1, 1, 1)",
+    "INSERT INTO flags (id, user_id, internship_id, reason) "
+    "VALUES (1, 1, 1, 'Expired')",
+]
+
+
+@pytest.fixture(scope="function")
+def baseline_app(tmp_path: pathlib.Path) -> typing.Generator[Flask, None, None]:
+    """App on its own database that has the baseline schema and some rows."""
+
+    class BaselineConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'baseline.db'}"
+
+    app = create_app(config=BaselineConfig)
+    with app.app_context():
+        for statement in BASELINE_SCHEMA:
+            db.session.execute(text(statement))
+        db.session.commit()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+    # The caches are shared with the app of the other tests.
+    response_cache.clear()
+    forget_token_version()
+
+
+def test_init_db_upgrades_baseline_schema(baseline_app: Flask) -> None:
+    """Test that db-init adds the columns and indexes an old database lacks."""
+    DatabaseService.init_db()
+    DatabaseService.seed()
+
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        assert {column.name for column in table.columns} <= columns
+        indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        assert {index.name for index in table.indexes} <= indexes
+
+    assert DatabaseService.upgrade_schema() == []
+
+    response = baseline_app.test_client().get("/internships")
+    assert response.status_code == 200
+    assert "Legacy company" in [internship["company"] for internship in response.json]
+
+
+def test_init_db_backfills_added_flag_count(baseline_app: Flask) -> None:
+    """Test that flag_count is added and counts the flags made before it."""
+    DatabaseService.init_db()
+
+    assert db.session.get(Internships, 1).flag_count == 1
+
+
+def test_init_db_removes_duplicate_flags(baseline_app: Flask) -> None:
+    """Test that repeated flags are dropped before the unique index is made."""
+    db.session.execute(
+        text(
+            "INSERT INTO flags (id, user_id, internship_id, reason) "
+            "VALUES (2, 1, 1, 'Expired again'), (3, 1, 1, 'And again')"
+        )
+    )
+    db.session.commit()
+
+    DatabaseService.init_db()
+
+    assert [flag.id for flag in Flags.query.all()] == [1]
+    assert db.session.get(Internships, 1).flag_count == 1
+
+
+def test_init_db_lets_existing_users_log_in(baseline_app: Flask) -> None:
+    """Test that users made before token_version start at 0 and can log in."""
+    db.session.execute(
+        text("UPDATE users SET password = :password WHERE id = 1"),
+        {"password": PasswordHasher.hash_password("legacypass")},
+    )
+    db.session.commit()
+
+    DatabaseService.init_db()
+
+    assert db.session.get(Users, 1).token_version == 0
+    test_client = baseline_app.test_client()
+    data = {"username": "legacy", "password": "legacypass"}
+    response = test_client.post(EndpointEnum.login.value, json=data)
+    assert response.status_code == 200
+    response = test_client.get(
+        EndpointEnum.get_current_user.value,
+        headers={"Authorization": f"Bearer {response.json['access_token']}"},
+    )
+    assert response.json == {"logged_in_as": 1}
+
+
+def test_init_db_keeps_files_uploaded_before_keys(
+    baseline_app: Flask, s3_stub: Stubber
+) -> None:
+    """Test that the key columns start empty and the linked files stay usable."""
+    DatabaseService.init_db()
+
+    user = db.session.get(Users, 1)
+    assert user.profile_picture_key is None
+    assert user.cv_key is None
+    assert db.session.get(Internships, 1).company_photo_key is None
+    s3_stub.add_response("delete_object", {}, {"Bucket": "cvs", "Key": "cv_1.pdf"})
+
+    response = baseline_app.test_client().delete(
+        "/delete_cv",
+        headers={"Authorization": f"Bearer {create_access_token(identity=1)}"},
+    )
+
+    assert response.status_code == 200
+    db.session.refresh(user)
+    assert user.cv_link is None
+
+
+def test_init_db_serializes_added_variants(baseline_app: Flask) -> None:
+    """Test that pictures from before the variants columns have no variants."""
+    DatabaseService.init_db()
+
+    test_client = baseline_app.test_client()
+    response = test_client.get("/internships")
+    assert response.json[0]["company_photo_variants"] is None
+    response = test_client.get(
+        EndpointEnum.get_user.value.format(user_id=1),
+        headers={"Authorization": f"Bearer {create_access_token(identity=1)}"},
+    )
+    assert response.status_code == 200
+    assert response.json["profile_picture_variants"] is None
@@ -0,0 +1,53 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Cold import of the app and create_app, in seconds. Flask and SQLAlchemy
+# take about 0.7s of this on a single core.
+IMPORT_TIME_BUDGET = 2.0
+# Optional dependencies that are only imported when they are used.
+LAZY_MODULES = (
+    "boto3",
+    "botocore",
+    "flask_dance",
+    "PIL",
+    "sqlalchemy.dialects.postgresql",
+)
+
+
+def import_app() -> tuple[float, set[str]]:
+    """Import the app in a fresh interpreter and return the time and modules."""
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            "from src.app import create_app; create_app()",
+        ],
+        cwd=ROOT,
+        env={**os.environ, "GOOGLE_CLIENT_ID": ""},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    total = 0
+    modules = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        modules.add(name.strip())
+        if not name.startswith("  "):
+            total += int(cumulative)
+    return total / 1_000_000, modules
+
+
+def test_import_time() -> None:
+    total, modules = import_app()
+
+    assert not modules.intersection(LAZY_MODULES)
+    assert total < IMPORT_TIME_BUDGET
@@ -1,10 +1,20 @@
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 
+import pytest
+from flask import Flask
 from flask.testing import FlaskClient
+from sqlalchemy import select, text
+from werkzeug.http import http_date
 
 from src.app import db
+from src.app.extensions import response_cache
 from src.app.models.flags import Flags
 from src.app.models.internships import Internships
+from src.app.models.internships_archive import InternshipsArchive
+from src.app.models.table_versions import TableVersions
+from src.app.services import internship_service
+from src.app.services.database_service import DatabaseService
+from src.app.utils.pagination import encode_cursor
 from tests.conftest import EndpointEnum
 
 
@@ -85,6 +95,132 @@ def test_add_internship_invalid_request(
     assert response.json == {"message": "Invalid request body"}
 
 
+def test_import_internships_csv(
+    test_client: FlaskClient, session: db.session, admin_access_token: str
+) -> None:
+    """Test importing internships from a CSV upload."""
+    body = (
+        "company,position,website,deadline,time_period_id\n"
+        "Import company,Import position,https://a.com,2099-01-01,1\n"
+        "Import company,Second position,https://a.com,2099-01-02,1\n"
+        "Import company,Past position,https://a.com,2000-01-01,1\n"
+        "Import company,Unknown period,https://a.com,2099-01-01,999\n"
+        ",Missing company,https://a.com,2099-01-01,1\n"
+    )
+    response = test_client.post(
+        "/internships/import",
+        data=body,
+        content_type="text/csv",
+        headers={"Authorization": f"Bearer {admin_access_token}"},
+    )
+    assert response.status_code == 201
+    assert response.json["created"] == 2
+    assert response.json["errors"] == [
+        {"line": 4, "message": "Deadline must be in the future"},
+        {"line": 5, "message": "Time period not found"},
+        {"line": 6, "message": "Missing company"},
+    ]
+
+    internships = (
+        session.query(Internships).filter(Internships.company == "Import company").all()
+    )
+    assert len(internships) == 2
+    assert all(internship.author_id == 1 for internship in internships)
+
+    response = test_client.get("/internships/search", query_string={"q": "second"})
+    assert [internship["position"] for internship in response.json] == [
+        "Second position"
+    ]
+
+
+def test_import_internships_too_many_rows(
+    test_client: FlaskClient,
+    session: db.session,
+    admin_access_token: str,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test that an import over the row limit is rejected with the limit."""
+    monkeypatch.setattr(internship_service, "MAX_IMPORT_ROWS", 1)
+    body = (
+        "company,position,website,deadline,time_period_id\n"
+        "Limited company,First,https://a.com,2099-01-01,1\n"
+        "Limited company,Second,https://a.com,2099-01-02,1\n"
+    )
+    response = test_client.post(
+        "/internships/import",
+        data=body,
+        content_type="text/csv",
+        headers={"Authorization": f"Bearer {admin_access_token}"},
+    )
+
+    assert response.status_code == 400
+    assert response.json == {"message": "Too many rows, at most 1 are allowed"}
+    assert (
+        session.query(Internships)
+        .filter(Internships.company == "Limited company")
+        .count()
+        == 0
+    )
+
+
+def test_import_internships_json_lines(
+    test_client: FlaskClient, session: db.session, admin_access_token: str
+) -> None:
+    """Test importing internships from a JSON Lines upload."""
+    body = (
+        '{"company": "JSON company", "position": "A", "website": "https://a.com", '
+        '"deadline": "2099-01-01", "time_period_id": 1}\n'
+        "not json\n"
+        "\n"
+        '{"company": "JSON company", "position": "B", "website": "https://a.com", '
+        '"deadline": "2099-01-01", "time_period_id": "x"}\n'
+    )
+    response = test_client.post(
+        "/internships/import",
+        data=body,
+        content_type="application/x-ndjson",
+        headers={"Authorization": f"Bearer {admin_access_token}"},
+    )
+    assert response.status_code == 201
+    assert response.json["created"] == 1
+    assert response.json["errors"] == [
+        {"line": 2, "message": "Invalid record"},
+        {"line": 4, "message": "Invalid time_period_id"},
+    ]
+
+
+def test_import_internships_invalid(
+    test_client: FlaskClient, admin_access_token: str, student_access_token: str
+) -> None:
+    """Test the import endpoint with bad uploads and a student user."""
+    response = test_client.post(
+        "/internships/import",
+        data="company\n",
+        content_type="text/csv",
+        headers={"Authorization": f"Bearer {student_access_token}"},
+    )
+    assert response.status_code == 401
+
+    response = test_client.post(
+        "/internships/import",
+        json=[],
+        headers={"Authorization": f"Bearer {admin_access_token}"},
+    )
+    assert response.status_code == 415
+
+    response = test_client.post(
+        "/internships/import",
+        data="company\nOnly company\n",
+        content_type="text/csv",
+        headers={"Authorization": f"Bearer {admin_access_token}"},
+    )
+    assert response.status_code == 400
+    assert response.json == {
+        "message": "No internships imported",
+        "errors": [{"line": 2, "message": "Missing position"}],
+    }
+
+
 def test_get_internships(test_client: FlaskClient, session: db.session) -> None:
     """Test the get internships endpoint."""
     response = test_client.get("/internships")
@@ -98,6 +234,7 @@ def test_get_internships(test_client: FlaskClient, session: db.session) -> None:
         "author_id": internship.author_id,
         "time_period_id": internship.time_period_id,
         "company_photo_link": internship.company_photo_link,
+        "company_photo_variants": internship.company_photo_variants,
         "flagged": internship.flagged,
         "created_at": internship.created_at.strftime("%Y-%m-%d %H:%M:%S"),
     }
@@ -105,6 +242,238 @@ def test_get_internships(test_client: FlaskClient, session: db.session) -> None:
     assert response.json[0] == internship_json
 
 
+def add_internships(session: db.session, count: int, **kwargs: object) -> list:
+    """Add `count` internships with increasing deadlines."""
+    internships = [
+        Internships(
+            company=kwargs.get("company", f"Paged company {i}"),
+            position="Pager",
+            website="www.paged.com",
+            deadline=datetime(2069, 1, 1 + i).date(),
+            author_id=1,
+            time_period_id=kwargs.get("time_period_id", 1),
+            flagged=kwargs.get("flagged", False),
+            created_at=datetime(2024, 1, 1),
+        )
+        for i in range(count)
+    ]
+    session.add_all(internships)
+    session.commit()
+    return internships
+
+
+def test_get_internships_pagination(
+    test_client: FlaskClient, session: db.session
+) -> None:
+    """Test paging through internships with the next cursor."""
+    add_internships(session, 5)
+    total = session.query(Internships).count()
+
+    seen = []
+    cursor = None
+    while True:
+        query = {"limit": 2, "sort": "created_at", "order": "desc"}
+        if cursor:
+            query["cursor"] = cursor
+        response = test_client.get("/internships", query_string=query)
+        assert response.status_code == 200
+        assert len(response.json) <= 2
+        seen.extend(internship["id"] for internship in response.json)
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert len(seen) == total
+    assert len(set(seen)) == total
+
+
+def page_ids(test_client: FlaskClient, query: dict, max_pages: int = 20) -> list:
+    """Follow the next cursor through every page, returning the ids in order."""
+    ids = []
+    cursor = None
+    for _ in range(max_pages):
+        response = test_client.get(
+            "/internships",
+            query_string={**query, "cursor": cursor} if cursor else query,
+        )
+        assert response.status_code == 200
+        ids.extend(internship["id"] for internship in response.json)
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return ids
+    raise AssertionError(f"Paging did not end: {ids}")
+
+
+def test_get_internships_pagination_server_default_created_at(
+    test_client: FlaskClient, session: db.session
+) -> None:
+    """Test paging by created_at over rows written with the server default."""
+    for _ in range(4):
+        session.execute(
+            text(
+                "INSERT INTO internships "
+                "(company, position, website, deadline, author_id, time_period_id) "
+                "VALUES ('Legacy company', 'Pager', 'www.legacy.com', '2069-01-01', 1, 1)"
+            )
+        )
+    ids = session.scalars(
+        select(Internships.id).where(Internships.company == "Legacy company")
+    ).all()
+    DatabaseService.normalize_timestamps()
+
+    query = {"company": "Legacy company", "sort": "created_at", "limit": 1}
+    assert page_ids(test_client, query) == sorted(ids)
+    assert page_ids(test_client, {**query, "order": "desc"}) == sorted(ids)[::-1]
+
+
+def test_get_internships_filters(test_client: FlaskClient, session: db.session) -> None:
+    """Test the server-side filters of the get internships endpoint."""
+    add_internships(session, 3, company="Filtered company", flagged=True)
+
+    response = test_client.get(
+        "/internships",
+        query_string={
+            "company": "Filtered company",
+            "flagged": "true",
+            "deadline_from": "2069-01-02",
+            "deadline_to": "2069-01-03",
+        },
+    )
+    assert response.status_code == 200
+    assert [internship["deadline"] for internship in response.json] == [
+        "2069-01-02",
+        "2069-01-03",
+    ]
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_get_internships_invalid_query(test_client: FlaskClient) -> None:
+    """Test the get internships endpoint with invalid query parameters."""
+    for query in (
+        {"sort": "company"},
+        {"limit": "0"},
+        {"cursor": "not a cursor"},
+        {"cursor": encode_cursor([1, 2])},
+        {"cursor": encode_cursor([None, None])},
+        {"cursor": encode_cursor([{"a": 1}, 1]), "sort": "created_at"},
+        {"flagged": "maybe"},
+        {"deadline_from": "yesterday"},
+        {"time_period_id": "one"},
+    ):
+        response = test_client.get("/internships", query_string=query)
+        assert response.status_code == 400
+        assert response.json == {"message": "Invalid query parameters"}
+
+
+def test_archive_internships(
+    app: Flask, test_client: FlaskClient, session: db.session
+) -> None:
+    """Test that the archive command moves expired internships out of listings."""
+    active = add_internships(session, 1)[0]
+    session.add(Flags(internship_id=1, user_id=1))
+    session.commit()
+
+    result = app.test_cli_runner().invoke(
+        args=["archive-internships", "--batch-size", "1"]
+    )
+    assert result.exit_code == 0
+
+    assert session.get(Internships, 1) is None
+    assert session.get(InternshipsArchive, 1).company == "piti company"
+    assert session.query(Flags).filter(Flags.internship_id == 1).count() == 0
+
+    response = test_client.get("/internships")
+    assert [internship["id"] for internship in response.json] == [active.id]
+    assert test_client.get("/internships/search?q=facility").json == []
+
+    response = test_client.get("/internships?include_archived=1")
+    ids = [internship["id"] for internship in response.json]
+    assert ids == [1, 2, active.id]
+
+
+def test_archive_internships_ids_not_reused(
+    app: Flask, test_client: FlaskClient, session: db.session
+) -> None:
+    """Test that internships added after archiving do not reuse archived ids."""
+    runner = app.test_cli_runner()
+    args = ["archive-internships", "--before", "2100-01-01"]
+    assert runner.invoke(args=args).exit_code == 0
+    archived_ids = {row.id for row in session.query(InternshipsArchive)}
+
+    added = add_internships(session, 1)[0]
+    assert added.id not in archived_ids
+    assert runner.invoke(args=args).exit_code == 0
+
+    response = test_client.get("/internships?include_archived=1")
+    ids = [internship["id"] for internship in response.json]
+    assert sorted(ids) == sorted(archived_ids | {added.id})
+
+
+def test_search_internships(
+    test_client: FlaskClient, session: db.session, admin_access_token: str
+) -> None:
+    """Test the search endpoint with ranking and prefix matching."""
+    for company, position in (
+        ("Searchable Robotics", "Robot engineer"),
+        ("Searchable Bakery", "Robot baker"),
+    ):
+        response = test_client.post(
+            "/internships/add_internship",
+            json={
+                "company": company,
+                "position": position,
+                "website": "www.search.com",
+                "deadline": "2069-01-01",
+                "time_period_id": 1,
+            },
+            headers={"Authorization": f"Bearer {admin_access_token}"},
+        )
+        assert response.status_code == 201
+
+    response = test_client.get("/internships/search", query_string={"q": "searcha"})
+    assert response.status_code == 200
+    assert {internship["company"] for internship in response.json} == {
+        "Searchable Robotics",
+        "Searchable Bakery",
+    }
+
+    response = test_client.get(
+        "/internships/search", query_string={"q": "robot searchable bak"}
+    )
+    assert [internship["company"] for internship in response.json] == [
+        "Searchable Bakery"
+    ]
+
+
+def test_search_internships_follows_updates_and_deletes(
+    test_client: FlaskClient, session: db.session
+) -> None:
+    """Test that the search index follows updates and deletes."""
+    data = {
+        "company": "Reindexed company",
+        "position": "Baller",
+        "website": "www.baller.com",
+        "deadline": "2069-01-01",
+        "time_period_id": 1,
+    }
+    headers = {"Authorization": f"Bearer {get_token(test_client)}"}
+    test_client.put("/internships/1", json=data, headers=headers)
+
+    response = test_client.get("/internships/search", query_string={"q": "reindexed"})
+    assert [internship["id"] for internship in response.json] == [1]
+
+    test_client.delete("/internships/1", headers=headers)
+    response = test_client.get("/internships/search", query_string={"q": "reindexed"})
+    assert response.json == []
+
+
+def test_search_internships_invalid_query(test_client: FlaskClient) -> None:
+    """Test the search endpoint without a query."""
+    response = test_client.get("/internships/search", query_string={"q": " "})
+    assert response.status_code == 400
+    assert response.json == {"message": "Invalid query parameters"}
+
+
 def test_view_internship(
     test_client: FlaskClient, session: db.session, admin_access_token: str
 ) -> None:
@@ -166,6 +535,40 @@ def test_update_internship(test_client: FlaskClient, session: db.session) -> Non
     assert internship.time_period_id == 1
 
 
+def test_update_internship_keeps_uploaded_photo(
+    test_client: FlaskClient, session: db.session
+) -> None:
+    """Test that the uploaded photo is only forgotten when its link changes."""
+    internship = session.get(Internships, 1)
+    internship.company_photo_key = "companypic_1.png"
+    internship.company_photo_link = "https://companypics/companypic_1.png"
+    internship.company_photo_variants = {
+        "64": "https://companypics/companypic_1_png_64.webp"
+    }
+    session.commit()
+    data = {
+        "company": "Baller company",
+        "position": "Baller",
+        "website": "www.baller.com",
+        "deadline": "2025-01-01",
+        "time_period_id": 1,
+    }
+
+    for link, key in (
+        ("https://companypics/companypic_1.png", "companypic_1.png"),
+        ("www.baller.com/photo.jpg", None),
+    ):
+        response = test_client.put(
+            "/internships/1",
+            json={**data, "company_photo_link": link},
+            headers={"Authorization": f"Bearer {get_token(test_client)}"},
+        )
+        assert response.status_code == 200
+        session.refresh(internship)
+        assert internship.company_photo_key == key
+        assert (internship.company_photo_variants is None) == (key is None)
+
+
 def test_admin_update_internship(
     test_client: FlaskClient, session: db.session, admin_access_token: str
 ) -> None:
@@ -310,6 +713,63 @@ def test_flag_internship(test_client: FlaskClient, session: db.session) -> None:
     flag = session.query(Flags).filter(Flags.internship_id == 1).first()
     assert flag.internship_id == 1
     assert flag.user_id == 1
+    assert internship.flag_count == 1
+
+
+def test_flag_count_follows_flags(
+    test_client: FlaskClient,
+    session: db.session,
+    admin_access_token: str,
+    student_access_token: str,
+) -> None:
+    """Test that flagged stays set until the last flag is removed."""
+    for token in (admin_access_token, student_access_token):
+        test_client.put(
+            EndpointEnum.flag_internship.value.format(internship_id=1),
+            headers={"Authorization": f"Bearer {token}"},
+        )
+    internship = session.query(Internships).filter(Internships.id == 1).first()
+    assert internship.flag_count == 2
+
+    test_client.put(
+        EndpointEnum.unflag_internship.value.format(internship_id=1),
+        headers={"Authorization": f"Bearer {admin_access_token}"},
+    )
+    assert internship.flag_count == 1
+    assert internship.flagged is True
+
+    test_client.put(
+        EndpointEnum.unflag_internship.value.format(internship_id=1),
+        headers={"Authorization": f"Bearer {student_access_token}"},
+    )
+    assert internship.flag_count == 0
+    assert internship.flagged is False
+
+
+def test_backfill_flag_counts(test_client: FlaskClient, session: db.session) -> None:
+    """Test that flag_count is recounted for internships flagged before it existed."""
+    session.add_all(Flags(internship_id=1, user_id=user_id) for user_id in (1, 2))
+    session.commit()
+
+    assert DatabaseService.backfill_flag_counts() == 1
+    internship = session.get(Internships, 1)
+    session.refresh(internship)
+    assert internship.flag_count == 2
+    assert DatabaseService.backfill_flag_counts() == 0
+
+
+def test_flag_internship_twice(test_client: FlaskClient, session: db.session) -> None:
+    """Test that flagging an internship again does not add another flag."""
+    for _ in range(2):
+        response = test_client.put(
+            EndpointEnum.flag_internship.value.format(internship_id=1),
+            headers={"Authorization": f"Bearer {get_token(test_client)}"},
+        )
+        assert response.status_code == 200
+
+    assert session.query(Flags).filter(Flags.internship_id == 1).count() == 1
+    internship = session.query(Internships).filter(Internships.id == 1).first()
+    assert internship.flag_count == 1
 
 
 def test_flag_internship_dne(test_client: FlaskClient) -> None:
@@ -353,3 +813,105 @@ def test_unflag_internship_dne(test_client: FlaskClient) -> None:
     )
     assert response.status_code == 404
     assert response.json == {"message": "Internship not found"}
+
+
+def test_get_internship_cached_until_updated(
+    test_client: FlaskClient, session: db.session
+) -> None:
+    """Test that cached internship responses are dropped by an update."""
+    stats = response_cache.stats()
+    first = test_client.get("/internships/1")
+    second = test_client.get("/internships/1")
+    assert first.json == second.json
+    assert response_cache.stats()["hits"] == stats["hits"] + 1
+
+    data = {
+        "company": "Cache busting company",
+        "position": "Baller",
+        "website": "www.baller.com",
+        "deadline": "2069-01-01",
+        "time_period_id": 1,
+    }
+    test_client.put(
+        "/internships/1",
+        json=data,
+        headers={"Authorization": f"Bearer {get_token(test_client)}"},
+    )
+
+    response = test_client.get("/internships/1")
+    assert response.json["company"] == "Cache busting company"
+    response = test_client.get(
+        "/internships", query_string={"company": data["company"]}
+    )
+    assert [internship["id"] for internship in response.json] == [1]
+
+
+def set_internships_updated_at(session: db.session, updated_at: datetime) -> None:
+    """Pretend the internships table was last written at `updated_at`."""
+    version = session.get(TableVersions, "internships")
+    version.updated_at = updated_at.astimezone(timezone.utc).replace(tzinfo=None)
+    session.commit()
+
+
+def test_get_internships_if_modified_since(
+    test_client: FlaskClient, session: db.session
+) -> None:
+    """Test that If-Modified-Since is only answered once the date is unambiguous."""
+    set_internships_updated_at(
+        session, datetime.now(timezone.utc) - timedelta(minutes=1)
+    )
+    response = test_client.get("/internships")
+    last_modified = response.headers["Last-Modified"]
+
+    headers = {"If-Modified-Since": last_modified}
+    response = test_client.get("/internships", headers=headers)
+    assert response.status_code == 304
+
+    # A write in the same second as the date the client has must not be hidden.
+    now = datetime.now(timezone.utc)
+    set_internships_updated_at(session, now)
+    headers = {"If-Modified-Since": http_date(now)}
+    response = test_client.get("/internships", headers=headers)
+    assert response.status_code == 200
+    assert "Last-Modified" not in response.headers
+
+
+def test_get_internships_conditional(
+    test_client: FlaskClient, session: db.session, admin_access_token: str
+) -> None:
+    """Test that the internship list answers If-None-Match with a 304."""
+    set_internships_updated_at(
+        session, datetime.now(timezone.utc) - timedelta(minutes=1)
+    )
+    response = test_client.get("/internships")
+    etag = response.headers["ETag"]
+    assert response.headers["Last-Modified"]
+
+    response = test_client.get("/internships", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.data == b""
+
+    test_client.put(
+        EndpointEnum.flag_internship.value.format(internship_id=1),
+        headers={"Authorization": f"Bearer {admin_access_token}"},
+    )
+
+    response = test_client.get("/internships/1", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json["flagged"] is True
+
+
+def test_get_internships_stream(test_client: FlaskClient, session: db.session) -> None:
+    """Test streaming every matching internship in one response."""
+    add_internships(session, 5, company="Streamed company")
+
+    response = test_client.get(
+        "/internships",
+        query_string={"stream": "1", "company": "Streamed company", "limit": 2},
+    )
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert [internship["deadline"] for internship in response.json] == [
+        f"2069-01-0{day}" for day in range(1, 6)
+    ]
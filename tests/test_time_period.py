@@ -1,3 +1,6 @@
+import datetime
+
+import pytest
 from flask.testing import FlaskClient
 
 from src.app.extensions import db
@@ -15,3 +18,43 @@ def test_get_all_time_periods(test_client: FlaskClient, session: db.session) ->
 
     assert response.status_code == 200
     assert response.json[0] == time_period_json
+
+
+def test_get_all_time_periods_conditional(
+    test_client: FlaskClient, session: db.session, admin_access_token: str
+) -> None:
+    """Test that adding a time period changes the ETag of the list."""
+    response = test_client.get("/time_periods/all")
+    etag = response.headers["ETag"]
+    response = test_client.get("/time_periods/all", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    test_client.post(
+        "/admin/add_time_period",
+        headers={"Authorization": f"Bearer {admin_access_token}"},
+        json={"start_date": "2069-01-01", "end_date": "2069-03-31", "name": "T1 2069"},
+    )
+
+    response = test_client.get("/time_periods/all", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json[-1]["name"] == "T1 2069"
+
+
+def test_get_time_periods_conditional(
+    test_client: FlaskClient, session: db.session, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that the ETag of the upcoming time periods changes every day."""
+    response = test_client.get("/time_periods")
+    etag = response.headers["ETag"]
+    assert "Last-Modified" not in response.headers
+    response = test_client.get("/time_periods", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    class Tomorrow(datetime.date):
+        @classmethod
+        def today(cls) -> datetime.date:
+            return super().today() + datetime.timedelta(days=1)
+
+    monkeypatch.setattr(datetime, "date", Tomorrow)
+    response = test_client.get("/time_periods", headers={"If-None-Match": etag})
+    assert response.status_code == 200
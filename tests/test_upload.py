@@ -0,0 +1,454 @@
+import base64
+import datetime
+import io
+import json
+
+import pytest
+from botocore.response import StreamingBody
+from botocore.stub import Stubber
+from flask import Flask
+from flask.testing import FlaskClient
+from werkzeug.test import TestResponse
+
+from src.app import db
+from src.app.models.users import Users
+from src.app.services.upload_service import CV, PROFILE_PICTURE, UploadService
+from src.app.utils.image_processor import VARIANT_SIZES, ImageProcessor, variant_key
+from src.app.utils.s3 import MB, S3
+
+
+def test_s3_client_is_shared() -> None:
+    S3.reset()
+    client = S3.client()
+
+    assert S3.client() is client
+    assert client.meta.config.max_pool_connections == S3.max_pool_connections
+    assert client.meta.config.retries["mode"] == S3.retry_mode
+
+    # A forked worker builds its own client.
+    S3._pid = -1
+    assert S3.client() is not client
+    S3.reset()
+
+
+def upload_profilepic(
+    test_client: FlaskClient, token: str, filename: str
+) -> TestResponse:
+    return test_client.put(
+        "/upload_profilepic",
+        data={"file": (io.BytesIO(b"image"), filename)},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+
+@pytest.fixture(scope="function")
+def s3_calls(s3_stub: Stubber) -> list[tuple[str, dict]]:
+    """Record the operations sent to S3 with their parameters."""
+    calls = []
+    S3.client().meta.events.register(
+        "provide-client-params.s3.*",
+        lambda params, model, **kwargs: calls.append((model.name, dict(params))),
+    )
+    return calls
+
+
+def test_upload_profilepic(
+    test_client: FlaskClient,
+    session: db.session,
+    student_access_token: str,
+    s3_stub: Stubber,
+    s3_calls: list[tuple[str, dict]],
+) -> None:
+    s3_stub.add_response("put_object", {})
+
+    response = upload_profilepic(test_client, student_access_token, "me.jpg")
+
+    assert response.status_code == 200
+    url = "https://profilepics.s3.eu-central-1.amazonaws.com/profilepic_2.jpg"
+    assert response.json["url"] == url
+    [(operation, params)] = s3_calls
+    assert operation == "PutObject"
+    assert params["Bucket"] == "profilepics"
+    assert params["Key"] == "profilepic_2.jpg"
+    assert params["ContentType"] == "image/jpeg"
+    user = session.get(Users, 2)
+    assert user.profile_picture_key == "profilepic_2.jpg"
+    assert user.profile_picture_link == url
+
+
+def test_upload_profilepic_deletes_replaced_file(
+    test_client: FlaskClient,
+    session: db.session,
+    student_access_token: str,
+    s3_stub: Stubber,
+) -> None:
+    session.get(Users, 2).profile_picture_key = "profilepic_2.jpg"
+    session.commit()
+    s3_stub.add_response("put_object", {})
+    s3_stub.add_response(
+        "delete_object", {}, {"Bucket": "profilepics", "Key": "profilepic_2.jpg"}
+    )
+
+    response = upload_profilepic(test_client, student_access_token, "me.png")
+
+    assert response.status_code == 200
+    assert session.get(Users, 2).profile_picture_key == "profilepic_2.png"
+
+
+def test_upload_profilepic_processes_picture(
+    test_client: FlaskClient,
+    session: db.session,
+    student_access_token: str,
+    s3_stub: Stubber,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    submitted = []
+    monkeypatch.setattr(ImageProcessor, "submit", lambda *args: submitted.append(args))
+    s3_stub.add_response("put_object", {})
+
+    response = upload_profilepic(test_client, student_access_token, "me.png")
+
+    assert response.status_code == 200
+    assert submitted == [
+        (UploadService.process_picture, PROFILE_PICTURE, 2, "profilepic_2.png")
+    ]
+
+
+def test_process_picture(
+    session: db.session, s3_stub: Stubber, s3_calls: list[tuple[str, dict]]
+) -> None:
+    image = pytest.importorskip("PIL.Image")
+    picture = io.BytesIO()
+    image.new("RGB", (800, 400), "red").save(picture, "PNG")
+    session.get(Users, 2).profile_picture_key = "profilepic_2.png"
+    session.commit()
+    s3_stub.add_response(
+        "get_object",
+        {
+            "Body": StreamingBody(
+                io.BytesIO(picture.getvalue()), len(picture.getvalue())
+            )
+        },
+        {"Bucket": "profilepics", "Key": "profilepic_2.png"},
+    )
+    for _ in VARIANT_SIZES:
+        s3_stub.add_response("put_object", {})
+
+    urls = UploadService.process_picture(PROFILE_PICTURE, 2, "profilepic_2.png")
+
+    assert urls == {
+        str(size): "https://profilepics.s3.eu-central-1.amazonaws.com/"
+        f"profilepic_2_png_{size}.webp"
+        for size in VARIANT_SIZES
+    }
+    assert session.get(Users, 2).profile_picture_variants == urls
+    sizes = {}
+    for operation, params in s3_calls[1:]:
+        assert operation == "PutObject"
+        assert params["ContentType"] == "image/webp"
+        with image.open(io.BytesIO(params["Body"])) as variant:
+            sizes[params["Key"]] = (variant.format, variant.size)
+    assert sizes == {
+        "profilepic_2_png_400.webp": ("WEBP", (400, 200)),
+        "profilepic_2_png_200.webp": ("WEBP", (200, 100)),
+        "profilepic_2_png_64.webp": ("WEBP", (64, 32)),
+    }
+
+
+def test_process_picture_replaced_meanwhile(
+    session: db.session, s3_stub: Stubber
+) -> None:
+    image = pytest.importorskip("PIL.Image")
+    picture = io.BytesIO()
+    image.new("RGB", (800, 400), "red").save(picture, "PNG")
+    session.get(Users, 2).profile_picture_key = "profilepic_2.jpg"
+    session.commit()
+    s3_stub.add_response(
+        "get_object",
+        {
+            "Body": StreamingBody(
+                io.BytesIO(picture.getvalue()), len(picture.getvalue())
+            )
+        },
+        {"Bucket": "profilepics", "Key": "profilepic_2.png"},
+    )
+
+    urls = UploadService.process_picture(PROFILE_PICTURE, 2, "profilepic_2.png")
+
+    assert urls == {}
+    assert session.get(Users, 2).profile_picture_variants is None
+
+
+def test_variant_keys_differ_by_extension() -> None:
+    assert variant_key("profilepic_2.png", 64) == "profilepic_2_png_64.webp"
+    assert variant_key("profilepic_2.jpg", 64) == "profilepic_2_jpg_64.webp"
+
+
+def test_render_variants_rejects_large_pictures(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    image = pytest.importorskip("PIL.Image")
+    picture = io.BytesIO()
+    image.new("RGB", (300, 200), "red").save(picture, "PNG")
+    picture.seek(0)
+    monkeypatch.setattr(ImageProcessor, "max_pixels", 300 * 200 - 1)
+
+    with pytest.raises(ValueError):
+        ImageProcessor.render_variants(picture)
+
+
+def test_image_processor_logs_failed_jobs(
+    app: Flask, monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture
+) -> None:
+    monkeypatch.setattr(ImageProcessor, "available", classmethod(lambda cls: True))
+
+    def fail() -> None:
+        raise RuntimeError("broken picture")
+
+    future = ImageProcessor.submit(fail)
+
+    with pytest.raises(RuntimeError):
+        future.result()
+    assert "Background job" in caplog.text
+    assert "broken picture" in caplog.text
+    ImageProcessor.shutdown(wait=True)
+
+
+def test_upload_cv_multipart(
+    test_client: FlaskClient,
+    session: db.session,
+    student_access_token: str,
+    s3_stub: Stubber,
+    s3_calls: list[tuple[str, dict]],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(S3, "multipart_threshold", 5 * MB)
+    monkeypatch.setattr(S3, "multipart_chunksize", 5 * MB)
+    monkeypatch.setattr(S3, "max_concurrency", 1)
+    s3_stub.add_response("create_multipart_upload", {"UploadId": "upload"})
+    s3_stub.add_response("upload_part", {"ETag": "etag-1"})
+    s3_stub.add_response("upload_part", {"ETag": "etag-2"})
+    s3_stub.add_response("complete_multipart_upload", {})
+
+    response = test_client.put(
+        "/upload_cv",
+        data={"file": (io.BytesIO(b"x" * 6 * MB), "cv.docx")},
+        headers={"Authorization": f"Bearer {student_access_token}"},
+    )
+
+    assert response.status_code == 200
+    assert [operation for operation, _ in s3_calls] == [
+        "CreateMultipartUpload",
+        "UploadPart",
+        "UploadPart",
+        "CompleteMultipartUpload",
+    ]
+    assert s3_calls[0][1]["ContentType"] == (
+        "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+    )
+    assert [params["PartNumber"] for _, params in s3_calls[1:3]] == [1, 2]
+    assert session.get(Users, 2).cv_key == "cv_2.docx"
+
+
+def test_presign_upload(
+    test_client: FlaskClient, student_access_token: str, s3_stub: Stubber
+) -> None:
+    response = test_client.post(
+        "/presign_upload",
+        json={"kind": "cv", "filename": "my cv.pdf"},
+        headers={"Authorization": f"Bearer {student_access_token}"},
+    )
+
+    assert response.status_code == 200
+    assert response.json["key"] == "cv_2.pdf"
+    assert response.json["url"].startswith("https://cvs.s3.")
+    fields = response.json["fields"]
+    assert fields["key"] == "cv_2.pdf"
+    assert fields["Content-Type"] == "application/pdf"
+    policy = json.loads(base64.b64decode(fields["policy"]))
+    assert ["content-length-range", 1, CV.max_size] in policy["conditions"]
+    assert {"Content-Type": "application/pdf"} in policy["conditions"]
+
+
+def test_presign_upload_invalid_format(
+    test_client: FlaskClient, student_access_token: str, s3_stub: Stubber
+) -> None:
+    response = test_client.post(
+        "/presign_upload",
+        json={"kind": "profilepic", "filename": "me.exe"},
+        headers={"Authorization": f"Bearer {student_access_token}"},
+    )
+
+    assert response.status_code == 400
+    assert response.json == {"message": "Invalid file format"}
+
+
+def test_complete_upload(
+    test_client: FlaskClient,
+    session: db.session,
+    student_access_token: str,
+    s3_stub: Stubber,
+) -> None:
+    s3_stub.add_response("head_object", {}, {"Bucket": "cvs", "Key": "cv_2.pdf"})
+
+    response = test_client.post(
+        "/complete_upload",
+        json={"kind": "cv", "key": "cv_2.pdf"},
+        headers={"Authorization": f"Bearer {student_access_token}"},
+    )
+
+    assert response.status_code == 200
+    assert response.json["url"] == "https://cvs.s3.eu-central-1.amazonaws.com/cv_2.pdf"
+    assert session.get(Users, 2).cv_key == "cv_2.pdf"
+
+
+def test_complete_upload_other_users_key(
+    test_client: FlaskClient, student_access_token: str, s3_stub: Stubber
+) -> None:
+    response = test_client.post(
+        "/complete_upload",
+        json={"kind": "cv", "key": "cv_1.pdf"},
+        headers={"Authorization": f"Bearer {student_access_token}"},
+    )
+
+    assert response.status_code == 400
+    assert response.json == {"message": "Invalid key"}
+
+
+def test_complete_upload_not_uploaded(
+    test_client: FlaskClient, student_access_token: str, s3_stub: Stubber
+) -> None:
+    s3_stub.add_client_error(
+        "head_object", service_error_code="404", http_status_code=404
+    )
+
+    response = test_client.post(
+        "/complete_upload",
+        json={"kind": "cv", "key": "cv_2.pdf"},
+        headers={"Authorization": f"Bearer {student_access_token}"},
+    )
+
+    assert response.status_code == 404
+    assert response.json == {"message": "File not found"}
+
+
+def test_delete_profilepic(
+    test_client: FlaskClient,
+    session: db.session,
+    student_access_token: str,
+    s3_stub: Stubber,
+) -> None:
+    user = session.get(Users, 2)
+    user.profile_picture_key = "profilepic_2.gif"
+    user.profile_picture_link = "https://profilepics/profilepic_2.gif"
+    session.commit()
+    keys = ["profilepic_2.gif"] + [
+        f"profilepic_2_gif_{size}.webp" for size in VARIANT_SIZES
+    ]
+    s3_stub.add_response(
+        "delete_objects",
+        {},
+        {
+            "Bucket": "profilepics",
+            "Delete": {"Objects": [{"Key": key} for key in keys], "Quiet": True},
+        },
+    )
+
+    response = test_client.delete(
+        "/delete_profilepic",
+        headers={"Authorization": f"Bearer {student_access_token}"},
+    )
+
+    assert response.status_code == 200
+    session.refresh(user)
+    assert user.profile_picture_key is None
+    assert user.profile_picture_link is None
+
+
+def test_delete_profilepic_not_found(
+    test_client: FlaskClient, student_access_token: str, s3_stub: Stubber
+) -> None:
+    response = test_client.delete(
+        "/delete_profilepic",
+        headers={"Authorization": f"Bearer {student_access_token}"},
+    )
+
+    assert response.status_code == 404
+    assert response.json == {"message": "File not found"}
+
+
+def test_delete_cv_uploaded_before_keys(
+    test_client: FlaskClient,
+    session: db.session,
+    student_access_token: str,
+    s3_stub: Stubber,
+) -> None:
+    user = session.get(Users, 2)
+    user.cv_link = "https://cvs.s3.eu-central-1.amazonaws.com/cv_2.pdf"
+    session.commit()
+    s3_stub.add_response("delete_object", {}, {"Bucket": "cvs", "Key": "cv_2.pdf"})
+
+    response = test_client.delete(
+        "/delete_cv", headers={"Authorization": f"Bearer {student_access_token}"}
+    )
+
+    assert response.status_code == 200
+    session.refresh(user)
+    assert user.cv_link is None
+
+
+def test_delete_cv_linking_other_users_file(
+    test_client: FlaskClient,
+    session: db.session,
+    student_access_token: str,
+    s3_stub: Stubber,
+) -> None:
+    user = session.get(Users, 2)
+    user.cv_link = "https://cvs.s3.eu-central-1.amazonaws.com/cv_1.pdf"
+    session.commit()
+
+    response = test_client.delete(
+        "/delete_cv", headers={"Authorization": f"Bearer {student_access_token}"}
+    )
+
+    assert response.status_code == 404
+    assert response.json == {"message": "File not found"}
+
+
+def test_prune_uploads(app: Flask, session: db.session, s3_stub: Stubber) -> None:
+    user = session.get(Users, 2)
+    user.profile_picture_key = "profilepic_2.png"
+    user.cv_link = "https://cvs/cv_2.pdf"
+    session.commit()
+    old = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+    new = datetime.datetime.now(datetime.timezone.utc)
+    s3_stub.add_response(
+        "list_objects_v2",
+        {
+            "Contents": [
+                {"Key": "profilepic_2.png", "LastModified": old},
+                {"Key": "profilepic_3.gif", "LastModified": old},
+                {"Key": "profilepic_4.png", "LastModified": new},
+            ]
+        },
+        {"Bucket": "profilepics"},
+    )
+    s3_stub.add_response(
+        "delete_objects",
+        {},
+        {
+            "Bucket": "profilepics",
+            "Delete": {"Objects": [{"Key": "profilepic_3.gif"}], "Quiet": True},
+        },
+    )
+    s3_stub.add_response(
+        "list_objects_v2",
+        {"Contents": [{"Key": "cv_2.pdf", "LastModified": old}]},
+        {"Bucket": "cvs"},
+    )
+    s3_stub.add_response("list_objects_v2", {}, {"Bucket": "companypics"})
+
+    result = app.test_cli_runner().invoke(args=["prune-uploads"])
+
+    assert result.exit_code == 0, result.output
+    assert "Deleted 1 files from AWS_BUCKET_NAME_PROFILEPICS" in result.output
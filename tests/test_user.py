@@ -1,11 +1,18 @@
+import bcrypt
+import pytest
+from flask import request
 from flask.testing import FlaskClient
-from flask_jwt_extended import get_jwt_identity
+from flask_jwt_extended import decode_token, get_jwt_identity
 from werkzeug.test import TestResponse
 
-from src.app import db
+from src.app import create_app, db
+from src.app.extensions import rate_limiter
 from src.app.models.roles import RoleEnum
 from src.app.models.users import Users
-from tests.conftest import EndpointEnum
+from src.app.services import user_service
+from src.app.utils.pagination import encode_cursor
+from src.app.utils.password_hasher import PasswordHasher, PasswordHasherBusyError
+from tests.conftest import EndpointEnum, TestConfig
 
 
 def register_user(test_client: FlaskClient, data: dict) -> TestResponse:
@@ -27,6 +34,7 @@ def test_login(test_client: FlaskClient, session: db.session) -> None:
     assert response.status_code == 200
     assert "access_token" in response.json
     access_token = response.json["access_token"]
+    assert decode_token(access_token)["role"] == RoleEnum.admin.value
     response = test_client.get(
         EndpointEnum.get_current_user.value,
         headers={"Authorization": f"Bearer {access_token}"},
@@ -35,6 +43,181 @@ def test_login(test_client: FlaskClient, session: db.session) -> None:
     assert response.json == {"logged_in_as": 1}
 
 
+def test_login_rehashes_password(test_client: FlaskClient, session: db.session) -> None:
+    """Test that logging in redoes a hash made with another work factor."""
+    user = session.query(Users).filter(Users.username == "admin").first()
+    user.password = bcrypt.hashpw(b"hardpass", bcrypt.gensalt(5)).decode()
+    session.commit()
+
+    data = {"username": "admin", "password": "hardpass"}
+    response = test_client.post(EndpointEnum.login.value, json=data)
+    assert response.status_code == 200
+
+    session.refresh(user)
+    assert not PasswordHasher.needs_rehash(user.password)
+    assert PasswordHasher.verify_password("hardpass", user.password)
+
+
+def test_login_password_hasher_busy(
+    test_client: FlaskClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that logins are turned away while the password hasher is saturated."""
+
+    def busy(*args: object) -> None:
+        raise PasswordHasherBusyError()
+
+    monkeypatch.setattr(PasswordHasher, "_run", busy)
+    data = {"username": "admin", "password": "hardpass"}
+    response = test_client.post(EndpointEnum.login.value, json=data)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_hash_many_takes_a_place_per_chunk(
+    test_client: FlaskClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that bulk hashing leaves room for logins between chunks of the pool."""
+    chunks = []
+    original_map = PasswordHasher._map
+
+    def map_chunk(function: object, *iterables: list) -> list:
+        chunks.append(len(iterables[0]))
+        return original_map(function, *iterables)
+
+    monkeypatch.setattr(PasswordHasher, "max_workers", 2)
+    monkeypatch.setattr(PasswordHasher, "_map", map_chunk)
+    passwords = [f"pass{i}" for i in range(5)]
+    hashes = PasswordHasher.hash_many(passwords)
+
+    assert chunks == [2, 2, 1]
+    assert all(map(PasswordHasher.verify_password, passwords, hashes))
+
+
+def test_login_rate_limited(
+    test_client: FlaskClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that logins over a username's budget are rejected with a 429."""
+    monkeypatch.setattr(rate_limiter, "enabled", True)
+    monkeypatch.setattr(rate_limiter, "username_limit", (2, 0.01))
+    rate_limiter.store.clear()
+
+    data = {"username": "admin", "password": "wrongpass"}
+    for _ in range(2):
+        response = test_client.post(EndpointEnum.login.value, json=data)
+        assert response.status_code == 401
+
+    response = test_client.post(EndpointEnum.login.value, json=data)
+    assert response.status_code == 429
+    assert response.json == {"message": "Too many requests"}
+    assert int(response.headers["Retry-After"]) > 0
+
+    data = {"username": "student", "password": "hardpass"}
+    response = test_client.post(EndpointEnum.login.value, json=data)
+    assert response.status_code == 200
+    rate_limiter.store.clear()
+
+
+def test_rate_limit_behind_proxy() -> None:
+    """Test that clients behind a trusted proxy are told apart by their own IP."""
+
+    class ProxiedConfig(TestConfig):
+        PROXY_FIX_X_FOR = 1
+
+    app = create_app(config=ProxiedConfig)
+    app.add_url_rule("/remote_addr", view_func=lambda: request.remote_addr)
+
+    response = app.test_client().get(
+        "/remote_addr",
+        headers={"X-Forwarded-For": "203.0.113.7"},
+        environ_base={"REMOTE_ADDR": "10.0.0.1"},
+    )
+    assert response.text == "203.0.113.7"
+
+
+def test_import_users(
+    test_client: FlaskClient,
+    session: db.session,
+    admin_access_token: str,
+    student_access_token: str,
+) -> None:
+    """Test registering a roster of students from a CSV upload."""
+    body = (
+        "username,password,first_name,last_name\n"
+        "rostered1,pass1,Roster,One\n"
+        "student,pass2,Already,Taken\n"
+        "rostered2,pass3,Roster,Two\n"
+        "rostered1,pass4,Roster,Again\n"
+        "rostered3,,No,Password\n"
+    )
+    response = test_client.post(
+        "/users/import",
+        data=body,
+        content_type="text/csv",
+        headers={"Authorization": f"Bearer {student_access_token}"},
+    )
+    assert response.status_code == 401
+
+    response = test_client.post(
+        "/users/import",
+        data=body,
+        content_type="text/csv",
+        headers={"Authorization": f"Bearer {admin_access_token}"},
+    )
+    assert response.status_code == 201
+    assert response.json["created"] == 2
+    assert response.json["errors"] == [
+        {"line": 3, "message": "Username already exists"},
+        {"line": 5, "message": "Duplicate username"},
+        {"line": 6, "message": "Missing password"},
+    ]
+
+    user = session.query(Users).filter(Users.username == "rostered2").first()
+    assert user.role_id == RoleEnum.student.value
+    assert user.first_name == "Roster"
+    data = {"username": "rostered2", "password": "pass3"}
+    response = test_client.post(EndpointEnum.login.value, json=data)
+    assert response.status_code == 200
+
+
+def test_google_login_creates_user_once(
+    test_client: FlaskClient, session: db.session
+) -> None:
+    """Test that Google login creates a user the first time and reuses it after."""
+    data = {
+        "first_name": "Google",
+        "last_name": "User",
+        "username": "google@muic.edu",
+        "password": "oauthpass",
+    }
+    identities = []
+    for _ in range(2):
+        response = test_client.post("/users/google/login", json=data)
+        assert response.status_code == 200
+        identities.append(decode_token(response.json["access_token"])["sub"])
+
+    users = session.query(Users).filter(Users.username == "google@muic.edu").all()
+    assert len(users) == 1
+    assert identities == [users[0].id, users[0].id]
+    assert users[0].role_id == RoleEnum.student.value
+
+
+def test_import_users_too_many_rows(
+    test_client: FlaskClient, admin_access_token: str, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that a roster over the row limit is rejected with the limit."""
+    monkeypatch.setattr(user_service, "MAX_ROSTER_ROWS", 1)
+    body = "username,password,first_name,last_name\nr1,p1,A,B\nr2,p2,C,D\n"
+    response = test_client.post(
+        "/users/import",
+        data=body,
+        content_type="text/csv",
+        headers={"Authorization": f"Bearer {admin_access_token}"},
+    )
+
+    assert response.status_code == 400
+    assert response.json == {"message": "Too many rows, at most 1 are allowed"}
+
+
 def test_login_invalid_request(test_client: FlaskClient) -> None:
     """Test the login endpoint with an invalid request."""
     data = {
@@ -96,8 +279,14 @@ def test_register_invalid_request(test_client: FlaskClient) -> None:
     assert response.json == {"message": "Invalid request body"}
 
 
-def test_register_existing_user(test_client: FlaskClient, session: db.session) -> None:
+def test_register_existing_user(
+    test_client: FlaskClient, session: db.session, monkeypatch: pytest.MonkeyPatch
+) -> None:
     """Test the register endpoint with an existing user."""
+    hashed = []
+    monkeypatch.setattr(
+        PasswordHasher, "hash_password", lambda password: hashed.append(password)
+    )
     data = {
         "first_name": "Test",
         "last_name": "User",
@@ -107,6 +296,7 @@ def test_register_existing_user(test_client: FlaskClient, session: db.session) -
     response = test_client.post(EndpointEnum.register.value, json=data)
     assert response.status_code == 409
     assert response.json == {"message": "Username already exists"}
+    assert hashed == []
 
 
 def test_get_user_by_id(
@@ -168,6 +358,10 @@ def test_update_user(
         "description": "Knock, knock. Who's there? Just me. Just me who? Just me, I'm updated.",
         "internship_time_period_id": 1,
     }
+    user = session.query(Users).filter(Users.id == 2).first()
+    user.profile_picture_key = "profilepic_2.png"
+    user.cv_key = "cv_2.pdf"
+    session.commit()
 
     response = test_client.put(
         EndpointEnum.edit_profile.value,
@@ -186,6 +380,8 @@ def test_update_user(
     assert user.linkedin_link == "www.linkedin.com/profile"
     assert user.website_link == "www.uwu.com"
     assert user.profile_picture_link == "www.owo.com"
+    assert user.profile_picture_key is None
+    assert user.cv_key is None
     assert user.email == "changed@muic.edu"
     assert user.phone_number == "011-456-7881"
     assert (
@@ -195,6 +391,95 @@ def test_update_user(
     assert user.internship_time_period_id == 1
 
 
+def test_patch_user(
+    test_client: FlaskClient, session: db.session, student_access_token: str
+) -> None:
+    """Test that patching the profile only changes the given fields."""
+    user = session.query(Users).filter(Users.id == 2).first()
+    user.first_name = "Unchanged"
+    session.commit()
+
+    response = test_client.patch(
+        EndpointEnum.edit_profile.value,
+        json={"phone_number": "011-456-7881", "gpa": 3, "description": None},
+        headers={"Authorization": f"Bearer {student_access_token}"},
+    )
+
+    assert response.status_code == 200
+    assert response.json["id"] == 2
+    assert response.json["phone_number"] == "011-456-7881"
+    assert response.json["gpa"] == 3.0
+    assert response.json["first_name"] == "Unchanged"
+    assert "password" not in response.json
+    session.refresh(user)
+    assert user.phone_number == "011-456-7881"
+    assert user.description is None
+    assert user.first_name == "Unchanged"
+
+
+def test_patch_user_file_links(
+    test_client: FlaskClient, session: db.session, student_access_token: str
+) -> None:
+    """Test that changing a file link forgets the uploaded file it replaces."""
+    user = session.query(Users).filter(Users.id == 2).first()
+    user.profile_picture_key = "profilepic_2.png"
+    user.profile_picture_link = "https://profilepics/profilepic_2.png"
+    user.profile_picture_variants = {
+        "64": "https://profilepics/profilepic_2_png_64.webp"
+    }
+    user.cv_key = "cv_2.pdf"
+    user.cv_link = "https://cvs/cv_2.pdf"
+    session.commit()
+
+    response = test_client.patch(
+        EndpointEnum.edit_profile.value,
+        json={
+            "profile_picture_link": "https://profilepics/profilepic_2.png",
+            "cv_link": "https://example.com/cv.pdf",
+        },
+        headers={"Authorization": f"Bearer {student_access_token}"},
+    )
+
+    assert response.status_code == 200
+    session.refresh(user)
+    assert user.profile_picture_key == "profilepic_2.png"
+    assert user.profile_picture_variants is not None
+    assert user.cv_key is None
+    assert user.cv_link == "https://example.com/cv.pdf"
+
+    response = test_client.patch(
+        EndpointEnum.edit_profile.value,
+        json={"profile_picture_link": None},
+        headers={"Authorization": f"Bearer {student_access_token}"},
+    )
+
+    assert response.status_code == 200
+    session.refresh(user)
+    assert user.profile_picture_key is None
+    assert user.profile_picture_variants is None
+
+
+def test_patch_user_invalid_request(
+    test_client: FlaskClient, student_access_token: str
+) -> None:
+    """Test that invalid partial profile updates are rejected."""
+    for data, message in (
+        ({}, "Invalid request body"),
+        ({"role_id": 1}, "Unknown fields: role_id"),
+        ({"gpa": 5}, "Invalid gpa"),
+        ({"gpa": "4"}, "Invalid gpa"),
+        ({"email": "a" * 256}, "email is too long"),
+        ({"internship_time_period_id": 999}, "Time period not found"),
+    ):
+        response = test_client.patch(
+            EndpointEnum.edit_profile.value,
+            json=data,
+            headers={"Authorization": f"Bearer {student_access_token}"},
+        )
+        assert response.status_code == 400
+        assert response.json == {"message": message}
+
+
 def test_update_user_invalid_request(
     test_client: FlaskClient, student_access_token: str
 ) -> None:
@@ -209,3 +494,121 @@ def test_update_user_invalid_request(
 
     assert response.status_code == 400
     assert response.json == {"message": "Invalid request body"}
+
+
+def test_get_all_students_paginated(
+    test_client: FlaskClient, session: db.session
+) -> None:
+    """Test paging through the students with a narrowed set of fields."""
+    session.add_all(
+        Users(username=f"paged{i}", password="hardpass", role_id=3) for i in range(5)
+    )
+    session.commit()
+
+    ids = []
+    cursor = None
+    while True:
+        query = {"limit": 2, "fields": "first_name,profile_picture_link"}
+        if cursor is not None:
+            query["cursor"] = cursor
+        response = test_client.get("/users/students", query_string=query)
+        assert response.status_code == 200
+        assert all(
+            set(student) == {"id", "first_name", "profile_picture_link"}
+            for student in response.json
+        )
+        ids += [student["id"] for student in response.json]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    students = session.query(Users).filter(Users.role_id == 3).order_by(Users.id)
+    assert ids == [student.id for student in students]
+
+
+def test_search_students(test_client: FlaskClient, session: db.session) -> None:
+    """Test filtering and sorting students by gpa across pages."""
+    session.add_all(
+        Users(
+            username=f"searched{i}",
+            password="hardpass",
+            role_id=3,
+            gpa=2.0 + i * 0.25,
+            academic_year="Senior" if i % 2 else "Junior",
+        )
+        for i in range(8)
+    )
+    session.commit()
+
+    gpas = []
+    cursor = None
+    while True:
+        query = {
+            "academic_year": "Senior",
+            "gpa_min": 2.5,
+            "sort": "gpa",
+            "order": "desc",
+            "limit": 2,
+            "fields": "username",
+        }
+        if cursor is not None:
+            query["cursor"] = cursor
+        response = test_client.get("/users/students/search", query_string=query)
+        assert response.status_code == 200
+        gpas += [student["gpa"] for student in response.json]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert gpas == [3.75, 3.25, 2.75]
+
+
+def test_search_students_invalid_query(test_client: FlaskClient) -> None:
+    """Test the student search endpoint with invalid parameters."""
+    for query in (
+        {"sort": "password"},
+        {"gpa_min": "high"},
+        {"gpa_max": "nan"},
+        {"sort": "gpa", "cursor": encode_cursor([None, 1])},
+        {"sort": "gpa", "cursor": encode_cursor(["high", 1])},
+        {"sort": "last_name", "cursor": encode_cursor(["Doe", None])},
+    ):
+        response = test_client.get("/users/students/search", query_string=query)
+        assert response.status_code == 400
+
+
+def test_get_all_users_invalid_fields(test_client: FlaskClient) -> None:
+    """Test that asking for unknown or private fields is rejected."""
+    for fields in ("password", "id,nope", ""):
+        response = test_client.get("/users", query_string={"fields": fields})
+        assert response.status_code == 400
+
+
+def test_get_all_users_invalid_cursor(test_client: FlaskClient) -> None:
+    """Test that cursors holding values of the wrong type are rejected."""
+    for after in ([None], [{"a": 1}], ["one"], [1, 2]):
+        response = test_client.get(
+            "/users", query_string={"cursor": encode_cursor(after)}
+        )
+        assert response.status_code == 400
+
+
+def test_get_all_users_stream(test_client: FlaskClient) -> None:
+    """Test that streaming the users returns the same body as the plain list."""
+    response = test_client.get(EndpointEnum.get_all_users.value)
+    streamed = test_client.get(
+        EndpointEnum.get_all_users.value, query_string={"stream": "1"}
+    )
+    assert streamed.status_code == 200
+    assert streamed.is_streamed
+    assert streamed.json == response.json
+
+
+def test_get_all_students_stream(test_client: FlaskClient) -> None:
+    """Test streaming the students."""
+    response = test_client.get("/users/students", query_string={"stream": "1"})
+    assert response.status_code == 200
+    assert response.json
+    assert all(
+        student["role_id"] == RoleEnum.student.value for student in response.json
+    )